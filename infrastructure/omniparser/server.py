@@ -5,11 +5,16 @@ Wraps YOLO (Icon Detection) and Florence-2 (Captioning) into a FastAPI endpoint.
 import sys
 import os
 import time
+import heapq
+import asyncio
 import logging
 import argparse
 import base64
-from fastapi import FastAPI, HTTPException
+import itertools
+from typing import List, Tuple
+from fastapi import FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel
+from PIL import Image
 import uvicorn
 import torch
 
@@ -23,13 +28,28 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Import OmniParser utilities (Assumes 'util/' is present in the docker context)
 try:
     from util.omniparser import Omniparser
+    from util.utils import check_ocr_box, get_som_labeled_img
 except ImportError:
     logger.critical("❌ Could not import 'util.omniparser'. Ensure OmniParser utils are present.")
     sys.exit(1)
 
+# Image inputs shared with the other model service: SHM ring reader + upload parsing.
+# docker-compose mounts ./shared and the (read-only) SHM directory; without a ring the /shm endpoints answer 501.
+from shared.python.frame_source import ShmFrameSource, read_image
+
+SHM_FILE_PATH = os.getenv("SHM_FILE_PATH", "/shm/bravebird_video.shm")
+
+# Sent by the Brain's inference client (0 = interactive ... 3 = background). Callers without it are served first.
+PRIORITY_HEADER = Header(0, alias="X-Priority")
+
 class ParseRequest(BaseModel):
     base64_image: str
 
+class ShmParseRequest(BaseModel):
+    shm_offset: int     # VisualFrame.shm_offset (start of the slot's pixel data)
+    frame_seq: int = 0  # Rejects the read if the slot was recycled in the meantime
+    include_som: bool = True
+
 class ParseResponse(BaseModel):
     som_image_base64: str
     parsed_content_list: list
@@ -57,8 +77,101 @@ def load_model(args):
         logger.critical(f"❌ Failed to load models: {e}")
         sys.exit(1)
 
+shm_source = ShmFrameSource(SHM_FILE_PATH)
+
+class PriorityGate:
+    """
+    One parse on the GPU at a time; waiters go in priority order (lower value first, FIFO within a priority).
+    The Brain, the DataMiner and the Synthesizer are separate processes, so this is where their requests meet.
+    """
+
+    def __init__(self):
+        self._busy = False
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def run(self, priority: int, fn, *args):
+        """
+        Runs fn(*args) in a worker thread during our turn.
+        A thread cannot be cancelled: if the client goes away mid-parse, the turn is only passed on once the
+        thread has finished, so two parses never share the GPU.
+        """
+        await self._acquire(priority)
+        work = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        work.add_done_callback(self._finished)
+        return await asyncio.shield(work)
+
+    async def _acquire(self, priority: int):
+        if self._busy or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._next()  # We were handed the turn just as the client went away
+                raise
+        self._busy = True
+
+    def _finished(self, work: asyncio.Future):
+        if not work.cancelled():
+            work.exception()  # Mark it retrieved: the request that awaited it may be gone
+        self._next()
+
+    def _next(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._busy = False
+
+gate = PriorityGate()
+
+def parse_pil(image: Image.Image):
+    """
+    Same pipeline as Omniparser.parse(), but starting from a decoded image instead of a base64 string.
+    Returns (som_image_base64, parsed_content_list). Bboxes are ratios of the image size.
+    """
+    box_overlay_ratio = max(image.size) / 3200
+    draw_bbox_config = {
+        'text_scale': 0.8 * box_overlay_ratio,
+        'text_thickness': max(int(2 * box_overlay_ratio), 1),
+        'text_padding': max(int(3 * box_overlay_ratio), 1),
+        'thickness': max(int(3 * box_overlay_ratio), 1),
+    }
+    (text, ocr_bbox), _ = check_ocr_box(image, display_img=False, output_bb_format='xyxy',
+                                        easyocr_args={'text_threshold': 0.8}, use_paddleocr=False)
+    som_image, _, parsed_content_list = get_som_labeled_img(
+        image, omniparser.som_model, BOX_TRESHOLD=omniparser.config['BOX_TRESHOLD'], output_coord_in_ratio=True,
+        ocr_bbox=ocr_bbox, draw_bbox_config=draw_bbox_config,
+        caption_model_processor=omniparser.caption_model_processor, ocr_text=text,
+        use_local_semantics=True, iou_threshold=0.7, scale_img=False, batch_size=128,
+    )
+    return som_image, parsed_content_list
+
+def run_parse(image: Image.Image, include_som: bool) -> dict:
+    if not omniparser:
+        raise HTTPException(status_code=503, detail="Model not initialized")
+
+    start_time = time.time()
+    try:
+        som_image, parsed_content_list = parse_pil(image)
+    except Exception as e:
+        logger.error(f"❌ Inference failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    latency = time.time() - start_time
+    logger.info(f"✅ Parsing complete in {latency:.4f}s. Found {len(parsed_content_list)} elements.")
+    return {
+        # The SoM overlay is only needed for debugging/visual prompts; skipping it keeps the response small
+        "som_image_base64": som_image if include_som else "",
+        "parsed_content_list": parsed_content_list,
+        "latency": latency
+    }
+
 @app.post("/parse/", response_model=ParseResponse)
-async def parse(request: ParseRequest):
+async def parse(request: ParseRequest, priority: int = PRIORITY_HEADER):
     if not omniparser:
         raise HTTPException(status_code=503, detail="Model not initialized")
 
@@ -67,7 +180,7 @@ async def parse(request: ParseRequest):
     
     try:
         # Run Inference
-        dino_labeled_img, parsed_content_list = omniparser.parse(request.base64_image)
+        dino_labeled_img, parsed_content_list = await gate.run(priority, omniparser.parse, request.base64_image)
         
         latency = time.time() - start_time
         logger.info(f"✅ Parsing complete in {latency:.4f}s. Found {len(parsed_content_list)} elements.")
@@ -81,6 +194,25 @@ async def parse(request: ParseRequest):
         logger.error(f"❌ Inference failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/parse/image", response_model=ParseResponse)
+async def parse_image(request: Request, priority: int = PRIORITY_HEADER):
+    """Binary upload: no base64 inflation, one decode pass. Optional field: include_som=false."""
+    image, fields = await read_image(request)
+    logger.info("Processing parsing request (binary)...")
+    return await gate.run(priority, run_parse, image, fields.get("include_som", "true").lower() != "false")
+
+@app.post("/parse/shm", response_model=ParseResponse)
+async def parse_shm(req: ShmParseRequest, priority: int = PRIORITY_HEADER):
+    """Co-located mode: the caller pins the slot, we read the BGRA pixels directly (no encode, no upload)."""
+    try:
+        image = shm_source.read(req.shm_offset, req.frame_seq)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    logger.info(f"Processing parsing request (SHM frame {req.frame_seq})...")
+    return await gate.run(priority, run_parse, image, req.include_som)
+
 @app.get("/probe/")
 async def health_check():
     if omniparser:
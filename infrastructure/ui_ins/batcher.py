@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+# Dynamic request batching for the UI-Ins service.
+# Concurrent requests are collected for a few milliseconds and handed to the model as one batch,
+# so vLLM fills the GPU with N prompts instead of running N sequential generate() calls.
+# Requests carry the caller's priority (0 = interactive ... 3 = background, the Brain's GpuScheduler classes):
+# every batch is filled most urgent first, so a queued click never waits behind queued mining work.
+
+
+class MicroBatcher:
+    """
+    Collects submitted items into batches and runs them on a single worker thread.
+
+    A batch is dispatched as soon as it holds 'max_batch_size' items or the oldest item has waited 'max_wait_ms'.
+    While a batch is on the GPU, new requests queue up and form the next batch. The event loop never blocks.
+    Queued items are taken in priority order (lower value first, FIFO within a priority).
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, metrics_window: int = 1000):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        # (priority, seq, item, future, enqueued_time); seq keeps FIFO order and never compares items
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, Any, asyncio.Future, float]]" = None
+        self._seq = itertools.count()
+        self._task: asyncio.Task = None
+        # One worker: the vLLM engine is not thread-safe, batching is where the parallelism comes from
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ui-ins-batch")
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._failures = 0
+        self._batch_sizes: Counter = Counter()
+        self._queue_waits: Deque[float] = deque(maxlen=metrics_window)
+        self._queue_waits_by_priority: Dict[int, Deque[float]] = defaultdict(lambda: deque(maxlen=metrics_window))
+        self._batch_latencies: Deque[float] = deque(maxlen=metrics_window)
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item: Any, priority: int = 0) -> Any:
+        """Queues one item and waits for its own result (exceptions are re-raised per request)."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._seq), item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = batch[0][4] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    # Deadline passed (e.g. we were busy with the previous batch): take what is already queued
+                    if self._queue.empty():
+                        break
+                    batch.append(self._queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests whose client went away are dropped before they cost GPU time
+            batch = [entry for entry in batch if not entry[3].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for priority, _, _, _, enqueued in batch:
+                self._queue_waits.append(started - enqueued)
+                self._queue_waits_by_priority[priority].append(started - enqueued)
+
+            try:
+                results = await loop.run_in_executor(self._executor, self.process_batch, [entry[2] for entry in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} requests")
+            except Exception as e:
+                self._failures += len(batch)
+                for _, _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, _, _, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._batch_latencies.append(time.perf_counter() - started)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._queue_waits)
+        latencies = sorted(self._batch_latencies)
+
+        def percentile(values: List[float], q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+        return {
+            "batches": self._batches,
+            "requests": self._items,
+            "failures": self._failures,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms_p50": percentile(waits, 0.50),
+            "queue_wait_ms_p95": percentile(waits, 0.95),
+            "queue_wait_ms_max": waits[-1] * 1000 if waits else 0.0,
+            "batch_latency_ms_p50": percentile(latencies, 0.50),
+            "batch_latency_ms_p95": percentile(latencies, 0.95),
+            "queue_wait_ms_p95_by_priority": {
+                priority: percentile(sorted(values), 0.95)
+                for priority, values in sorted(self._queue_waits_by_priority.items())
+            },
+        }
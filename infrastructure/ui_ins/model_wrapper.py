@@ -3,6 +3,7 @@ import torch
 import base64
 import re
 from io import BytesIO
+from typing import Dict, List, Tuple
 from PIL import Image
 from qwen_vl_utils import smart_resize
 from vllm import LLM, SamplingParams
@@ -40,6 +41,8 @@ class CustomQwen2_5VL_VLLM_Model:
             tensor_parallel_size=torch.cuda.device_count(), 
             gpu_memory_utilization=0.90,
             max_model_len=8192, # Adjusted for typical UI task context
+            # Prompts on the same screenshot share system prompt + image tokens (multi-target grounding)
+            enable_prefix_caching=True,
             mm_processor_kwargs={
                 "min_pixels": 28 * 28,
                 "max_pixels": self.max_pixels,
@@ -59,14 +62,46 @@ class CustomQwen2_5VL_VLLM_Model:
 
     def ground(self, instruction: str, base64_image: str) -> dict:
         """
-        Main inference method.
+        Main inference method (legacy JSON/base64 entry point).
         Returns normalized coordinates.
         """
         # 1. Decode Image
         image_data = base64.b64decode(base64_image)
         image = Image.open(BytesIO(image_data)).convert('RGB')
+        return self.ground_image(instruction, image)
 
-        # 2. Smart Resize
+    def ground_image(self, instruction: str, image: Image.Image) -> dict:
+        """
+        Inference on an already decoded RGB image (raw upload / SHM paths skip base64 entirely).
+        Returns normalized coordinates.
+        """
+        return self.ground_batch([(instruction, image)])[0]
+
+    def ground_batch(self, requests: List[Tuple[str, Image.Image]]) -> List[dict]:
+        """
+        Runs many (instruction, image) pairs through a single LLM.generate call.
+        vLLM schedules them together, so throughput grows with the batch instead of serializing.
+        Returns one result dict per request, in order.
+        """
+        # 2. Smart Resize (once per distinct image object)
+        resized: Dict[int, Image.Image] = {}
+        inputs = []
+        for instruction, image in requests:
+            if id(image) not in resized:
+                resized[id(image)] = self._resize(image)
+            inputs.append(self._build_input(instruction, resized[id(image)]))
+
+        # 5. Generate
+        sampling_params = SamplingParams(temperature=0.0, max_tokens=128, stop=["}", "]"])
+        outputs = self.model.generate(inputs, sampling_params=sampling_params)
+
+        results = []
+        for output, model_input in zip(outputs, inputs):
+            resized_image = model_input["multi_modal_data"]["image"]
+            results.append(self._parse_output(output.outputs[0].text.strip(), resized_image.width, resized_image.height))
+        return results
+
+    def _resize(self, image: Image.Image) -> Image.Image:
         resized_height, resized_width = smart_resize(
             image.height,
             image.width,
@@ -74,8 +109,9 @@ class CustomQwen2_5VL_VLLM_Model:
             min_pixels=28 * 28,
             max_pixels=self.max_pixels,
         )
-        resized_image = image.resize((resized_width, resized_height))
+        return image.resize((resized_width, resized_height))
 
+    def _build_input(self, instruction: str, resized_image: Image.Image) -> dict:
         # 3. Construct Prompt (UI-Ins System Prompt)
         messages = [
             {
@@ -102,17 +138,12 @@ class CustomQwen2_5VL_VLLM_Model:
         guide_text = "<tool_call>\n{\"name\": \"grounding\", \"arguments\": {\"action\": \"click\", \"coordinate\": ["
         full_prompt = prompt_text + guide_text
 
-        # 5. Generate
-        sampling_params = SamplingParams(temperature=0.0, max_tokens=128, stop=["}", "]"])
-        
-        inputs = [{
+        return {
             "prompt": full_prompt,
             "multi_modal_data": {"image": resized_image}
-        }]
-        
-        outputs = self.model.generate(inputs, sampling_params=sampling_params)
-        raw_output = outputs[0].outputs[0].text.strip()
-        
+        }
+
+    def _parse_output(self, raw_output: str, resized_width: int, resized_height: int) -> dict:
         # 6. Parse Result
         # Reconstruct valid JSON fragment to parse coords
         full_response_str = f"[{raw_output}]" # Closing the array
@@ -127,4 +158,4 @@ class CustomQwen2_5VL_VLLM_Model:
                 "raw": raw_output
             }
         
-        return {"point": None, "raw": raw_output}
\ No newline at end of file
+        return {"point": None, "raw": raw_output}
@@ -1,30 +1,133 @@
+import os
+import asyncio
+import base64
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from io import BytesIO
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel
+from PIL import Image
 from model_wrapper import CustomQwen2_5VL_VLLM_Model
+from batcher import MicroBatcher
+
+# Image inputs shared with the other model service: SHM ring reader + upload parsing.
+# docker-compose mounts ./shared and the (read-only) SHM directory; without a ring the /shm endpoints answer 501.
+from shared.python.frame_source import ShmFrameSource, read_image
 
 app = FastAPI(title="UI-Ins Service")
 model_wrapper = CustomQwen2_5VL_VLLM_Model()
+# Concurrent requests are grouped into one vLLM generate() call (see batcher.py)
+batcher = MicroBatcher(
+    model_wrapper.ground_batch,
+    max_batch_size=int(os.getenv("UI_INS_MAX_BATCH_SIZE", "16")),
+    max_wait_ms=float(os.getenv("UI_INS_MAX_WAIT_MS", "5")),
+)
+
+SHM_FILE_PATH = os.getenv("SHM_FILE_PATH", "/shm/bravebird_video.shm")
+
+# Sent by the Brain's inference client (0 = interactive ... 3 = background). Callers without it are served first.
+PRIORITY_HEADER = Header(0, alias="X-Priority")
 
 class GroundingRequest(BaseModel):
     instruction: str
     base64_image: str
 
+class ShmGroundingRequest(BaseModel):
+    instruction: str
+    shm_offset: int     # VisualFrame.shm_offset (start of the slot's pixel data)
+    frame_seq: int = 0  # Rejects the read if the slot was recycled in the meantime
+
+class GroundManyRequest(BaseModel):
+    instructions: List[str]
+    # Exactly one image source: base64, or a pointer into the SHM ring (co-located mode)
+    base64_image: Optional[str] = None
+    shm_offset: Optional[int] = None
+    frame_seq: int = 0
+
 class GroundingResponse(BaseModel):
     point: list | None # [x_norm, y_norm]
-    raw_response: str
+    raw: str
+
+class GroundManyResponse(BaseModel):
+    results: List[GroundingResponse]  # Same order as the instructions
+
+shm_source = ShmFrameSource(SHM_FILE_PATH)
 
 @app.on_event("startup")
 async def startup_event():
     model_wrapper.load_model()
+    await batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
 
 @app.post("/ground", response_model=GroundingResponse)
-async def ground_endpoint(req: GroundingRequest):
+async def ground_endpoint(req: GroundingRequest, priority: int = PRIORITY_HEADER):
+    try:
+        image = Image.open(BytesIO(base64.b64decode(req.base64_image))).convert("RGB")
+        return await batcher.submit((req.instruction, image), priority)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ground/image", response_model=GroundingResponse)
+async def ground_image_endpoint(request: Request, priority: int = PRIORITY_HEADER):
+    """Binary upload: no base64 inflation, one decode pass."""
+    image, fields = await read_image(request)
+    instruction = fields.get("instruction")
+    if not instruction:
+        raise HTTPException(status_code=422, detail="Missing 'instruction'")
+    try:
+        return await batcher.submit((instruction, image), priority)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ground/shm", response_model=GroundingResponse)
+async def ground_shm_endpoint(req: ShmGroundingRequest, priority: int = PRIORITY_HEADER):
+    """Co-located mode: the caller pins the slot, we read the BGRA pixels directly (no encode, no upload)."""
+    try:
+        image = shm_source.read(req.shm_offset, req.frame_seq)
+        return await batcher.submit((req.instruction, image), priority)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def ground_many(instructions: List[str], image: Image.Image, priority: int) -> dict:
+    """
+    Grounds every instruction against the same decoded image.
+    The requests share one image object, so they land in the same batch, the image is resized once,
+    and vLLM prefix caching reuses the system prompt + image tokens across the prompts.
+    """
+    if not instructions:
+        raise HTTPException(status_code=422, detail="Missing 'instructions'")
     try:
-        result = model_wrapper.ground(req.instruction, req.base64_image)
-        return result
+        results = await asyncio.gather(*[batcher.submit((instruction, image), priority)
+                                         for instruction in instructions])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"results": results}
+
+@app.post("/ground_many", response_model=GroundManyResponse)
+async def ground_many_endpoint(req: GroundManyRequest, priority: int = PRIORITY_HEADER):
+    if req.shm_offset is not None:
+        image = shm_source.read(req.shm_offset, req.frame_seq)
+    elif req.base64_image:
+        image = Image.open(BytesIO(base64.b64decode(req.base64_image))).convert("RGB")
+    else:
+        raise HTTPException(status_code=422, detail="Provide 'base64_image' or 'shm_offset'")
+    return await ground_many(req.instructions, image, priority)
+
+@app.post("/ground_many/image", response_model=GroundManyResponse)
+async def ground_many_image_endpoint(request: Request, priority: int = PRIORITY_HEADER):
+    """Binary upload with repeated 'instruction' fields (query string or multipart)."""
+    image, fields = await read_image(request)
+    return await ground_many(fields.getlist("instruction"), image, priority)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Batch size distribution and queue wait times (overall and per priority)."""
+    return batcher.metrics()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,58 @@
+from enum import Enum
+from typing import Dict, Mapping, Optional
+
+# The Bus Wire Format. Shared by the Windows BusProducer and the WSL EventBus so both halves agree on
+# how a channel is carried and how a Protobuf payload is framed.
+#
+# Wire format (identical for every transport): the payload is the raw serialized Protobuf message.
+# - stream:    XADD <channel> * data <payload>   (durable, consumer groups, replayable)
+# - pubsub:    PUBLISH <channel> <payload>       (fire-and-forget, no backlog)
+# - inprocess: asyncio queues inside one process (no Redis; tests and brain-internal channels)
+
+class ChannelMode(str, Enum):
+    STREAM = "stream"
+    PUBSUB = "pubsub"
+    INPROC = "inprocess"
+
+# Stream entry field holding the payload
+DATA_FIELD = b"data"
+
+# Defaults for the cross-machine channels. Override per channel via BUS_CHANNEL_MODES in either config.
+# Patterns ending in '.*' match every channel with that prefix; exact names win over patterns.
+DEFAULT_CHANNEL_MODES: Dict[str, str] = {
+    "video.*": ChannelMode.PUBSUB.value,   # Frame pointers: only the newest matters, the pixels live in SHM
+    "input.*": ChannelMode.STREAM.value,   # User interactions / audio: must not be lost
+    "action.*": ChannelMode.STREAM.value,  # Agent commands and their results
+}
+
+
+def resolve_channel_mode(channel: str, overrides: Optional[Mapping[str, str]] = None,
+                         default: str = ChannelMode.STREAM.value, force: Optional[str] = None) -> ChannelMode:
+    """
+    Picks the transport mode for a channel.
+    Precedence: force > exact override > longest matching pattern > default.
+    """
+    if force:
+        return ChannelMode(force)
+
+    modes = {**DEFAULT_CHANNEL_MODES, **(overrides or {})}
+    if channel in modes:
+        return ChannelMode(modes[channel])
+
+    best = None
+    for pattern in modes:
+        if pattern.endswith(".*") and channel.startswith(pattern[:-1]):
+            if best is None or len(pattern) > len(best):
+                best = pattern
+    return ChannelMode(modes[best] if best else default)
+
+
+def encode_stream_entry(payload: bytes) -> Dict[bytes, bytes]:
+    return {DATA_FIELD: payload}
+
+
+def decode_stream_entry(fields: Optional[Mapping[bytes, bytes]]) -> Optional[bytes]:
+    """Returns the payload, or None for entries trimmed by MAXLEN (they come back without fields)."""
+    if not fields:
+        return None
+    return fields.get(DATA_FIELD)
@@ -19,5 +19,12 @@ class UserInteraction: pass
 class AudioChunk: pass
 class AgentAction: pass
 class ActionResult: pass
+class GroundingRequestEvent: pass
+class GroundingTarget: pass
+class GroundingResultEvent: pass
+class ScreenParseRequestEvent: pass
+class ScreenElement: pass
+class VisualStateEvent: pass
+class RecordingControlEvent: pass
 class BusEvent: pass
 
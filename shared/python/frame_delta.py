@@ -0,0 +1,149 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+# The Delta Encoder. Block-wise change detection over raw BGRA frames.
+# Each frame is cut into square tiles and every tile is reduced to a 64-bit hash. Comparing hash grids
+# tells us which regions changed without keeping a full copy of the previous frame around.
+
+Rect = Tuple[int, int, int, int]  # (x, y, w, h) in pixels
+
+DEFAULT_TILE_SIZE = 64
+
+
+class TileHasher:
+    """
+    Vectorized per-tile hashing.
+    hash(tile) = sum(pixel * row_weight * col_weight) mod 2^64, with random odd weights.
+    Any single-pixel change is guaranteed to change the tile hash; larger changes collide with negligible probability.
+    """
+
+    def __init__(self, tile_size: int = DEFAULT_TILE_SIZE, seed: int = 0xB8A7EB18D):
+        self.tile_size = tile_size
+        self._rng = np.random.default_rng(seed)
+        self._row_weights = np.empty(0, dtype=np.uint64)
+        self._col_weights = np.empty(0, dtype=np.uint64)
+        self._scratch: Optional[np.ndarray] = None
+
+    def _weights(self, current: np.ndarray, n: int) -> np.ndarray:
+        if len(current) < n:
+            extra = self._rng.integers(0, 2**63, size=n - len(current), dtype=np.uint64) | np.uint64(1)
+            current = np.concatenate([current, extra])
+        return current
+
+    def reserve(self, width: int, height: int):
+        """
+        Draws the weights for frames up to width x height up front. Weights are drawn lazily in the order
+        resolutions are seen, so hashes that must match across processes (persisted keys) need this.
+        """
+        self._row_weights = self._weights(self._row_weights, height)
+        self._col_weights = self._weights(self._col_weights, width)
+
+    def grid_shape(self, width: int, height: int) -> Tuple[int, int]:
+        ts = self.tile_size
+        return (height + ts - 1) // ts, (width + ts - 1) // ts
+
+    def hash_tiles(self, bgra: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            bgra: (H, W, 4) uint8 frame, or (H, W) uint32 packed pixels.
+        Returns:
+            (rows, cols) uint64 grid of tile hashes.
+        """
+        pixels = bgra if bgra.ndim == 2 else np.ascontiguousarray(bgra).view(np.uint32)[..., 0]
+        height, width = pixels.shape
+
+        self._row_weights = self._weights(self._row_weights, height)
+        self._col_weights = self._weights(self._col_weights, width)
+        if self._scratch is None or self._scratch.shape != (height, width):
+            self._scratch = np.empty((height, width), dtype=np.uint64)
+
+        # Wrapping uint64 arithmetic is intended here
+        with np.errstate(over="ignore"):
+            np.multiply(pixels, self._col_weights[:width], out=self._scratch, casting="unsafe")
+            self._scratch *= self._row_weights[:height, None]
+
+        starts_y = np.arange(0, height, self.tile_size)
+        starts_x = np.arange(0, width, self.tile_size)
+        return np.add.reduceat(np.add.reduceat(self._scratch, starts_y, axis=0), starts_x, axis=1)
+
+    def hash_region(self, bgra: np.ndarray, rect: Rect) -> np.ndarray:
+        """Hashes of the tiles covering 'rect' (used to check whether a region is still unchanged)."""
+        r0, r1, c0, c1 = tile_span(rect, self.tile_size, bgra.shape[1], bgra.shape[0])
+        ts = self.tile_size
+        crop = bgra[r0 * ts:r1 * ts, c0 * ts:c1 * ts]
+        return self.hash_tiles(crop)
+
+
+def tile_span(rect: Rect, tile_size: int, width: int, height: int) -> Tuple[int, int, int, int]:
+    """Returns (row0, row1, col0, col1), the half-open tile range covering a pixel rect."""
+    x, y, w, h = rect
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    return y0 // tile_size, (y1 + tile_size - 1) // tile_size, x0 // tile_size, (x1 + tile_size - 1) // tile_size
+
+
+def changed_tiles(previous: Optional[np.ndarray], current: np.ndarray) -> np.ndarray:
+    """Boolean (rows, cols) mask of tiles that differ. Everything is dirty when there is no previous grid."""
+    if previous is None or previous.shape != current.shape:
+        return np.ones(current.shape, dtype=bool)
+    return previous != current
+
+
+def tiles_to_rects(mask: np.ndarray, tile_size: int, width: int, height: int, max_rects: int) -> List[Rect]:
+    """
+    Merges a dirty tile mask into pixel rectangles.
+    Horizontal runs of dirty tiles are merged per row, then identical runs on consecutive rows are stacked.
+    Falls back to a single bounding box when more than 'max_rects' rectangles would be needed.
+    """
+    if not mask.any():
+        return []
+
+    open_runs = {}  # (c0, c1) -> [row0, row1]
+    closed = []
+    for row in range(mask.shape[0]):
+        cols = np.flatnonzero(mask[row])
+        runs = []
+        if len(cols):
+            breaks = np.flatnonzero(np.diff(cols) > 1)
+            starts = np.concatenate([[cols[0]], cols[breaks + 1]])
+            ends = np.concatenate([cols[breaks], [cols[-1]]]) + 1
+            runs = list(zip(starts.tolist(), ends.tolist()))
+
+        next_open = {}
+        for run in runs:
+            span = open_runs.pop(run, None)
+            next_open[run] = [span[0], row + 1] if span else [row, row + 1]
+        closed.extend((run, span) for run, span in open_runs.items())
+        open_runs = next_open
+    closed.extend(open_runs.items())
+
+    rects = []
+    for (c0, c1), (r0, r1) in closed:
+        x, y = c0 * tile_size, r0 * tile_size
+        rects.append((x, y, min(c1 * tile_size, width) - x, min(r1 * tile_size, height) - y))
+
+    if len(rects) > max_rects:
+        return [bounding_rect(rects)]
+    return rects
+
+
+def bounding_rect(rects: List[Rect]) -> Rect:
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0] + r[2] for r in rects)
+    y1 = max(r[1] + r[3] for r in rects)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def rects_intersect(a: Rect, b: Rect) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def flatten_rects(rects: List[Rect]) -> List[int]:
+    """[(x, y, w, h), ...] -> [x, y, w, h, ...] (wire format of VisualFrame.dirty_rects)."""
+    return [v for rect in rects for v in rect]
+
+
+def unflatten_rects(values) -> List[Rect]:
+    values = list(values)
+    return [tuple(values[i:i + 4]) for i in range(0, len(values) - 3, 4)]
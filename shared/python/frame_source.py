@@ -0,0 +1,77 @@
+import mmap
+from io import BytesIO
+from typing import Mapping, Tuple
+
+from fastapi import HTTPException, Request
+from PIL import Image
+
+from .shm_protocol import ShmProtocolError, read_layout, read_slot
+
+# The Model Service Inputs. How the inference containers (UI-Ins, OmniParser) get the image for a request:
+# straight out of the Windows video ring (co-located mode) or from an upload (binary body or multipart).
+# Both containers mount ./shared, so they share this module instead of each keeping a copy.
+
+
+class ShmFrameSource:
+    """Read-only mmap of the video ring. Frames are copied out under the seqlock, never torn."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = None
+        self._layout = None
+
+    def read(self, shm_offset: int, frame_seq: int) -> Image.Image:
+        """
+        Copies one frame out of the ring.
+        409: the frame is gone (overwritten) or the pointer does not match this ring; 501: no ring here;
+        503: the ring is not initialized yet. The client falls back to uploading the image on any of these.
+        """
+        if self._mm is None:
+            self._map()
+        try:
+            result = read_slot(self._mm, self._layout, self._layout.slot_at(shm_offset), frame_seq)
+        except ShmProtocolError as e:
+            self._reset()  # Writer restarted with a new geometry: remap on the next call
+            raise HTTPException(status_code=409, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=409, detail=f"Frame {frame_seq} is no longer in shared memory")
+        header, data = result
+        return Image.frombuffer("RGBA", (header.width, header.height), data, "raw", "BGRA", 0, 1).convert("RGB")
+
+    def _map(self):
+        try:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file (writer not started yet)
+            raise HTTPException(status_code=501, detail=f"No shared memory ring at {self.path}")
+        try:
+            self._layout = read_layout(self._mm)
+        except ShmProtocolError as e:
+            self._reset()
+            raise HTTPException(status_code=503, detail=f"Shared memory ring not ready: {e}")
+
+    def _reset(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = None
+        self._layout = None
+
+async def read_image(request: Request) -> Tuple[Image.Image, Mapping]:
+    """
+    Accepts either multipart/form-data ('image' file + text fields)
+    or a raw encoded image as the request body (fields in the query string).
+    The returned fields support getlist() for repeated keys.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Missing 'image' file part")
+        data = await upload.read()
+        fields = form
+    else:
+        data = await request.body()
+        fields = request.query_params
+    if not data:
+        raise HTTPException(status_code=422, detail="Empty image")
+    return Image.open(BytesIO(data)).convert("RGB"), fields
@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# The Spatial Index. OmniParser elements with their bboxes packed into NumPy arrays.
+# Every "what is at (x, y)", "where is Box ID 12" and "which element is this A11y node" question becomes
+# one vectorized expression over an (N, 4) array instead of a Python loop over dicts.
+
+Box = Tuple[float, float, float, float]  # (x1, y1, x2, y2)
+
+
+def xywh_to_xyxy(boxes) -> np.ndarray:
+    """[(x, y, w, h), ...] (A11yNode.bbox, frame_delta.Rect) -> (N, 4) [x1, y1, x2, y2]."""
+    arr = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.concatenate([arr[:, :2], arr[:, :2] + arr[:, 2:]], axis=1)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (M, 4) and (N, 4) xyxy boxes -> (M, N)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ix = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    iy = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = ix * iy
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class ParsedScreen:
+    """
+    Read-only spatial index over one parsed frame.
+    Box IDs are positions in 'elements' (the line index of screen_info).
+
+    Boxes are also kept sorted by x1, so point queries binary-search the candidates whose left edge is
+    left of the point (O(log n)) and only test those.
+    """
+
+    def __init__(self, elements: List[Dict], boxes: Optional[np.ndarray] = None):
+        self.elements = elements
+        if boxes is None:
+            boxes = [el["bbox"] for el in elements]
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.areas = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+        self.centers = np.stack([(self.boxes[:, 0] + self.boxes[:, 2]) / 2,
+                                 (self.boxes[:, 1] + self.boxes[:, 3]) / 2], axis=1)
+        self._by_x1 = np.argsort(self.boxes[:, 0], kind="stable")
+        self._x1_sorted = self.boxes[self._by_x1, 0]
+
+    @classmethod
+    def from_elements(cls, elements: List[Dict], width: Optional[int] = None, height: Optional[int] = None):
+        """
+        Args:
+            elements: OmniParser items ({'bbox': [x1, y1, x2, y2], 'content', 'type', ...}).
+            width/height: pass them when the bboxes are ratios (raw /parse output) to get pixels.
+        """
+        boxes = np.asarray([el["bbox"] for el in elements], dtype=np.float32).reshape(-1, 4)
+        if width and height:
+            boxes = boxes * np.array([width, height, width, height], dtype=np.float32)
+        return cls(elements, boxes)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    # --- Box IDs ---
+
+    def element(self, box_id: int) -> Optional[Dict]:
+        return self.elements[box_id] if 0 <= box_id < len(self.elements) else None
+
+    def center(self, box_id: int) -> Optional[Tuple[int, int]]:
+        """Click point for a 'Box ID' chosen by the agent."""
+        if not 0 <= box_id < len(self.elements):
+            return None
+        x, y = self.centers[box_id]
+        return int(round(x)), int(round(y))
+
+    # --- Point Queries ---
+
+    def containing(self, x: float, y: float) -> np.ndarray:
+        """Box IDs of every element whose bbox contains (x, y) (edges inclusive)."""
+        candidates = self._by_x1[:np.searchsorted(self._x1_sorted, x, side="right")]
+        boxes = self.boxes[candidates]
+        inside = (x <= boxes[:, 2]) & (y >= boxes[:, 1]) & (y <= boxes[:, 3])
+        return candidates[inside]
+
+    def smallest_at(self, x: float, y: float) -> Optional[int]:
+        """Innermost element at (x, y): text inside a button resolves to the text."""
+        hits = self.containing(x, y)
+        if len(hits) == 0:
+            return None
+        return int(hits[np.argmin(self.areas[hits])])
+
+    def smallest_at_many(self, points) -> np.ndarray:
+        """Vectorized smallest_at for (P, 2) points -> (P,) Box IDs, -1 where nothing contains the point."""
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(self) == 0:
+            return np.full(len(pts), -1, dtype=np.int64)
+        px, py = pts[:, 0:1], pts[:, 1:2]
+        inside = ((px >= self.boxes[None, :, 0]) & (px <= self.boxes[None, :, 2]) &
+                  (py >= self.boxes[None, :, 1]) & (py <= self.boxes[None, :, 3]))
+        areas = np.where(inside, self.areas[None, :], np.inf)
+        best = np.argmin(areas, axis=1)
+        return np.where(inside.any(axis=1), best, -1)
+
+    def nearest(self, x: float, y: float, max_distance: Optional[float] = None) -> Optional[int]:
+        """Element closest to (x, y) by point-to-box distance (0 inside; ties go to the smaller box)."""
+        if len(self) == 0:
+            return None
+        dx = np.maximum(np.maximum(self.boxes[:, 0] - x, 0), x - self.boxes[:, 2])
+        dy = np.maximum(np.maximum(self.boxes[:, 1] - y, 0), y - self.boxes[:, 3])
+        dist = np.hypot(dx, dy)
+        order = np.lexsort((self.areas, dist))
+        best = int(order[0])
+        if max_distance is not None and dist[best] > max_distance:
+            return None
+        return best
+
+    # --- Region Queries ---
+
+    def intersecting(self, rects: Sequence[Tuple[int, int, int, int]]) -> np.ndarray:
+        """Boolean mask of elements overlapping any of the (x, y, w, h) rects (e.g. dirty regions)."""
+        if len(self) == 0 or len(rects) == 0:
+            return np.zeros(len(self), dtype=bool)
+        r = xywh_to_xyxy(rects)
+        overlap = ((self.boxes[:, None, 0] < r[None, :, 2]) & (r[None, :, 0] < self.boxes[:, None, 2]) &
+                   (self.boxes[:, None, 1] < r[None, :, 3]) & (r[None, :, 1] < self.boxes[:, None, 3]))
+        return overlap.any(axis=1)
+
+    def match(self, boxes, threshold: float = 0.5, xywh: bool = False) -> List[Optional[int]]:
+        """
+        Best-IoU element for each query box (e.g. A11yNode.bbox, which is xywh), or None below threshold.
+        """
+        query = xywh_to_xyxy(boxes) if xywh else np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if len(self) == 0:
+            return [None] * len(query)
+        ious = iou_matrix(query, self.boxes)
+        best = np.argmax(ious, axis=1)
+        return [int(b) if ious[i, b] >= threshold else None for i, b in enumerate(best)]
@@ -0,0 +1,334 @@
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+# The Video Ring Protocol. Defines the byte layout of the Shared Memory file written by the Windows Host and read by the WSL Brain.
+# Frames are written into N slots guarded by per-slot sequence counters (a seqlock), so readers never take a lock and never observe a half-written frame.
+
+SHM_MAGIC = b"BBSH"
+SHM_VERSION = 4
+
+# Zero-copy readers (one per SharedMemoryReader) each own a pin lane, so one reader releasing a slot never
+# drops another reader's pin on the same slot.
+MAX_READERS = 8
+READER_LEASE_S = 300.0  # A lane whose owner stopped renewing (crashed reader) is reclaimed after this
+
+# --- Global Header (192 bytes) ---
+# [4s magic][H version][H num_slots][I slot_stride][I slot_data_size][I reserved] ... [Q write_seq @ 24][I write_slot @ 32]
+# ... [reader leases @ 64: MAX_READERS x (Q owner token, d lease deadline)]
+GLOBAL_HEADER_FMT = "<4sHHIII"
+WRITE_SEQ_OFFSET = 24  # Sequence number of the newest complete frame (0 = nothing written yet)
+WRITE_SLOT_OFFSET = 32  # Slot index holding that frame (the global write index)
+READER_LEASES_OFFSET = 64
+READER_LEASE_FMT = "<Qd"
+READER_LEASE_SIZE = 16
+GLOBAL_HEADER_SIZE = READER_LEASES_OFFSET + MAX_READERS * READER_LEASE_SIZE
+
+# --- Slot Header (384 bytes, followed by the pixel data) ---
+# [Q seq][Q frame_seq][d timestamp][I width][I height][I data_size][I dirty_count] ... [dirty rects @ 64]
+# ... [pin deadlines @ 320: MAX_READERS x d, one lane per reader]
+# 'seq' is the seqlock counter: odd while the writer is inside the slot, even when the slot is stable.
+# A pin deadline is set by a zero-copy reader in its own lane: the writer skips the slot while any lane's
+# deadline is in the future.
+SLOT_SEQ_FMT = "<Q"
+SLOT_META_FMT = "<QdIII"
+SLOT_META_OFFSET = 8
+SLOT_DIRTY_COUNT_OFFSET = 36
+SLOT_DIRTY_RECTS_OFFSET = 64
+DIRTY_RECT_FMT = "<HHHH"  # x, y, w, h (pixels)
+MAX_DIRTY_RECTS = 32
+SLOT_PINS_OFFSET = SLOT_DIRTY_RECTS_OFFSET + MAX_DIRTY_RECTS * 8
+SLOT_PINS_FMT = f"<{MAX_READERS}d"
+SLOT_PIN_FMT = "<d"
+SLOT_HEADER_SIZE = SLOT_PINS_OFFSET + MAX_READERS * 8
+
+PAGE_SIZE = 4096
+BYTES_PER_PIXEL = 4  # BGRA
+
+
+def _align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+@dataclass(frozen=True)
+class ShmLayout:
+    """
+    Geometry of the ring buffer.
+    Slots are page aligned so the pixel data of each slot starts on a 64-byte boundary.
+    """
+    num_slots: int
+    slot_data_size: int
+
+    @classmethod
+    def for_resolution(cls, max_width: int, max_height: int, num_slots: int) -> "ShmLayout":
+        return cls(num_slots=num_slots, slot_data_size=max_width * max_height * BYTES_PER_PIXEL)
+
+    @property
+    def slot_stride(self) -> int:
+        return _align(SLOT_HEADER_SIZE + self.slot_data_size, PAGE_SIZE)
+
+    @property
+    def total_size(self) -> int:
+        return _align(GLOBAL_HEADER_SIZE, PAGE_SIZE) + self.num_slots * self.slot_stride
+
+    def slot_offset(self, slot: int) -> int:
+        return _align(GLOBAL_HEADER_SIZE, PAGE_SIZE) + slot * self.slot_stride
+
+    def data_offset(self, slot: int) -> int:
+        return self.slot_offset(slot) + SLOT_HEADER_SIZE
+
+    def slot_at(self, data_offset: int) -> int:
+        """Inverse of data_offset() (VisualFrame.shm_offset -> slot index)."""
+        slot, remainder = divmod(data_offset - self.data_offset(0), self.slot_stride)
+        if remainder or not 0 <= slot < self.num_slots:
+            raise ShmProtocolError(f"Offset {data_offset} is not the start of a slot")
+        return slot
+
+
+@dataclass
+class SlotHeader:
+    seq: int
+    frame_seq: int
+    timestamp: float
+    width: int
+    height: int
+    data_size: int
+    dirty_rects: List[Tuple[int, int, int, int]]
+
+
+class ShmProtocolError(Exception):
+    """Raised when the SHM file does not contain a compatible ring buffer."""
+
+
+# ------------------------------------------------------------------
+# Header helpers
+# ------------------------------------------------------------------
+
+def init_ring(buf, layout: ShmLayout):
+    """Writes a fresh global header (no readers) and zeroes every slot header."""
+    buf[0:GLOBAL_HEADER_SIZE] = b"\0" * GLOBAL_HEADER_SIZE
+    struct.pack_into(GLOBAL_HEADER_FMT, buf, 0, SHM_MAGIC, SHM_VERSION,
+                     layout.num_slots, layout.slot_stride, layout.slot_data_size, 0)
+    for slot in range(layout.num_slots):
+        buf[layout.slot_offset(slot):layout.slot_offset(slot) + SLOT_HEADER_SIZE] = b"\0" * SLOT_HEADER_SIZE
+
+
+def read_layout(buf) -> ShmLayout:
+    """Parses and validates the global header."""
+    magic, version, num_slots, slot_stride, slot_data_size, _ = struct.unpack_from(GLOBAL_HEADER_FMT, buf, 0)
+    if magic != SHM_MAGIC:
+        raise ShmProtocolError(f"Bad magic {magic!r} (writer not initialized?)")
+    if version != SHM_VERSION:
+        raise ShmProtocolError(f"Unsupported SHM version {version} (expected {SHM_VERSION})")
+    layout = ShmLayout(num_slots=num_slots, slot_data_size=slot_data_size)
+    if layout.slot_stride != slot_stride:
+        raise ShmProtocolError("Slot stride mismatch between writer and reader")
+    return layout
+
+
+def read_write_seq(buf) -> int:
+    return struct.unpack_from("<Q", buf, WRITE_SEQ_OFFSET)[0]
+
+
+def read_write_slot(buf) -> int:
+    return struct.unpack_from("<I", buf, WRITE_SLOT_OFFSET)[0]
+
+
+def read_slot_seq(buf, layout: ShmLayout, slot: int) -> int:
+    return struct.unpack_from(SLOT_SEQ_FMT, buf, layout.slot_offset(slot))[0]
+
+
+def read_slot_header(buf, layout: ShmLayout, slot: int) -> SlotHeader:
+    base = layout.slot_offset(slot)
+    seq = struct.unpack_from(SLOT_SEQ_FMT, buf, base)[0]
+    frame_seq, timestamp, width, height, data_size = struct.unpack_from(SLOT_META_FMT, buf, base + SLOT_META_OFFSET)
+    dirty_count = min(struct.unpack_from("<I", buf, base + SLOT_DIRTY_COUNT_OFFSET)[0], MAX_DIRTY_RECTS)
+    dirty_rects = [struct.unpack_from(DIRTY_RECT_FMT, buf, base + SLOT_DIRTY_RECTS_OFFSET + i * 8)
+                   for i in range(dirty_count)]
+    return SlotHeader(seq, frame_seq, timestamp, width, height, data_size, dirty_rects)
+
+
+def is_pinned(buf, layout: ShmLayout, slot: int, now: Optional[float] = None) -> bool:
+    """True while any reader's pin on the slot is live."""
+    now = now if now is not None else time.time()
+    return any(deadline > now for deadline in
+               struct.unpack_from(SLOT_PINS_FMT, buf, layout.slot_offset(slot) + SLOT_PINS_OFFSET))
+
+
+def set_pin(buf, layout: ShmLayout, slot: int, lane: int, deadline: float):
+    """Pins (deadline > now) or releases (deadline = 0) a slot in one reader's lane (see claim_reader)."""
+    struct.pack_into(SLOT_PIN_FMT, buf, layout.slot_offset(slot) + SLOT_PINS_OFFSET + lane * 8, deadline)
+
+
+# ------------------------------------------------------------------
+# Reader leases (pin lanes)
+# ------------------------------------------------------------------
+
+_claim_lock = threading.Lock()  # Serializes claims between readers of the same process
+
+
+def _lease(buf, lane: int) -> Tuple[int, float]:
+    return struct.unpack_from(READER_LEASE_FMT, buf, READER_LEASES_OFFSET + lane * READER_LEASE_SIZE)
+
+
+def claim_reader(buf, lease_seconds: float = READER_LEASE_S) -> Tuple[int, int]:
+    """
+    Takes a free (or expired) pin lane for a new reader.
+    Returns (lane, token); the token proves ownership in renew_reader(). Raises ShmProtocolError if all are taken.
+    """
+    token = int.from_bytes(os.urandom(8), "little") or 1
+    with _claim_lock:
+        now = time.time()
+        for lane in range(MAX_READERS):
+            owner, deadline = _lease(buf, lane)
+            if owner == 0 or deadline <= now:
+                struct.pack_into(READER_LEASE_FMT, buf, READER_LEASES_OFFSET + lane * READER_LEASE_SIZE,
+                                 token, now + lease_seconds)
+                # Re-read: a reader in another process claiming the same lane wins or loses as a whole
+                if _lease(buf, lane)[0] == token:
+                    return lane, token
+    raise ShmProtocolError(f"All {MAX_READERS} reader lanes are in use")
+
+
+def renew_reader(buf, lane: int, token: int, lease_seconds: float = READER_LEASE_S) -> bool:
+    """Extends a reader's lease. False if the lane was reclaimed meanwhile (the reader must claim a new one)."""
+    owner, deadline = _lease(buf, lane)
+    if owner != token or deadline <= time.time():
+        return False
+    struct.pack_into(READER_LEASE_FMT, buf, READER_LEASES_OFFSET + lane * READER_LEASE_SIZE,
+                     token, time.time() + lease_seconds)
+    return True
+
+
+def release_reader(buf, layout: ShmLayout, lane: int, token: int):
+    """Drops every pin in the lane and frees it (no-op if someone else owns it by now)."""
+    if _lease(buf, lane)[0] != token:
+        return
+    for slot in range(layout.num_slots):
+        set_pin(buf, layout, slot, lane, 0.0)
+    struct.pack_into(READER_LEASE_FMT, buf, READER_LEASES_OFFSET + lane * READER_LEASE_SIZE, 0, 0.0)
+
+
+# ------------------------------------------------------------------
+# Writer side (Windows Host)
+# ------------------------------------------------------------------
+
+def write_frame(buf, layout: ShmLayout, pixels, width: int, height: int, timestamp: Optional[float] = None,
+                dirty_rects: Sequence[Tuple[int, int, int, int]] = ()) -> int:
+    """
+    Publishes one frame into the next free slot of the ring.
+    Single-writer only. Slots pinned by a reader and the newest slot are never overwritten.
+    'dirty_rects' lists the regions that changed since the previous frame (empty = whole frame).
+    Returns the frame sequence number that was written, or 0 if every slot was busy (frame dropped).
+    """
+    data_size = len(pixels)
+    if data_size > layout.slot_data_size:
+        raise ValueError(f"Frame of {data_size} bytes exceeds slot capacity {layout.slot_data_size}")
+    if len(dirty_rects) > MAX_DIRTY_RECTS:
+        raise ValueError(f"At most {MAX_DIRTY_RECTS} dirty rects fit in a slot header")
+
+    frame_seq = read_write_seq(buf) + 1
+    latest_slot = read_write_slot(buf)
+    now = time.time()
+
+    for step in range(1, layout.num_slots + 1):
+        slot = (latest_slot + step) % layout.num_slots
+        if slot == latest_slot and frame_seq > 1:
+            continue
+
+        base = layout.slot_offset(slot)
+        seq = read_slot_seq(buf, layout, slot)
+        # 1. Enter critical section (odd = write in progress)
+        struct.pack_into(SLOT_SEQ_FMT, buf, base, seq + 1)
+        # A reader may have pinned the slot before seeing the odd counter: back off without touching the payload
+        if is_pinned(buf, layout, slot, now):
+            struct.pack_into(SLOT_SEQ_FMT, buf, base, seq)
+            continue
+
+        # 2. Payload
+        data_start = layout.data_offset(slot)
+        struct.pack_into(SLOT_META_FMT, buf, base + SLOT_META_OFFSET,
+                         frame_seq, timestamp if timestamp is not None else now, width, height, data_size)
+        struct.pack_into("<I", buf, base + SLOT_DIRTY_COUNT_OFFSET, len(dirty_rects))
+        for i, rect in enumerate(dirty_rects):
+            struct.pack_into(DIRTY_RECT_FMT, buf, base + SLOT_DIRTY_RECTS_OFFSET + i * 8, *rect)
+        buf[data_start:data_start + data_size] = pixels
+        # 3. Leave critical section (even = stable), then advertise the slot
+        struct.pack_into(SLOT_SEQ_FMT, buf, base, seq + 2)
+        struct.pack_into("<I", buf, WRITE_SLOT_OFFSET, slot)
+        struct.pack_into("<Q", buf, WRITE_SEQ_OFFSET, frame_seq)
+        return frame_seq
+
+    return 0
+
+
+# ------------------------------------------------------------------
+# Reader side (WSL Brain / co-located services)
+# ------------------------------------------------------------------
+
+def read_latest(buf, layout: ShmLayout, max_retries: int = 8):
+    """
+    Lock-free read of the newest complete frame.
+    Returns (SlotHeader, bytes) or None if nothing has been written yet.
+    Retries when the writer lapped the slot while it was being copied.
+    """
+    for _ in range(max_retries):
+        if read_write_seq(buf) == 0:
+            return None
+
+        slot = read_write_slot(buf)
+        header = read_slot_header(buf, layout, slot)
+        if header.seq & 1 or header.data_size > layout.slot_data_size:
+            continue
+
+        start = layout.data_offset(slot)
+        data = bytes(buf[start:start + header.data_size])
+
+        # Validate: the counter must not have moved while we were copying
+        if read_slot_seq(buf, layout, slot) == header.seq:
+            return header, data
+    return None
+
+
+def read_slot(buf, layout: ShmLayout, slot: int, frame_seq: int = 0, max_retries: int = 8):
+    """
+    Lock-free copy of one specific slot (e.g. the one announced in a VisualFrame event).
+    Returns (SlotHeader, bytes), or None if the slot is empty or no longer holds 'frame_seq' (when given).
+    """
+    for _ in range(max_retries):
+        header = read_slot_header(buf, layout, slot)
+        if header.seq == 0 or header.data_size > layout.slot_data_size:
+            return None
+        if header.seq & 1:
+            continue
+        if frame_seq and header.frame_seq != frame_seq:
+            return None
+
+        start = layout.data_offset(slot)
+        data = bytes(buf[start:start + header.data_size])
+        if read_slot_seq(buf, layout, slot) == header.seq:
+            return header, data
+    return None
+
+
+def pin_latest(buf, layout: ShmLayout, lane: int, hold_seconds: float, max_retries: int = 8):
+    """
+    Pins the newest complete slot for zero-copy access, in the reader's lane.
+    Returns (slot, SlotHeader) with the pin held, or None. The caller must release it with set_pin(..., lane, 0).
+    """
+    for _ in range(max_retries):
+        if read_write_seq(buf) == 0:
+            return None
+
+        slot = read_write_slot(buf)
+        # Pin first, then check the counter: a writer that entered before the pin shows up as odd/changed
+        set_pin(buf, layout, slot, lane, time.time() + hold_seconds)
+        header = read_slot_header(buf, layout, slot)
+        if header.seq & 1 or header.seq == 0 or header.data_size > layout.slot_data_size:
+            set_pin(buf, layout, slot, lane, 0.0)
+            continue
+        return slot, header
+    return None
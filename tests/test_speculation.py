@@ -0,0 +1,71 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("BB_GEMINI_API_KEY", "test")
+
+from wsl_brain.core.speculation import SpeculativeGrounder, normalize_target  # noqa: E402
+
+
+class FakeBus:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    async def subscribe(self, *args, **kwargs):
+        pass
+
+
+def answer(request_id: str, frame_seq: int, x: int, y: int):
+    """What Perception publishes on perception.grounding_result for a found target."""
+    return SimpleNamespace(request_id=request_id, frame_seq=frame_seq, x=x, y=y, confidence=1.0,
+                           targets=[SimpleNamespace(found=True, x=x, y=y)])
+
+
+def screen(*contents):
+    return {"parsed_content_list": [{"type": "text", "content": c, "bbox": [0, 0, 10, 10]} for c in contents]}
+
+
+def test_normalize_target():
+    assert normalize_target('The  "Save As" button.') == normalize_target("save as button") == "save as button"
+
+
+def test_two_step_plan_hits_the_prefetch():
+    async def run():
+        bus = FakeBus()
+        speculator = SpeculativeGrounder(bus)
+
+        # Step 1: click "File"; the agent announces it will click "Save As" next (not in the OmniParser list)
+        step1 = {"Next Action": "gui_click", "Box ID": None, "Target": "File", "Next Target": "Save As"}
+        await speculator.prefetch_next(step1, screen("File", "Edit"))
+        assert speculator.stats["issued"] == 1
+        channel, request = bus.published[-1]
+        assert channel == "perception.grounding_request" and speculator.owns(request.request_id)
+
+        # Perception answers while step 1 executes
+        await speculator.on_grounding_result(answer(request.request_id, frame_seq=7, x=120, y=40))
+
+        # Step 2: the agent names the same element, spelled slightly differently
+        step2 = {"Next Action": "gui_click", "Box ID": None, "Target": "the 'save as'"}
+        result = speculator.take(step2["Target"])
+        assert result is not None and (result.x, result.y) == (120, 40)
+        return speculator.stats
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 1
+    assert stats["misses"] == 0
+
+
+def test_box_id_targets_are_not_prefetched():
+    async def run():
+        bus = FakeBus()
+        speculator = SpeculativeGrounder(bus)
+        # "Save" is already listed by OmniParser: the next click will use its Box ID
+        await speculator.prefetch_next({"Next Action": "gui_type", "Next Target": "Save"}, screen("Save", "Cancel"))
+        return bus.published, speculator.stats
+
+    published, stats = asyncio.run(run())
+    assert published == []
+    assert stats["issued"] == 0 and stats["on_screen"] == 1
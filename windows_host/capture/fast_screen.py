@@ -5,11 +5,12 @@ import logging
 import threading
 import numpy as np
 import mss
-import struct
 from typing import Tuple
 
 from windows_host.config import WindowsConfig
 from shared.python.events_pb2 import VisualFrame
+from shared.python.shm_protocol import ShmLayout, init_ring, write_frame, read_write_slot, MAX_DIRTY_RECTS
+from shared.python.frame_delta import TileHasher, changed_tiles, tiles_to_rects, flatten_rects
 
 logger = logging.getLogger("ScreenCapturer")
 
@@ -17,16 +18,16 @@ logger = logging.getLogger("ScreenCapturer")
 # Optimization Technique: Memory Mapped Files (mmap).
 # Instead of sending video over TCP/HTTP (which adds latency and CPU overhead), we write raw pixel data directly to a file on the NTFS drive. 
 # WSL 2 mounts the C: drive at /mnt/c/, allowing the Linux Brain to read this memory almost instantly (Zero-Copy-ish).
+# Optimization Technique: Delta Encoding.
+# Frames are tile-hashed; unchanged frames are dropped before they reach SHM, the Bus or ffmpeg, and changed ones carry their dirty rects.
 
 class ScreenCapturer:
     """
     High-Performance Screen Capture writing to a Shared Memory File.
     
-    Protocol:
-    [8 bytes: timestamp (double)]
-    [4 bytes: width (int)]
-    [4 bytes: height (int)]
-    [N bytes: Raw BGRA Pixel Data]
+    Protocol (see shared/python/shm_protocol.py):
+    [64 bytes: Global Header (magic, version, num_slots, write_seq)]
+    [N Slots: Slot Header (seqlock counter, frame_seq, timestamp, W, H, dirty rects) + Raw BGRA Pixel Data]
     """
 
     def __init__(self, config: WindowsConfig, bus_producer, session_manager=None):
@@ -39,9 +40,20 @@ class ScreenCapturer:
         # Ensure directory exists
         os.makedirs(os.path.dirname(self.config.SHM_FILE_PATH), exist_ok=True)
         
-        # Calculate buffer size for 4K BGRA (Worst case)
-        # 3840 * 2160 * 4 bytes ~= 33 MB
-        self.buffer_size = 3840 * 2160 * 4 + 16 # +16 for header
+        # Each slot is sized for the worst case resolution
+        # 3840 * 2160 * 4 bytes ~= 33 MB per slot
+        self.layout = ShmLayout.for_resolution(
+            self.config.SHM_MAX_WIDTH, self.config.SHM_MAX_HEIGHT, self.config.SHM_NUM_SLOTS
+        )
+        self.buffer_size = self.layout.total_size
+
+        # Sequence number of the last frame published to the ring (0 = none yet)
+        self.latest_frame_seq = 0
+
+        # Delta Encoding state
+        self.hasher = TileHasher(self.config.CAPTURE_TILE_SIZE)
+        self._prev_hashes = None
+        self.frames_suppressed = 0
         
         # Initialize mmap file
         self._init_shm()
@@ -50,8 +62,12 @@ class ScreenCapturer:
         """Creates/Resets the file backing the shared memory."""
         try:
             with open(self.config.SHM_FILE_PATH, "wb") as f:
-                f.write(b'\0' * self.buffer_size)
-            logger.info(f"💾 Initialized Shared Memory file at {self.config.SHM_FILE_PATH} ({self.buffer_size / 1024 / 1024:.2f} MB)")
+                f.truncate(self.buffer_size)
+            with open(self.config.SHM_FILE_PATH, "r+b") as f:
+                with mmap.mmap(f.fileno(), self.buffer_size, access=mmap.ACCESS_WRITE) as mm:
+                    init_ring(mm, self.layout)
+            logger.info(f"💾 Initialized Shared Memory ring at {self.config.SHM_FILE_PATH} "
+                        f"({self.layout.num_slots} slots, {self.buffer_size / 1024 / 1024:.2f} MB)")
         except Exception as e:
             logger.critical(f"❌ Failed to init SHM: {e}")
             raise
@@ -93,40 +109,63 @@ class ScreenCapturer:
                             raw_bytes = screenshot.raw
                             width = screenshot.width
                             height = screenshot.height
+
+                            # 3. Delta Encoding: diff tile hashes against the previous frame
+                            pixels = np.frombuffer(raw_bytes, dtype=np.uint32).reshape((height, width))
+                            hashes = self.hasher.hash_tiles(pixels)
+                            dirty_mask = changed_tiles(self._prev_hashes, hashes)
+
+                            if not dirty_mask.any():
+                                # Idle screen: nothing to write, record or announce
+                                self.frames_suppressed += 1
+                                self._sleep_until_next_frame(start_time)
+                                continue
+
+                            dirty_rects = tiles_to_rects(
+                                dirty_mask, self.config.CAPTURE_TILE_SIZE, width, height, MAX_DIRTY_RECTS
+                            )
                             
-                            # 3. Write Header (Timestamp, W, H)
-                            # 'd' = double, 'i' = int
-                            header = struct.pack('dii', start_time, width, height)
-                            
-                            # 4. Write to Shared Memory
-                            # mm.seek(0)
-                            # mm.write(header)
-                            # mm.write(raw_bytes)
-                            # mm.flush() # Ensure sync to disk/WSL
+                            # 4. Write to the next Ring Slot (seqlock protected)
+                            # Readers always pick the newest stable slot, so they never block us.
+                            frame_seq = write_frame(mm, self.layout, raw_bytes, width, height, start_time, dirty_rects)
+                            if frame_seq:
+                                self.latest_frame_seq = frame_seq
+                                # Only advance the baseline once readers can actually see this frame
+                                self._prev_hashes = hashes
+                            else:
+                                logger.debug("⏭️ All SHM slots pinned by readers. Frame dropped from ring.")
                             
-                            # Write to Disk
+                            # 5. Write to Disk (changed frames only, see SessionManager VFR encoding)
                             if self.session:
                                 self.session.write_video_frame(raw_bytes)
 
-                            # 5. Notify Bus (Optional - only if we want event-driven video)
+                            # 6. Notify Bus (Optional - only if we want event-driven video)
                             # For bandwidth saving, we might NOT send a bus event for every frame,
                             # letting the consumer poll the SHM file instead. 
                             # However, sending a lightweight pointer event is good practice.
                             
-                            frame_event = VisualFrame()
-                            frame_event.timestamp = int(start_time * 1000)
-                            frame_event.width = width
-                            frame_event.height = height
-                            frame_event.shm_handle = self.config.SHM_FILE_PATH
-                            frame_event.encoding = "raw_bgra"
-                            
-                            self.bus.publish("video.frame_ready", frame_event)
+                            if frame_seq:
+                                frame_event = VisualFrame()
+                                frame_event.timestamp = int(start_time * 1000)
+                                frame_event.width = width
+                                frame_event.height = height
+                                frame_event.shm_handle = self.config.SHM_FILE_PATH
+                                frame_event.shm_offset = self.layout.data_offset(read_write_slot(mm))
+                                frame_event.frame_size = len(raw_bytes)
+                                frame_event.encoding = "raw_bgra"
+                                frame_event.frame_seq = frame_seq
+                                frame_event.dirty_rects.extend(flatten_rects(dirty_rects))
+                                
+                                self.bus.publish("video.frame_ready", frame_event)
 
                             # Cap FPS
-                            elapsed = time.time() - start_time
-                            sleep_time = max(0, (1.0 / self.config.CAPTURE_FPS) - elapsed)
-                            time.sleep(sleep_time)
+                            self._sleep_until_next_frame(start_time)
 
         except Exception as e:
             logger.critical(f"❌ Capture loop crashed: {e}")
-            self._running = False
\ No newline at end of file
+            self._running = False
+
+    def _sleep_until_next_frame(self, start_time: float):
+        elapsed = time.time() - start_time
+        sleep_time = max(0, (1.0 / self.config.CAPTURE_FPS) - elapsed)
+        time.sleep(sleep_time)
\ No newline at end of file
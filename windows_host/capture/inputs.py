@@ -2,14 +2,31 @@ import logging
 import time
 import threading
 from pynput import mouse, keyboard
-from typing import Optional
+from typing import Callable, Optional, Set
 
+from windows_host.config import config
 from windows_host.core.bus_producer import BusProducer
 from windows_host.capture.accessibility import AccessibilityScraper
+from windows_host.capture.keystrokes import KeystrokeCoalescer, KeyBurst
 from shared.python.events_pb2 import UserInteraction, MouseEvent, KeyboardEvent, A11yNode
 
 logger = logging.getLogger("InputListener")
 
+# Held modifiers that turn a key press into a hotkey. Shift is just typing; AltGr types characters on many layouts.
+HOTKEY_MODIFIERS = {"ctrl": "ctrl", "ctrl_l": "ctrl", "ctrl_r": "ctrl",
+                    "alt": "alt", "alt_l": "alt", "alt_r": "alt",
+                    "cmd": "win", "cmd_l": "win", "cmd_r": "win"}
+IGNORED_KEYS = {"shift", "shift_l", "shift_r", "alt_gr", "caps_lock"}
+
+
+def _foreground_window() -> int:
+    """Handle of the focused window (0 when unavailable). Typing into another window starts a new burst."""
+    try:
+        import ctypes
+        return ctypes.windll.user32.GetForegroundWindow()
+    except Exception:
+        return 0
+
 # The "Nervous System".
 # Uses pynput to intercept hardware events. Crucially, it orchestrates the AccessibilityScraper. When a click happens, it pauses momentarily to dispatch the scrape request, ensuring the metadata is tied to the click event.
 
@@ -19,12 +36,23 @@ class InputListener:
     Combines raw input with Accessibility Data.
     """
 
-    def __init__(self, bus: BusProducer, session_manager=None):
+    def __init__(self, bus: BusProducer, session_manager=None, frame_clock: Optional[Callable[[], int]] = None):
         self.bus = bus
         self.scraper = AccessibilityScraper()
         self.session = session_manager
         self.mouse_listener = None
         self.key_listener = None
+        # Newest SHM frame_seq at the time of an event (stamps what the user was looking at)
+        self.frame_clock = frame_clock
+
+        # Keystroke bursts: one "type" event per run of typing, stamped with the frame seq at its start
+        self.keystrokes = KeystrokeCoalescer(
+            self._publish_keys,
+            idle_ms=config.INPUT_BURST_IDLE_MS,
+            max_chars=config.INPUT_BURST_MAX_CHARS,
+            frame_clock=frame_clock,
+        )
+        self._held_modifiers: Set[str] = set()
         
         # Debouncing logic
         self.last_click_time = 0
@@ -38,7 +66,8 @@ class InputListener:
             on_scroll=self._on_scroll
         )
         self.key_listener = keyboard.Listener(
-            on_press=self._on_key_press
+            on_press=self._on_key_press,
+            on_release=self._on_key_release
         )
         
         self.mouse_listener.start()
@@ -47,6 +76,7 @@ class InputListener:
     def stop(self):
         if self.mouse_listener: self.mouse_listener.stop()
         if self.key_listener: self.key_listener.stop()
+        self.keystrokes.close()
         self.scraper.shutdown()
         logger.info("👂 Input Listeners stopped.")
 
@@ -65,8 +95,13 @@ class InputListener:
             return
         self.last_click_time = now
 
+        # A click moves focus: whatever was being typed is finished
+        self.keystrokes.flush()
+
         timestamp = int(now * 1000)
         btn_name = str(button).replace('Button.', '')
+        # Read on press, before the click has repainted anything
+        frame_seq = self.frame_clock() if self.frame_clock else 0
 
         logger.info(f"🖱️ Click detected at ({x}, {y})")
 
@@ -78,11 +113,12 @@ class InputListener:
         interaction.mouse.x = x
         interaction.mouse.y = y
         interaction.mouse.button = btn_name
+        interaction.mouse.frame_seq = frame_seq
 
         # ... setup event dict ...
         event_dict = {
             "type": "mouse", "action": "click", "x": x, "y": y, 
-            "button": str(button), "timestamp": timestamp
+            "button": str(button), "timestamp": timestamp, "frame_seq": frame_seq
         }
 
         # --- CHANGED HERE ---
@@ -123,20 +159,58 @@ class InputListener:
         interaction.mouse.x = x
         interaction.mouse.y = y
         interaction.mouse.scroll_delta = dy
+        interaction.mouse.frame_seq = self.frame_clock() if self.frame_clock else 0
         
         self.bus.publish("input.interaction", interaction)
 
     def _on_key_press(self, key):
-        """Log key presses."""
-        try:
-            k = key.char
-        except AttributeError:
-            k = str(key).replace('Key.', '')
+        """Feeds the keystroke coalescer. Printable keys are buffered; hotkeys and special keys flush."""
+        char = getattr(key, "char", None)
+        name = None if char is not None else str(key).replace('Key.', '')
 
+        if name in HOTKEY_MODIFIERS:
+            self._held_modifiers.add(HOTKEY_MODIFIERS[name])
+            return
+        if name in IGNORED_KEYS:
+            return
+
+        window = _foreground_window()
+        if self._held_modifiers:
+            # With Ctrl held pynput reports control characters ('\x03' for Ctrl+C)
+            if char is not None and len(char) == 1 and ord(char) < 32:
+                char = chr(ord(char) + 96)
+            combo = [m for m in ("ctrl", "alt", "win") if m in self._held_modifiers] + [char or name]
+            self.keystrokes.feed_hotkey(combo, window)
+        elif char is not None:
+            self.keystrokes.feed_char(char, window)
+        elif name is not None:
+            self.keystrokes.feed_special(name, window)
+
+    def _on_key_release(self, key):
+        name = str(key).replace('Key.', '')
+        if name in HOTKEY_MODIFIERS:
+            self._held_modifiers.discard(HOTKEY_MODIFIERS[name])
+
+    def _publish_keys(self, burst: KeyBurst):
+        """Coalescer callback (listener or idle thread): one UserInteraction per burst."""
         interaction = UserInteraction()
-        interaction.timestamp = int(time.time() * 1000)
-        interaction.keyboard.type = "press"
-        interaction.keyboard.key = k
-        
+        interaction.timestamp = burst.start_ms
+        interaction.keyboard.timestamp = burst.start_ms
+        interaction.keyboard.type = burst.kind
+        interaction.keyboard.frame_seq = burst.frame_seq
+        if burst.kind == "type":
+            interaction.keyboard.text = burst.text
+            interaction.keyboard.end_timestamp = burst.end_ms
+            interaction.keyboard.key_count = burst.key_count
+        else:
+            interaction.keyboard.key = burst.text
+
+        if self.session:
+            self.session.log_event({
+                "type": "keyboard", "action": burst.kind, "text": burst.text,
+                "timestamp": burst.start_ms, "end_timestamp": burst.end_ms,
+                "key_count": burst.key_count, "frame_seq": burst.frame_seq
+            })
+
         # We don't scrape A11y on typing usually, too slow
-        self.bus.publish("input.interaction", interaction)
\ No newline at end of file
+        self.bus.publish("input.interaction", interaction)
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("KeystrokeCoalescer")
+
+# The "Typist's Ear".
+# Merges runs of printable key presses into one "type" burst (full text + start/end time + frame on screen),
+# so a typed paragraph is one bus message instead of hundreds, and nobody downstream has to reassemble it.
+
+
+@dataclass
+class KeyBurst:
+    kind: str                   # "type" (coalesced text) | "hotkey" ("ctrl+s") | "press" (single special key)
+    text: str                   # Burst text, or the key/combo name
+    start_ms: int
+    end_ms: int
+    key_count: int = 1          # Raw presses merged into this burst (incl. backspaces)
+    frame_seq: int = 0          # Frame on screen when the burst started
+    window: int = 0             # Foreground window handle the keys went to
+    keys: List[str] = field(default_factory=list)
+
+
+class KeystrokeCoalescer:
+    """
+    Thread-safe burst builder fed by the pynput listener thread.
+
+    A burst is flushed when:
+    - a hotkey or a non-text key (enter, tab, esc, arrows...) is pressed,
+    - focus changes (the caller passes the foreground window, or calls flush() on click),
+    - the user pauses for 'idle_ms', or the burst reaches 'max_chars'.
+    """
+
+    # Keys that edit the text rather than end it
+    TEXT_KEYS = {"space": " "}
+
+    def __init__(self, emit: Callable[[KeyBurst], None], idle_ms: int = 1000, max_chars: int = 256,
+                 frame_clock: Optional[Callable[[], int]] = None):
+        self.emit = emit
+        self.idle_s = idle_ms / 1000
+        self.max_chars = max_chars
+        self.frame_clock = frame_clock or (lambda: 0)
+
+        self._lock = threading.Lock()
+        self._burst: Optional[KeyBurst] = None
+        self._chars: List[str] = []
+        self._last_key_time = 0.0
+
+        self._running = True
+        self._wake = threading.Event()
+        self._idle_thread = threading.Thread(target=self._idle_loop, daemon=True)
+        self._idle_thread.start()
+
+    # --- Feeding (listener thread) ---
+
+    def feed_char(self, char: str, window: int = 0):
+        """A printable character (or space)."""
+        now = time.time()
+        ready = []
+        with self._lock:
+            if self._burst and self._burst.window != window:
+                ready.append(self._take())
+
+            if self._burst is None:
+                ts = int(now * 1000)
+                self._burst = KeyBurst("type", "", ts, ts, key_count=0, frame_seq=self.frame_clock(), window=window)
+            self._chars.append(char)
+            self._touch(now)
+
+            if len(self._chars) >= self.max_chars:
+                ready.append(self._take())
+        self._emit_all(ready)
+        self._wake.set()
+
+    def feed_special(self, key_name: str, window: int = 0):
+        """A named key: space/backspace edit the burst, anything else ends it and is emitted on its own."""
+        if key_name in self.TEXT_KEYS:
+            self.feed_char(self.TEXT_KEYS[key_name], window)
+            return
+
+        now = time.time()
+        if key_name == "backspace":
+            with self._lock:
+                if self._burst and self._burst.window == window and self._chars:
+                    self._chars.pop()
+                    self._touch(now)
+                    return
+
+        ts = int(now * 1000)
+        self.flush()
+        self.emit(KeyBurst("press", key_name, ts, ts, frame_seq=self.frame_clock(), window=window, keys=[key_name]))
+
+    def feed_hotkey(self, keys: List[str], window: int = 0):
+        """A combo (modifiers held). Flushes pending text first so ordering is preserved."""
+        ts = int(time.time() * 1000)
+        self.flush()
+        self.emit(KeyBurst("hotkey", "+".join(keys), ts, ts, frame_seq=self.frame_clock(), window=window, keys=keys))
+
+    def flush(self):
+        """Emits the pending burst now (clicks / focus changes)."""
+        with self._lock:
+            ready = [self._take()] if self._burst else []
+        self._emit_all(ready)
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        self._idle_thread.join(timeout=1)
+        self.flush()
+
+    # --- Internals ---
+
+    def _touch(self, now: float):
+        self._burst.key_count += 1
+        self._burst.end_ms = int(now * 1000)
+        self._last_key_time = now
+
+    def _take(self) -> Optional[KeyBurst]:
+        """Detaches the pending burst. Caller holds the lock."""
+        burst, self._burst = self._burst, None
+        if burst:
+            burst.text = "".join(self._chars)
+            self._chars = []
+        return burst
+
+    def _emit_all(self, bursts: List[Optional[KeyBurst]]):
+        # Emitting outside the lock: the callback publishes to the bus
+        for burst in bursts:
+            # A burst fully erased with backspace carries no text; drop it
+            if burst and burst.text:
+                self.emit(burst)
+
+    def _idle_loop(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            while self._running:
+                with self._lock:
+                    if self._burst is None:
+                        break
+                    remaining = self._last_key_time + self.idle_s - time.time()
+                    ready = [self._take()] if remaining <= 0 else []
+                if ready:
+                    self._emit_all(ready)
+                    break
+                time.sleep(remaining)
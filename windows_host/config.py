@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 class WindowsConfig(BaseSettings):
     """
@@ -14,17 +14,37 @@ class WindowsConfig(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+
+    # --- Bus Producer (Background Sender) ---
+    BUS_QUEUE_SIZE: int = 10000       # Max pending events before new ones are dropped
+    BUS_BATCH_SIZE: int = 256         # Flush when this many events are pending...
+    BUS_FLUSH_INTERVAL_MS: int = 10   # ...or when the oldest pending event is this old
+    BUS_STREAM_MAXLEN: int = 2000     # Approximate cap per Redis Stream
+    # Transport per channel ("stream" | "pubsub" | "inprocess"), merged over shared/python/bus_protocol.DEFAULT_CHANNEL_MODES.
+    # Must agree with the WSL Brain for every channel it subscribes to.
+    BUS_DEFAULT_MODE: str = "stream"
+    BUS_CHANNEL_MODES: Dict[str, str] = {}
+    BUS_FORCE_MODE: Optional[str] = None  # "inprocess" runs the host without Redis (local subscribers only)
     
     # --- Shared Memory ---
     # Path on the Windows Filesystem
     # WSL must have this mounted at /mnt/c/temp/bravebird_video.shm
     SHM_FILE_PATH: str = r"C:\temp\bravebird_video.shm"
+    # Ring buffer geometry. Each slot is sized for the worst case (4K BGRA ~= 33 MB).
+    SHM_NUM_SLOTS: int = 3
+    SHM_MAX_WIDTH: int = 3840
+    SHM_MAX_HEIGHT: int = 2160
     
     # --- Screen Capture ---
     CAPTURE_FPS: int = 5 # Low FPS to save tokens, we rely on event triggers
+    CAPTURE_TILE_SIZE: int = 64 # Delta Encoding block size (pixels)
     SCREEN_WIDTH: int = 1920
     SCREEN_HEIGHT: int = 1080
     
+    # --- Input Capture ---
+    INPUT_BURST_IDLE_MS: int = 1000    # Typing pause that ends a keystroke burst
+    INPUT_BURST_MAX_CHARS: int = 256   # Longer bursts are split
+
     # --- Audio ---
     # WebRTC VAD requires 16000Hz and specific frame durations (10, 20, or 30ms)
     AUDIO_SAMPLE_RATE: int = 16000
@@ -38,6 +58,9 @@ class WindowsConfig(BaseSettings):
     # --- Bridge Server ---
     HOST_IP: str = "0.0.0.0"
     BRIDGE_PORT: int = 5050 # Port for WSL to send commands back to Windows
+    BRIDGE_ACTION_PAUSE_S: float = 0.1   # pyautogui pause after a single /action call
+    BRIDGE_BATCH_PAUSE_S: float = 0.0    # Default pause between /actions steps (steps carry their own delay_ms)
+    BRIDGE_BATCH_MAX_STEPS: int = 64
 
     class Config:
         env_prefix = "BB_WIN_"
@@ -1,5 +1,7 @@
 import logging
 import threading
+import time
+from typing import Any, Dict, Optional
 from flask import Flask, request, jsonify
 from werkzeug.serving import make_server
 
@@ -21,18 +23,20 @@ class BridgeServer:
     Endpoints:
     - GET /status: Health check
     - POST /action: Execute mouse/keyboard action
+    - POST /actions: Execute an ordered batch of actions in one round trip
     """
 
     def __init__(self, config: WindowsConfig):
         self.config = config
         self.app = Flask(__name__)
-        self.controller = WindowsController()
+        self.controller = WindowsController(pause=config.BRIDGE_ACTION_PAUSE_S)
         self.server = None
         self.thread = None
         
         # Register Routes
         self.app.add_url_rule('/status', 'status', self.status_handler, methods=['GET'])
         self.app.add_url_rule('/action', 'action', self.action_handler, methods=['POST'])
+        self.app.add_url_rule('/actions', 'actions', self.batch_handler, methods=['POST'])
 
     def status_handler(self):
         """Health check endpoint."""
@@ -45,7 +49,7 @@ class BridgeServer:
         """
         Receives an Action Payload from WSL Agent.
         Schema: {
-            "type": "click"|"type"|"scroll",
+            "type": "click"|"type"|"hotkey"|"scroll",
             "x": int, "y": int, "button": str,
             "text": str, "keys": list
         }
@@ -54,38 +58,103 @@ class BridgeServer:
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        action_type = data.get("type")
-        
         try:
-            if action_type == "click":
-                self.controller.execute_click(
-                    x=int(data.get("x", 0)),
-                    y=int(data.get("y", 0)),
-                    button=data.get("button", "left"),
-                    double=data.get("double", False)
-                )
-            
-            elif action_type == "type":
-                self.controller.execute_type(
-                    text=data.get("text"),
-                    keys=data.get("keys")
-                )
-            
-            elif action_type == "scroll":
-                self.controller.execute_scroll(
-                    amount=int(data.get("amount", 0))
-                )
-            
-            else:
-                logger.warning(f"⚠️ Unknown action type: {action_type}")
-                return jsonify({"error": "Unknown action type"}), 400
-
+            self._execute_step(data)
             return jsonify({"status": "success"})
-            
+
+        except ValueError as e:
+            logger.warning(f"⚠️ {e}")
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             logger.error(f"❌ Error executing action: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
 
+    def batch_handler(self):
+        """
+        Executes an ordered list of steps in one request (e.g. Optimistic UI "click, then type").
+        Schema: {
+            "steps": [{"type": "click"|"type"|"hotkey"|"scroll"|"wait", ...step fields, "delay_ms": int}],
+            "pause_ms": int,          # pyautogui pause after each step (default BRIDGE_BATCH_PAUSE_S)
+            "stop_on_error": bool     # default true
+        }
+        'delay_ms' sleeps after a step; a "wait" step ({"type": "wait", "ms": int}) sleeps on its own.
+        Returns per-step timing: {"status", "results": [{"index", "type", "ok", "duration_ms", "error"?}], "total_ms"}
+        """
+        data = request.json
+        if not data or not isinstance(data.get("steps"), list):
+            return jsonify({"error": "Expected {'steps': [...]}"}), 400
+
+        steps = data["steps"]
+        if len(steps) > self.config.BRIDGE_BATCH_MAX_STEPS:
+            return jsonify({"error": f"Too many steps (max {self.config.BRIDGE_BATCH_MAX_STEPS})"}), 400
+
+        pause = data["pause_ms"] / 1000 if data.get("pause_ms") is not None else self.config.BRIDGE_BATCH_PAUSE_S
+        stop_on_error = data.get("stop_on_error", True)
+
+        results = []
+        batch_start = time.perf_counter()
+        for index, step in enumerate(steps):
+            step_start = time.perf_counter()
+            result: Dict[str, Any] = {"index": index, "type": step.get("type"), "ok": True}
+            try:
+                self._execute_step(step, pause=pause)
+                if step.get("delay_ms"):
+                    time.sleep(step["delay_ms"] / 1000)
+            except Exception as e:
+                # The controller re-raises every failure, FailSafeException included: the rest of the batch must not run
+                result["ok"] = False
+                result["error"] = str(e)
+                logger.error(f"❌ Batch step {index} ({step.get('type')}) failed: {e}")
+            result["duration_ms"] = round((time.perf_counter() - step_start) * 1000, 2)
+            results.append(result)
+            if not result["ok"] and stop_on_error:
+                break
+
+        ok = sum(1 for r in results if r["ok"])
+        status = "success" if ok == len(steps) else ("error" if ok == 0 else "partial")
+        return jsonify({
+            "status": status,
+            "results": results,
+            "total_ms": round((time.perf_counter() - batch_start) * 1000, 2),
+        })
+
+    def _execute_step(self, step: Dict[str, Any], pause: Optional[float] = None):
+        """Dispatches one action to the controller. Raises ValueError for malformed steps."""
+        action_type = step.get("type")
+
+        if action_type == "click":
+            self.controller.execute_click(
+                x=int(step.get("x", 0)),
+                y=int(step.get("y", 0)),
+                button=step.get("button", "left"),
+                double=step.get("double", False),
+                pause=pause
+            )
+
+        elif action_type == "type":
+            self.controller.execute_type(
+                text=step.get("text"),
+                keys=step.get("keys"),
+                pause=pause
+            )
+
+        elif action_type == "hotkey":
+            if not step.get("keys"):
+                raise ValueError("hotkey step requires 'keys'")
+            self.controller.execute_hotkey(step["keys"], pause=pause)
+
+        elif action_type == "scroll":
+            self.controller.execute_scroll(
+                amount=int(step.get("amount", 0)),
+                pause=pause
+            )
+
+        elif action_type == "wait":
+            time.sleep(float(step.get("ms", 0)) / 1000)
+
+        else:
+            raise ValueError(f"Unknown action type: {action_type}")
+
     def start(self):
         """Starts the Flask server in a background thread."""
         logger.info(f"🚀 Starting Bridge Server on port {self.config.BRIDGE_PORT}...")
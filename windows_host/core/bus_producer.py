@@ -1,27 +1,37 @@
 import logging
+import queue
+import threading
 import redis
 import time
-from typing import Optional
+from typing import Callable, Optional, Dict, List, Tuple
 from google.protobuf.message import Message
 
 # Import generated Protobuf classes
 # Note: Ensure the 'shared' directory is in PYTHONPATH
 from shared.python.events_pb2 import BusEvent
+from shared.python.bus_protocol import ChannelMode, resolve_channel_mode
 
 # Import Windows Config
 from windows_host.config import WindowsConfig
+from windows_host.core.transports import HostTransport, StreamTransport, PubSubTransport, InProcessTransport
 
 logger = logging.getLogger("BusProducer")
 
 # The "Nervous System Transmitter".
 # This class is responsible for high-performance, non-blocking event publishing. It uses a Redis Connection Pool to ensure low latency when pushing thousands of mouse events or audio chunks per minute.
+# publish() only serializes and enqueues: a background sender thread drains the queue and ships events in Redis pipelines,
+# so the pynput hooks and the audio thread never wait on the network round trip to WSL.
+# Each channel is routed to a transport (stream / pubsub / in-process) resolved from config; see shared/python/bus_protocol.py.
+
+_STOP = object()  # Sentinel that wakes the sender thread on shutdown
 
 class BusProducer:
     """
     High-performance Event Publisher for the Windows Host.
     Publishes Protobuf messages to the Redis instance running in WSL.
-    
+
     Design Pattern: Singleton-ish (managed by Main) / Producer.
+    Delivery: Asynchronous, batched (one pipeline per flush), bounded (drops when the queue is full).
     """
 
     def __init__(self, config: WindowsConfig):
@@ -29,11 +39,40 @@ class BusProducer:
         self._redis_client: Optional[redis.Redis] = None
         self._is_connected = False
 
+        # Transports
+        self._inproc = InProcessTransport()
+        self._transports: Dict[ChannelMode, HostTransport] = {
+            ChannelMode.STREAM: StreamTransport(config.BUS_STREAM_MAXLEN),
+            ChannelMode.PUBSUB: PubSubTransport(),
+            ChannelMode.INPROC: self._inproc,
+        }
+        self._channel_modes: Dict[str, ChannelMode] = {}
+
+        # Background sender
+        self._queue: "queue.Queue" = queue.Queue(maxsize=config.BUS_QUEUE_SIZE)
+        self._sender_thread: Optional[threading.Thread] = None
+        self._flush_interval = config.BUS_FLUSH_INTERVAL_MS / 1000.0
+
+        # Counters (written by the sender thread / publishers, read by stats())
+        self._published = 0
+        self._dropped = 0
+        self._failed = 0
+        self._flushes = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._flush_time_last = 0.0
+        self._last_drop_warning = 0.0
+
     def connect(self):
-        """Establishes connection to the WSL Redis server."""
+        """Establishes connection to the WSL Redis server and starts the sender thread."""
+        if self.config.BUS_FORCE_MODE == ChannelMode.INPROC.value:
+            logger.info("🔌 Bus Producer running in-process (no Redis).")
+            self._start_sender()
+            return
+
         try:
             logger.info(f"🔌 Connecting to Redis Bus at {self.config.REDIS_HOST}:{self.config.REDIS_PORT}...")
-            
+
             # Use a connection pool for thread safety and performance
             pool = redis.ConnectionPool(
                 host=self.config.REDIS_HOST,
@@ -42,53 +81,149 @@ class BusProducer:
                 decode_responses=False # We are sending binary Protobufs
             )
             self._redis_client = redis.Redis(connection_pool=pool)
-            
+
             # Test connection
             self._redis_client.ping()
-            self._is_connected = True
+            self._start_sender()
             logger.info("✅ Connected to Event Bus.")
-            
+
         except redis.ConnectionError as e:
             logger.critical(f"❌ Failed to connect to Redis: {e}")
             self._is_connected = False
             raise e
 
+    def _start_sender(self):
+        self._is_connected = True
+        self._sender_thread = threading.Thread(target=self._sender_loop, name="BusSender", daemon=True)
+        self._sender_thread.start()
+
+    def add_local_listener(self, channel: str, callback: Callable[[bytes], None]):
+        """Receives raw payloads of an in-process channel (called on the sender thread)."""
+        self._inproc.add_listener(channel, callback)
+
+    def mode_for(self, channel: str) -> ChannelMode:
+        mode = self._channel_modes.get(channel)
+        if mode is None:
+            mode = resolve_channel_mode(channel, self.config.BUS_CHANNEL_MODES,
+                                        self.config.BUS_DEFAULT_MODE, self.config.BUS_FORCE_MODE)
+            self._channel_modes[channel] = mode
+        return mode
+
     def publish(self, channel: str, message: Message, event_id: str = None):
         """
-        Publishes a Protobuf message to a specific channel.
-        
+        Enqueues a Protobuf message for a specific channel. Never blocks.
+
         Args:
             channel: The topic (e.g., 'input.mouse', 'video.frames').
             message: The specific Protobuf object (e.g., MouseEvent).
             event_id: Optional UUID for tracing.
         """
-        if not self._is_connected or not self._redis_client:
+        if not self._is_connected:
             logger.warning("⚠️ Attempted to publish while disconnected.")
             return
 
+        # Wrap in the generic BusEvent envelope if needed,
+        # or send raw bytes if the subscriber expects specific types.
+        # Here we assume subscribers listen for specific proto types on specific channels.
+        payload = message.SerializeToString()
+
+        try:
+            self._queue.put_nowait((channel, payload))
+        except queue.Full:
+            self._dropped += 1
+            now = time.monotonic()
+            if now - self._last_drop_warning > 5.0:
+                self._last_drop_warning = now
+                logger.warning(f"⚠️ Bus queue full ({self._queue.maxsize}). Dropping events ({self._dropped} total).")
+
+    def _sender_loop(self):
+        """Drains the queue into Redis pipelines. Flushes on batch size or flush interval."""
+        logger.info("📮 Bus sender thread started.")
+        stopping = False
+
+        while not stopping:
+            # Block until there is at least one event
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch: List[Tuple[str, bytes]] = [item]
+            deadline = time.monotonic() + self._flush_interval
+
+            # Collect more until the batch is full or the oldest event reaches the flush interval
+            while len(batch) < self.config.BUS_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+        # Drain whatever is left so a clean shutdown does not lose events
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._flush(leftover)
+        logger.info("📮 Bus sender thread stopped.")
+
+    def _flush(self, batch: List[Tuple[str, bytes]]):
+        """Sends one batch in a single non-transactional pipeline (one network round trip)."""
+        start = time.perf_counter()
         try:
-            # Wrap in the generic BusEvent envelope if needed, 
-            # or send raw bytes if the subscriber expects specific types.
-            # Here we assume subscribers listen for specific proto types on specific channels.
-            
-            payload = message.SerializeToString()
-            
-            # --- CHANGED HERE ---
-            # Old: self._redis_client.publish(channel, payload)
-            # New: Use Redis Stream (XADD). maxlen caps the buffer to prevent RAM overflow.
-            self._redis_client.xadd(channel, {"data": payload}, maxlen=2000)
-            # --------------------
-            
-            # Debug log (verbose only for low-frequency events)
-            if "video" not in channel and "audio" not in channel:
-                logger.debug(f"📤 Published to [{channel}]: {len(payload)} bytes")
-                
+            pipe = self._redis_client.pipeline(transaction=False) if self._redis_client else None
+            for channel, payload in batch:
+                transport = self._transports[self.mode_for(channel)]
+                if transport.uses_redis and pipe is None:
+                    raise RuntimeError(f"[{channel}] needs Redis but the producer runs in-process")
+                transport.send(pipe, channel, payload)
+            if pipe is not None and len(pipe):
+                pipe.execute()
+            self._published += len(batch)
         except Exception as e:
-            logger.error(f"❌ Publish failed on {channel}: {e}")
+            self._failed += len(batch)
+            logger.error(f"❌ Publish failed for batch of {len(batch)} events: {e}")
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            self._flushes += 1
+            self._flush_time_total += elapsed
+            self._flush_time_last = elapsed
+            self._flush_time_max = max(self._flush_time_max, elapsed)
+
+        logger.debug(f"📤 Flushed {len(batch)} events in {elapsed * 1000:.2f}ms")
+
+    def stats(self) -> Dict[str, float]:
+        """Bus health counters (queue depth, drops, flush latency)."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "published": self._published,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "flushes": self._flushes,
+            "avg_batch_size": (self._published + self._failed) / self._flushes if self._flushes else 0.0,
+            "flush_ms_last": self._flush_time_last * 1000,
+            "flush_ms_avg": (self._flush_time_total / self._flushes * 1000) if self._flushes else 0.0,
+            "flush_ms_max": self._flush_time_max * 1000,
+        }
 
     def close(self):
-        """Closes the Redis connection."""
+        """Flushes pending events and closes the Redis connection."""
+        if self._sender_thread:
+            self._queue.put(_STOP)
+            self._sender_thread.join(timeout=5)
+            self._sender_thread = None
+        self._is_connected = False
         if self._redis_client:
             self._redis_client.close()
-            self._is_connected = False
-            logger.info("🔒 Bus Producer closed.")
\ No newline at end of file
+        logger.info(f"🔒 Bus Producer closed. Stats: {self.stats()}")
@@ -1,6 +1,8 @@
 import logging
+import threading
 import pyautogui
 import time
+from contextlib import contextmanager
 from typing import Dict, List, Optional
 
 logger = logging.getLogger("WindowsController")
@@ -14,17 +16,37 @@ class WindowsController:
     Executes actions requested by the WSL Brain.
     
     Safety: Includes Fail-Safes to prevent the agent from taking over the mouse uncontrollably.
+    Errors (including pyautogui.FailSafeException) are logged and re-raised, so the Bridge reports them
+    and a batch stops instead of carrying on.
     """
 
-    def __init__(self):
+    def __init__(self, pause: float = 0.1):
         # Fail-Safe: Moving mouse to (0,0) kills the script
         pyautogui.FAILSAFE = True
-        # Small pause between actions for stability
-        pyautogui.PAUSE = 0.1
+        # Small pause between actions for stability (default; callers can override per call)
+        self.default_pause = pause
+        pyautogui.PAUSE = pause
+        # pyautogui.PAUSE is process-global, so per-call overrides are serialized
+        self._lock = threading.RLock()
         logger.info("🦾 Windows Controller Initialized.")
 
-    def execute_click(self, x: int, y: int, button: str = "left", double: bool = False):
+    @contextmanager
+    def pause(self, seconds: Optional[float]):
+        """Temporarily overrides pyautogui's post-call pause (None = keep the default)."""
+        with self._lock:
+            previous = pyautogui.PAUSE
+            pyautogui.PAUSE = self.default_pause if seconds is None else seconds
+            try:
+                yield
+            finally:
+                pyautogui.PAUSE = previous
+
+    def execute_click(self, x: int, y: int, button: str = "left", double: bool = False, pause: Optional[float] = None):
         """Executes a mouse click."""
+        with self.pause(pause):
+            self._click(x, y, button, double)
+
+    def _click(self, x: int, y: int, button: str, double: bool):
         try:
             # Ensure coordinates are within screen bounds
             screen_w, screen_h = pyautogui.size()
@@ -43,9 +65,14 @@ class WindowsController:
             raise
         except Exception as e:
             logger.error(f"❌ Click failed: {e}")
+            raise
 
-    def execute_type(self, text: Optional[str], keys: Optional[List[str]]):
+    def execute_type(self, text: Optional[str], keys: Optional[List[str]], pause: Optional[float] = None):
         """Executes keyboard input."""
+        with self.pause(pause):
+            self._type(text, keys)
+
+    def _type(self, text: Optional[str], keys: Optional[List[str]]):
         try:
             if text:
                 logger.info(f"⌨️ Typing text: '{text}'")
@@ -57,16 +84,29 @@ class WindowsController:
                 # Handle combos like ['ctrl', 'c']
                 pyautogui.hotkey(*keys)
                 
+        except pyautogui.FailSafeException:
+            logger.critical("🚨 FAILSAFE TRIGGERED. Stopping execution.")
+            raise
         except Exception as e:
             logger.error(f"❌ Keyboard action failed: {e}")
+            raise
+
+    def execute_hotkey(self, keys: List[str], pause: Optional[float] = None):
+        """Presses a key combination, e.g. ['ctrl', 's']."""
+        self.execute_type(None, keys, pause=pause)
 
-    def execute_scroll(self, amount: int):
+    def execute_scroll(self, amount: int, pause: Optional[float] = None):
         """Executes scrolling."""
-        try:
-            logger.info(f"📜 Scrolling {amount}")
-            pyautogui.scroll(amount)
-        except Exception as e:
-            logger.error(f"❌ Scroll failed: {e}")
+        with self.pause(pause):
+            try:
+                logger.info(f"📜 Scrolling {amount}")
+                pyautogui.scroll(amount)
+            except pyautogui.FailSafeException:
+                logger.critical("🚨 FAILSAFE TRIGGERED. Stopping execution.")
+                raise
+            except Exception as e:
+                logger.error(f"❌ Scroll failed: {e}")
+                raise
 
     def get_screen_size(self):
         return pyautogui.size()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import logging
+from typing import Callable, Dict, List
+
+from shared.python.bus_protocol import ChannelMode, encode_stream_entry
+
+logger = logging.getLogger("BusTransports")
+
+# The Transport Layer under the BusProducer. Each ChannelMode knows how to put one payload on the wire.
+# Redis transports only append commands to the sender's pipeline, so a mixed batch still costs one round trip.
+
+
+class HostTransport:
+    """Base class. 'pipe' is the sender's Redis pipeline (None when the producer runs without Redis)."""
+
+    mode: ChannelMode
+    uses_redis = True
+
+    def send(self, pipe, channel: str, payload: bytes):
+        raise NotImplementedError
+
+
+class StreamTransport(HostTransport):
+    """XADD. Durable: consumer groups on the WSL side pick up anything sent while they were down."""
+
+    mode = ChannelMode.STREAM
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+
+    def send(self, pipe, channel: str, payload: bytes):
+        # Approximate maxlen caps the buffer to prevent RAM overflow cheaply
+        pipe.xadd(channel, encode_stream_entry(payload), maxlen=self.maxlen, approximate=True)
+
+
+class PubSubTransport(HostTransport):
+    """PUBLISH. Fire-and-forget: no storage, no ACKs. For high-rate signals where only the newest value matters."""
+
+    mode = ChannelMode.PUBSUB
+
+    def send(self, pipe, channel: str, payload: bytes):
+        pipe.publish(channel, payload)
+
+
+class InProcessTransport(HostTransport):
+    """Delivers to local callbacks on the sender thread. Lets the host run (and be tested) without Redis."""
+
+    mode = ChannelMode.INPROC
+    uses_redis = False
+
+    def __init__(self):
+        self._callbacks: Dict[str, List[Callable[[bytes], None]]] = {}
+
+    def add_listener(self, channel: str, callback: Callable[[bytes], None]):
+        self._callbacks.setdefault(channel, []).append(callback)
+
+    def send(self, pipe, channel: str, payload: bytes):
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"❌ Local listener failed on [{channel}]: {e}")
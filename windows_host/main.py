@@ -11,6 +11,7 @@ from windows_host.capture.fast_screen import ScreenCapturer
 from windows_host.capture.inputs import InputListener
 from windows_host.audio.mic_stream import MicrophoneStream
 from windows_host.recorder.session import SessionManager
+from shared.python.events_pb2 import RecordingControlEvent
 # Setup Console Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,21 +31,17 @@ class WindowsHostApp:
         # 2. Initialize Bridge (Inbound)
         self.bridge = BridgeServer(config)
         
-        # 3. Initialize Sensors
-        self.screen = ScreenCapturer(config, self.bus)
-        self.inputs = InputListener(self.bus)
-        self.audio = MicrophoneStream(config, self.bus)
-
-        # --- CHANGED HERE ---
+        # 3. Start the recording session (sensors write into it)
         # Create a session ID based on timestamp
-        session_id = f"trace_{int(time.time())}"
-        self.session = SessionManager(session_id)
+        self.session_id = f"trace_{int(time.time())}"
+        self.session = SessionManager(self.session_id)
         self.session.start_recording()
-        
-        # Pass session to sensors
+
+        # 4. Initialize Sensors (once each: they own threads, listeners and the SHM mapping)
         self.screen = ScreenCapturer(config, self.bus, self.session)
-        self.inputs = InputListener(self.bus, self.session)
-        # --------------------
+        self.inputs = InputListener(self.bus, self.session,
+                                    frame_clock=lambda: self.screen.latest_frame_seq)
+        self.audio = MicrophoneStream(config, self.bus)
 
     def start(self):
         logger.info("🚀 Starting Bravebird Windows Host...")
@@ -52,6 +49,8 @@ class WindowsHostApp:
         try:
             # Connect to Redis (WSL)
             self.bus.connect()
+            # Lets the Brain's LiveSynthesizer follow the recording
+            self._publish_recording("start")
             
             # Start Action Receiver
             self.bridge.start()
@@ -86,11 +85,21 @@ class WindowsHostApp:
         self.inputs.stop()
         self.screen.stop()
         self.bridge.stop()
+        # Before close(): the producer flushes its queue on close
+        self._publish_recording("stop")
         self.bus.close()
         self.session.close() # Ensure video saves correctly
         logger.info("💀 Windows Host Offline.")
         sys.exit(0)
 
+    def _publish_recording(self, command: str):
+        event = RecordingControlEvent()
+        event.command = command
+        event.session_id = self.session_id
+        event.output_name = self.session_id
+        event.timestamp = int(time.time() * 1000)
+        self.bus.publish("control.recording", event)
+
 if __name__ == "__main__":
     app = WindowsHostApp()
     app.start()
\ No newline at end of file
@@ -14,19 +14,28 @@ class SessionManager:
         self.log_file = open(os.path.join(self.path, "events.jsonl"), "a", encoding="utf-8")
         self.video_path = os.path.join(self.path, "video.mp4")
         self.ffmpeg = None
+        self._video_started = False
 
     def start_recording(self):
         # ffmpeg reading raw bgra from stdin
+        # Delta Encoding suppresses unchanged frames, so frames are stamped with their arrival time
+        # (wallclock) and encoded as variable frame rate instead of assuming a fixed 5 FPS cadence.
         cmd = [
             'ffmpeg', '-y', 
-            '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', '1920x1080', '-pix_fmt', 'bgra', '-r', '5',
+            '-use_wallclock_as_timestamps', '1',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', '1920x1080', '-pix_fmt', 'bgra',
             '-i', '-', 
+            '-fps_mode', 'vfr',
             '-c:v', 'libx264', '-preset', 'ultrafast', '-qp', '0', 
             self.video_path
         ]
         self.ffmpeg = subprocess.Popen(cmd, stdin=subprocess.PIPE)
 
     def write_video_frame(self, raw_bytes):
+        if self.ffmpeg and not self._video_started:
+            # Video time 0 in epoch ms: lets the ingester map event timestamps onto the recording
+            self._video_started = True
+            self.log_event({"type": "session", "action": "video_start", "timestamp": int(time.time() * 1000)})
         if self.ffmpeg:
             try:
                 self.ffmpeg.stdin.write(raw_bytes)
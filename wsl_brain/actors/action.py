@@ -26,16 +26,26 @@ class ActionActor(BaseActor):
         logger.info(f"[{self.name}] Initializing Sandboxes...")
         
         # 1. Arrakis (Linux MicroVM)
-        self.sandboxes["linux"] = ArrakisSandbox(base_url=settings.ARRAKIS_URL)
+        self.sandboxes["linux"] = ArrakisSandbox({"arrakis_url": settings.ARRAKIS_URL})
         
         # 2. Windows Bridge (Host OS)
-        self.sandboxes["windows"] = WindowsBridgeSandbox(base_url=settings.WINDOWS_BRIDGE_URL)
+        self.sandboxes["windows"] = WindowsBridgeSandbox({"bridge_url": settings.WINDOWS_BRIDGE_URL})
+
+        # Open pooled sessions and start the health pings before the first action arrives (Arrakis also boots its VM)
+        for name, sandbox in self.sandboxes.items():
+            if not await sandbox.start():
+                logger.warning(f"[{self.name}] Sandbox '{name}' failed to start; actions will retry lazily.")
         
         # Subscribe
         await self.bus.subscribe("action.request", ActionRequestEvent, self.handle_action)
 
     async def cleanup(self):
-        pass
+        # Whatever setup booted is destroyed again (Arrakis VM); hosts that outlive us only drop their sessions
+        for sandbox in self.sandboxes.values():
+            if sandbox.boots_environment:
+                await sandbox.stop()
+            else:
+                await sandbox.release()
 
     async def handle_action(self, event: ActionRequestEvent):
         """
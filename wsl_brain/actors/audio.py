@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import io
 import numpy as np
@@ -5,7 +6,7 @@ from faster_whisper import WhisperModel
 
 from wsl_brain.actors.base_actor import BaseActor
 from wsl_brain.core.config import settings
-from wsl_brain.core.resources import gpu_manager
+from wsl_brain.core.resources import gpu_scheduler, Priority
 from shared.python.events_pb2 import AudioChunkEvent, UserTranscriptEvent
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,11 @@ class AudioActor(BaseActor):
         # Cleanup model resources if needed
         pass
 
+    def _transcribe(self, audio_data: np.ndarray):
+        segments, _ = self.model.transcribe(audio_data, beam_size=1, language="en")
+        # 'segments' is lazy: decoding happens while iterating, so do it here (inside the GPU slot)
+        return list(segments)
+
     async def handle_audio(self, event: AudioChunkEvent):
         """
         Process a chunk of audio detected by VAD on Windows.
@@ -45,9 +51,10 @@ class AudioActor(BaseActor):
         
         # 2. Transcribe
         # beam_size=1 for speed, we need low latency commands
-        async with gpu_manager.gpu_lock:
-            segments, info = self.model.transcribe(audio_data, beam_size=1, language="en")
-        
+        # Voice commands outrank prefetches and background work, but never an in-flight click
+        async with gpu_scheduler.slot("whisper", Priority.VOICE):
+            segments = await asyncio.to_thread(self._transcribe, audio_data)
+
         full_text = " ".join([segment.text for segment in segments]).strip()
 
         if full_text:
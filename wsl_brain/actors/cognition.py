@@ -1,7 +1,18 @@
 import logging
+import asyncio
+import uuid
+from typing import Dict, Optional
 from wsl_brain.actors.base_actor import BaseActor
+from wsl_brain.core.config import settings
 from wsl_brain.core.orchestration_logic import VLMOrchestratedAgent
-from shared.python.events_pb2 import UserTranscriptEvent, WorkflowStartEvent, GroundingResultEvent
+from wsl_brain.core.context_cache import GeminiContextCache
+from wsl_brain.core.conversation import ConversationBuffer
+from wsl_brain.core.speculation import SpeculativeGrounder
+from shared.python.parsed_screen import ParsedScreen
+from shared.python.events_pb2 import (
+    UserTranscriptEvent, WorkflowStartEvent, GroundingRequestEvent, GroundingResultEvent,
+    ScreenParseRequestEvent, VisualStateEvent
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +26,21 @@ class CognitionActor(BaseActor):
 
     def __init__(self, bus):
         super().__init__(bus, name="CognitionActor")
-        self.agent = VLMOrchestratedAgent(llm_client=GeminiClient())
+        context_cache = None
+        if settings.GEMINI_CONTEXT_CACHE_ENABLED:
+            if GeminiContextCache.supports(settings.GEMINI_MODEL_NAME):
+                context_cache = GeminiContextCache()
+            else:
+                logger.warning(f"⚠️ [{self.name}] Context cache disabled: '{settings.GEMINI_MODEL_NAME}' is not "
+                               f"a versioned model name (e.g. 'gemini-1.5-flash-002')")
+        self.agent = VLMOrchestratedAgent(llm_client=GeminiClient(), context_cache=context_cache)
         self.current_goal = None
-        self.message_history = []
+        self.message_history = ConversationBuffer()
+        # OmniParser view of the screen the current step was decided on
+        self.current_parsed_screen: Optional[Dict] = None
+        self._pending_screens: Dict[str, asyncio.Future] = {}
+        # Grounds the announced next click target while the current action executes
+        self.speculator = SpeculativeGrounder(bus) if settings.SPECULATION_ENABLED else None
 
     async def setup(self):
         # Listen for User Voice commands
@@ -26,9 +49,17 @@ class CognitionActor(BaseActor):
         await self.bus.subscribe("cognition.start_workflow", WorkflowStartEvent, self.on_workflow_start)
         # Listen for Grounding results to continue the loop
         await self.bus.subscribe("perception.grounding_result", GroundingResultEvent, self.on_grounding_result)
+        # Parsed screens requested by _execute_next_step
+        await self.bus.subscribe("perception.visual_state", VisualStateEvent, self.on_visual_state)
+        if self.speculator:
+            await self.speculator.start()
 
     async def cleanup(self):
-        pass
+        if self.agent.context_cache:
+            logger.info(f"[{self.name}] Context cache: {self.agent.context_cache.stats}")
+            await self.agent.context_cache.close()
+        if self.speculator:
+            logger.info(f"[{self.name}] Speculation: {self.speculator.stats}")
 
     async def on_user_voice(self, event: UserTranscriptEvent):
         """
@@ -52,10 +83,13 @@ class CognitionActor(BaseActor):
         await self._execute_next_step()
 
     async def _execute_next_step(self):
-        # 1. Get Visual State from Perception (contains OmniParser info)
-        # Note: We assume PerceptionActor now returns 'parsed_screen' object
-        # matching OmniTool format (screen_info string + bbox list)
-        
+        # 1. Get Visual State from Perception (OmniParser view in OmniTool format: screen_info + bbox list)
+        parsed_screen = await self.request_screen()
+        if parsed_screen is None:
+            logger.error(f"[{self.name}] No parsed screen for the next step. Skipping.")
+            return
+        self.current_parsed_screen = parsed_screen
+
         # 2. Run Orchestrator Step
         action_json, sys_prompt = await self.agent.step(
             self.message_history, 
@@ -66,21 +100,92 @@ class CognitionActor(BaseActor):
         if action_json.get("Next Action") == "None":
             logger.info("✅ Task Completed according to Agent.")
             # Trigger Evaluation
+        elif action_json.get("Next Action") == "gui_click":
+            await self._dispatch_click(action_json)
+            await self._prefetch_next_step(action_json)
         else:
             # Dispatch Action
             await self.bus.publish_action(action_json)
+            # Speculate: ground the next click target on the current frame while this action runs
+            await self._prefetch_next_step(action_json)
+
+    async def _dispatch_click(self, action_json: Dict):
+        """A Box ID is clicked at its element's center (no grounding call); a named Target goes to UI-Ins."""
+        coords = self.agent.resolve_box_id(action_json, self.current_parsed_screen)
+        if coords is not None:
+            logger.info(f"[{self.name}] Box ID {action_json['Box ID']} -> click at {coords[0]}, {coords[1]}")
+            await self._click(*coords)
+            return
+        target = action_json.get("Target")
+        if not target:
+            logger.warning(f"[{self.name}] gui_click without a usable Box ID or Target: {action_json}")
+            return
+        await self.request_grounding(target)
+
+    async def _prefetch_next_step(self, action_json: Dict):
+        if self.speculator:
+            await self.speculator.prefetch_next(action_json, self.current_parsed_screen)
+
+    async def request_screen(self) -> Optional[Dict]:
+        """Asks Perception to parse the current screen. Returns the OmniTool-format dict, or None."""
+        request = ScreenParseRequestEvent()
+        request.request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending_screens[request.request_id] = future
+        try:
+            await self.bus.publish("perception.parse_request", request)
+            event = await asyncio.wait_for(future, settings.SCREEN_PARSE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logger.error(f"[{self.name}] Screen parse timed out after {settings.SCREEN_PARSE_TIMEOUT_S}s")
+            return None
+        finally:
+            self._pending_screens.pop(request.request_id, None)
+
+        if event.error:
+            logger.error(f"[{self.name}] Screen parse failed: {event.error}")
+            return None
+        elements = [{"type": el.type, "content": el.content, "bbox": list(el.bbox), "interactivity": el.interactivity}
+                    for el in event.elements]
+        return {"screen_info": event.screen_info, "parsed_content_list": elements,
+                "parsed_screen": ParsedScreen(elements), "frame_seq": event.frame_seq}
+
+    async def on_visual_state(self, event: VisualStateEvent):
+        future = self._pending_screens.get(event.request_id)
+        if future is not None and not future.done():
+            future.set_result(event)
+
+    async def request_grounding(self, instruction: str):
+        """Grounds a target: from the speculative prefetch if it is still valid, otherwise via Perception."""
+        if self.speculator:
+            prefetched = self.speculator.take(instruction)
+            if prefetched is not None:
+                await self._act_on_grounding(prefetched)
+                return
+
+        request = GroundingRequestEvent()
+        request.request_id = uuid.uuid4().hex
+        request.instruction = instruction
+        await self.bus.publish("perception.grounding_request", request)
 
     async def on_grounding_result(self, event: GroundingResultEvent):
         """
         Perception Actor found the coordinates. Now we act.
         """
+        if self.speculator and self.speculator.owns(event.request_id):
+            # Speculative answers are held by the speculator until the step actually needs them
+            return
+        await self._act_on_grounding(event)
+
+    async def _act_on_grounding(self, event: GroundingResultEvent):
         if event.confidence < 0.5:
             logger.warning(f"[{self.name}] Low confidence grounding. Retrying logic...")
             # Handle failure logic
             return
 
         logger.info(f"[{self.name}] Grounding success. Executing click at {event.x}, {event.y}")
-        
+        await self._click(event.x, event.y)
+
+    async def _click(self, x: int, y: int):
         # Create Action Event
-        action = self.controller.create_click_action(event.x, event.y)
+        action = self.controller.create_click_action(x, y)
         await self.bus.publish_action_request(action)
\ No newline at end of file
@@ -1,16 +1,21 @@
 import logging
-import base64
+import asyncio
 import cv2
-import requests
 import json
 import time
-from typing import Dict, Tuple
+from typing import Callable, Dict, Optional, Tuple
 
 from wsl_brain.actors.base_actor import BaseActor
 from wsl_brain.core.config import settings
 from wsl_brain.core.shm_reader import SharedMemoryReader
-from wsl_brain.core.resources import gpu_manager
-from shared.python.events_pb2 import VisualStateEvent, GroundingRequestEvent, GroundingResultEvent
+from wsl_brain.core.grounding_cache import GroundingCache
+from wsl_brain.core.parse_cache import OmniParserCache
+from wsl_brain.core.inference_client import inference_client, InferenceError
+from wsl_brain.core.resources import gpu_scheduler, Priority, StaleRequest
+from wsl_brain.core.speculation import SPECULATIVE_PREFIX
+from shared.python.events_pb2 import (
+    VisualFrame, VisualStateEvent, ScreenParseRequestEvent, GroundingRequestEvent, GroundingResultEvent
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +32,14 @@ class PerceptionActor(BaseActor):
     def __init__(self, bus):
         super().__init__(bus, name="PerceptionActor")
         self.shm_reader = SharedMemoryReader()
+        self.grounding_cache = GroundingCache()
+        self.parse_cache = OmniParserCache()
         self.last_frame_processed = 0
+        # Newest frame pointer announced by Windows (conflated: bursts never queue up here)
+        self.latest_frame: Optional[VisualFrame] = None
+        # Bumped by every grounding request the agent waits on. Cognition acts on whatever answer arrives,
+        # so once it asked for a newer target, older requests (and prefetches) are dropped from the GPU queue
+        self._interactive_grounding = 0
 
     async def setup(self):
         # Establish connection to the shared memory block written by Windows
@@ -36,12 +48,22 @@ class PerceptionActor(BaseActor):
         
         # Subscribe to requests
         await self.bus.subscribe("perception.grounding_request", GroundingRequestEvent, self.handle_grounding)
+        # One at a time: the parse cache diffs each screen against the previous one
+        await self.bus.subscribe("perception.parse_request", ScreenParseRequestEvent, self.handle_parse_request,
+                                 max_concurrency=1)
+        # Only the newest frame matters; the pixels themselves are read from SHM on demand
+        await self.bus.subscribe("video.frame_ready", VisualFrame, self.on_frame_ready, conflate=True)
         
         # Start the heartbeat loop (optional: periodic visual scanning)
         self.run_in_background(self._visual_heartbeat())
 
     async def cleanup(self):
         self.shm_reader.close()
+        logger.info(f"[{self.name}] Grounding cache: {self.grounding_cache.stats()}")
+        self.grounding_cache.close()
+
+    async def on_frame_ready(self, event: VisualFrame):
+        self.latest_frame = event
 
     async def _visual_heartbeat(self):
         """
@@ -54,69 +76,184 @@ class PerceptionActor(BaseActor):
             # Logic to grab frame and maybe run lightweight check could go here
             pass
 
+    async def parse_screen(self, is_stale: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """
+        OmniParser view of the current screen in OmniTool format ({'screen_info', 'parsed_content_list'}),
+        plus 'parsed_screen' (a ParsedScreen index for Box ID -> coordinate lookups) and 'frame_seq'.
+        Only the regions that changed since the previous call are re-parsed.
+        Raises StaleRequest if is_stale() turns True while waiting for the GPU.
+        """
+        view = self.shm_reader.read_view()
+        if view is None:
+            return None
+        with view:
+            # OmniParser may take a while: work on a private copy and give the slot back immediately
+            frame, frame_seq = view.bgra.copy(), view.frame_seq
+
+        async with gpu_scheduler.slot("omniparser", Priority.INTERACTIVE, is_stale=is_stale):
+            try:
+                parsed = await self.parse_cache.parse(frame)
+            except Exception as e:
+                logger.error(f"[{self.name}] OmniParser Service Failed: {e}")
+                return None
+
+        logger.debug(f"[{self.name}] Screen parsed ({parsed.mode}, {parsed.parsed_area:.0%} of frame)")
+        return {"screen_info": parsed.screen_info, "parsed_content_list": parsed.elements,
+                "parsed_screen": parsed.screen, "frame_seq": frame_seq}
+
+    async def handle_parse_request(self, event: ScreenParseRequestEvent):
+        """Cognition needs the screen for its next step: parse it and publish the elements."""
+        state = VisualStateEvent()
+        state.request_id = event.request_id
+        # Past this deadline Cognition has stopped waiting for the answer
+        deadline = time.time() + settings.SCREEN_PARSE_TIMEOUT_S
+        try:
+            parsed = await self.parse_screen(is_stale=lambda: time.time() > deadline)
+        except StaleRequest as e:
+            logger.debug(f"[{self.name}] Dropped screen parse {event.request_id}: {e}")
+            return
+        if parsed is None:
+            state.error = "Screen parse failed"
+        else:
+            state.frame_seq = parsed["frame_seq"]
+            state.screen_info = parsed["screen_info"]
+            for element in parsed["parsed_content_list"]:
+                item = state.elements.add()
+                item.type = element.get("type") or ""
+                item.content = str(element.get("content") or "")
+                item.bbox.extend(float(v) for v in element["bbox"])
+                item.interactivity = bool(element.get("interactivity", False))
+        await self.bus.publish("perception.visual_state", state)
+
     async def handle_grounding(self, event: GroundingRequestEvent):
         """
         Handles a request to find specific UI elements (e.g., "Click the Save button").
         Uses UI-Ins for SOTA grounding.
+        Multi-target requests ('instructions') are grounded against one frame in a single /ground_many call.
+        Answers already known for these pixels come from the grounding cache without touching the GPU.
+        The SHM slot is only pinned while the frame is read here; it is released before queueing for the GPU.
         """
-        logger.info(f"[{self.name}] Processing grounding request for: '{event.instruction}'")
+        instructions = list(event.instructions) or [event.instruction]
+        multi = len(instructions) > 1
+        speculative = event.request_id.startswith(SPECULATIVE_PREFIX)
+        if not speculative:
+            self._interactive_grounding += 1
+        generation = self._interactive_grounding
+        logger.info(f"[{self.name}] Processing grounding request for: {instructions}")
         start_time = time.time()
 
-        # 1. Read latest frame from SHM
-        # Assumes 4K resolution (adjust in config)
-        frame = self.shm_reader.read_frame(width=3840, height=2160)
+        # 1. Pin the latest complete frame in the SHM ring (zero-copy)
+        # Resolution is taken from the slot header written by Windows
+        view = self.shm_reader.read_view()
         
-        if frame is None:
+        if view is None:
             logger.error(f"[{self.name}] Failed to read frame from SHM.")
             await self._publish_error(event.request_id, "Video stream unavailable")
             return
 
-        # 2. Prepare payload for UI-Ins Service
-        # We encode to base64 here because the Inference Service is HTTP
-        _, buffer = cv2.imencode('.jpg', frame)
-        b64_image = base64.b64encode(buffer).decode('utf-8')
+        with view:
+            width, height, frame_seq = view.width, view.height, view.frame_seq
+
+            # 2. Cache lookup (before queueing for the GPU)
+            frame_tiles = self.grounding_cache.frame_key(view.bgra)
+            answers = {instruction: self.grounding_cache.get(frame_tiles, instruction) for instruction in instructions}
+            misses = [instruction for instruction in instructions if answers[instruction] is None]
+
+            # Take what UI-Ins needs out of the slot now: the GPU queue and the call itself can outlast
+            # SHM_PIN_TIMEOUT_S, and the writer must not be held off for them
+            pointer, frame, jpeg = None, None, None
+            if misses and settings.INFERENCE_SHM_MODE:
+                # Co-located: the service reads the slot itself if it is still there; the copy is the fallback
+                pointer = {"shm_offset": self.shm_reader.layout.data_offset(view.slot), "frame_seq": frame_seq}
+                frame = view.bgra.copy()
+            elif misses:
+                # BGRA (mmap) -> BGR (reused buffer) -> JPEG
+                _, buffer = cv2.imencode('.jpg', view.to_bgr())
+                jpeg = buffer.tobytes()
 
-        # --- CHANGED HERE ---
-        # Acquire Lock before calling UI-Ins
-        async with gpu_manager.gpu_lock:
-            logger.debug(f"[{self.name}] Acquired GPU Lock")
+        if misses:
+            # Prefetches for the next plan step queue behind every request the agent is waiting on,
+            # and are dropped rather than served late. Either kind is dropped once the agent asked for a newer target.
             try:
-                response = requests.post(
-                    f"{settings.UI_INS_URL}/ground",
-                    json={"base64_image": b64_image, "instruction": event.instruction},
-                    timeout=10
-                )
-                result = response.json()
-            finally:
-                logger.debug(f"[{self.name}] Released GPU Lock")
-        # --------------------
-
-        # # 3. Call UI-Ins Service
-        # try:
-        #     response = requests.post(
-        #         f"{settings.UI_INS_URL}/ground",
-        #         json={"base64_image": b64_image, "instruction": event.instruction},
-        #         timeout=10
-        #     )
-        #     response.raise_for_status()
-        #     result = response.json() # Expects {x, y, confidence}
-        # except Exception as e:
-        #     logger.error(f"[{self.name}] UI-Ins Service Failed: {e}")
-        #     await self._publish_error(event.request_id, f"Inference failed: {str(e)}")
-        #     return
-
-        # latency = time.time() - start_time
-        # logger.info(f"[{self.name}] Grounded '{event.instruction}' -> {result['point']} in {latency:.2f}s")
-
-        # 4. Publish Result
+                async with gpu_scheduler.slot(
+                    "ui_ins",
+                    Priority.SPECULATIVE if speculative else Priority.INTERACTIVE,
+                    is_stale=lambda: self._interactive_grounding != generation,
+                    max_wait_s=settings.GPU_SPECULATIVE_MAX_WAIT_S if speculative else None,
+                ):
+                    # Non-blocking: the event loop keeps serving other channels while UI-Ins works
+                    data = await self._ground(misses, pointer, frame, jpeg)
+            except StaleRequest as e:
+                logger.debug(f"[{self.name}] Dropped grounding {event.request_id}: {e}")
+                return
+            except Exception as e:
+                logger.error(f"[{self.name}] UI-Ins Service Failed: {e}")
+                await self._publish_error(event.request_id, f"Inference failed: {str(e)}")
+                return
+
+            for instruction, result in zip(misses, data["results"] if len(misses) > 1 else [data]):
+                self.grounding_cache.put(frame_tiles, instruction, result)
+                answers[instruction] = result
+
+        latency = time.time() - start_time
+        logger.info(f"[{self.name}] Grounded {len(instructions)} target(s) on frame {frame_seq} in {latency:.2f}s "
+                    f"({len(instructions) - len(misses)} cached)")
+
+        # 3. Publish Result
         result_event = GroundingResultEvent()
         result_event.request_id = event.request_id
-        result_event.x = int(result['point'][0])
-        result_event.y = int(result['point'][1])
-        result_event.confidence = result.get('confidence', 1.0)
+        result_event.frame_seq = frame_seq
+        for instruction in instructions:
+            result = answers[instruction]
+            target = result_event.targets.add()
+            target.instruction = instruction
+            target.found = result.get('point') is not None
+            if target.found:
+                # UI-Ins returns normalized coordinates
+                target.x = int(result['point'][0] * width)
+                target.y = int(result['point'][1] * height)
+                target.confidence = result.get('confidence', 1.0)
+
+        first = result_event.targets[0]
+        if not first.found and not multi:
+            logger.warning(f"[{self.name}] UI-Ins found no target for '{instructions[0]}'")
+            await self._publish_error(event.request_id, "Target not found")
+            return
+        # Single-target consumers read the top-level fields
+        result_event.x, result_event.y, result_event.confidence = first.x, first.y, first.confidence
         
         await self.bus.publish("perception.grounding_result", result_event)
 
+    async def _ground(self, instructions, pointer: Optional[Dict], frame, jpeg: Optional[bytes]) -> Dict:
+        """
+        Calls UI-Ins for one or many instructions.
+        By SHM pointer when co-located (no encode, no upload); the service re-validates the slot's seqlock and
+        answers 409 if the writer recycled it meanwhile (501/503: no ring there), and we upload our copy instead.
+        """
+        multi = len(instructions) > 1
+        if pointer is not None:
+            try:
+                if multi:
+                    return await inference_client.post(
+                        "ui_ins", path="/ground_many", json={"instructions": instructions, **pointer})
+                return await inference_client.post(
+                    "ui_ins", path="/ground/shm", json={"instruction": instructions[0], **pointer})
+            except InferenceError as e:
+                if e.status not in (409, 501, 503):
+                    raise
+                logger.info(f"[{self.name}] Frame {pointer['frame_seq']} gone from SHM ({e.status}), uploading it")
+            _, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR))
+            jpeg = buffer.tobytes()
+
+        # Raw JPEG bytes (no base64 / JSON wrapping)
+        return await inference_client.post(
+            "ui_ins",
+            path="/ground_many/image" if multi else "/ground/image",
+            params=[("instruction", instruction) for instruction in instructions],
+            data=jpeg,
+            headers={"Content-Type": "image/jpeg"},
+        )
+
     async def _publish_error(self, req_id: str, msg: str):
         # Implementation of error event publishing
         pass
\ No newline at end of file
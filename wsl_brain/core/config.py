@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings
 from enum import Enum
+from typing import Dict, Optional
 
 class EnvironmentType(str, Enum):
     DEVELOPMENT = "development"
@@ -20,19 +21,96 @@ class SystemConfig(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+
+    # Event Bus (Redis Streams consumer groups)
+    BUS_CONSUMER_GROUP: str = "brain_workers"  # Prefix; each subscription gets its own group
+    BUS_CONSUMER_NAME: str = "worker_1"
+    BUS_HANDLER_CONCURRENCY: int = 4  # Max in-flight handler calls per subscription
+    BUS_READ_COUNT: int = 32
+    BUS_BLOCK_MS: int = 100
+    BUS_ACK_BATCH_SIZE: int = 64
+    BUS_ACK_INTERVAL_MS: int = 50
+    BUS_STREAM_MAXLEN: int = 2000
+    # Transport per channel: "stream" | "pubsub" | "inprocess". Keys are channel names or 'prefix.*' patterns,
+    # merged over shared/python/bus_protocol.DEFAULT_CHANNEL_MODES. Must agree with the Windows host for shared channels.
+    BUS_DEFAULT_MODE: str = "stream"
+    BUS_CHANNEL_MODES: Dict[str, str] = {}
+    BUS_FORCE_MODE: Optional[str] = None  # e.g. "inprocess" to run every channel without Redis
+    BUS_PUBSUB_QUEUE_SIZE: int = 256  # Per-subscriber backlog before pub/sub messages are shed
     
     # Shared Memory / IPC
     # Path accessible by both Windows (C:\temp) and WSL (/mnt/c/temp)
     SHM_FILE_PATH: str = "/mnt/c/temp/bravebird_video.shm"
     SHM_SIZE_MB: int = 64  # Buffer size for 4K frames
+    SHM_PIN_TIMEOUT_S: float = 5.0  # Max time a zero-copy view may hold a ring slot
     
     # AI Model Endpoints
     GEMINI_API_KEY: str
     GEMINI_MODEL_NAME: str = "gemini-1.5-flash"
+
+    # Gemini Context Cache (orchestrator prompt prefix, see core/context_cache.py)
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = False  # Needs a versioned GEMINI_MODEL_NAME (e.g. "gemini-1.5-flash-002")
+    GEMINI_CACHE_MIN_TOKENS: int = 32768  # API minimum for cached content; shorter prefixes go out uncached
+    GEMINI_CACHE_REFRESH_TOKENS: int = 8192  # Rebuild once this much history piled up behind the cached prefix
+    GEMINI_CACHE_TTL_S: int = 600
+
+    # Orchestrator Ledger (progress reflection)
+    ORCHESTRATOR_PARALLEL_LEDGER: bool = True  # Run the ledger call concurrently with the action call
+    LEDGER_EVERY_K_STEPS: int = 3  # 1 = every step (OmniTool default)
+    LEDGER_STALL_STEPS: int = 2  # ...or as soon as this many steps in a row made no visible progress
+
+    # Conversation History (see core/conversation.py)
+    CONTEXT_MAX_IMAGES: int = 2  # As per OmniTool default
+    CONTEXT_TOKEN_BUDGET: int = 64000  # Older turns are summarized above this; keep it > GEMINI_CACHE_MIN_TOKENS
+    CONTEXT_SUMMARY_TOKENS: int = 2000
     
     # Service Endpoints
     UI_INS_URL: str = "http://localhost:8001"
     OMNIPARSER_URL: str = "http://localhost:8002"
+    # Inference services run on this machine and mount the SHM ring: send frame pointers instead of images
+    INFERENCE_SHM_MODE: bool = False
+
+    # Inference Client (pooled aiohttp, see core/inference_client.py)
+    INFERENCE_POOL_SIZE: int = 32
+    INFERENCE_RETRIES: int = 2
+    UI_INS_CONCURRENCY: int = 8  # The server batches concurrent requests
+    UI_INS_TIMEOUT_S: float = 10.0
+    UI_INS_HEDGE_AFTER_S: float = 3.0
+    OMNIPARSER_CONCURRENCY: int = 2
+    OMNIPARSER_TIMEOUT_S: float = 30.0
+    OMNIPARSER_HEDGE_AFTER_S: float = 0.0  # Full parses are too expensive to duplicate
+
+    # GPU Scheduler (priority admission per model, see core/resources.py)
+    GPU_RESERVED_INTERACTIVE_SLOTS: int = 1  # Per model, per process: slots background/speculative work may never take
+    GPU_SPECULATIVE_MAX_WAIT_S: float = 1.0  # A prefetch queued longer than this is dropped (the step will ground normally)
+
+    # Grounding Cache (content-addressed UI-Ins results)
+    UI_INS_MODEL_VERSION: str = "Qwen/Qwen2.5-VL-7B-Instruct"  # Part of the cache key: bump when the model changes
+    GROUNDING_CACHE_SIZE: int = 4096
+    GROUNDING_CACHE_TILE_SIZE: int = 32  # Exact tile hashes; an answer is reused only while its tiles are unchanged
+    GROUNDING_CACHE_MARGIN: int = 48  # Pixels around a cached point that must be identical for a hit
+    GROUNDING_CACHE_PATH: Optional[str] = None  # e.g. "data/cache/grounding" to persist across runs
+    GROUNDING_CACHE_DISK_SIZE: int = 65536  # Instructions kept on disk; least recently used are evicted
+    GROUNDING_CACHE_LAYOUT_TOLERANCE: int = 8  # Cells of the whole-frame thumbnail (of 576) that may change for a hit
+
+    # OmniParser Parse Cache (re-parse only what changed)
+    PARSE_CACHE_TILE_SIZE: int = 64
+    PARSE_CACHE_MAX_DIRTY_RATIO: float = 0.4  # Above this fraction of the frame, a full parse is cheaper
+    PARSE_CACHE_MARGIN: int = 48  # Context (px) added around each dirty region before cropping
+    PARSE_CACHE_MAX_REGIONS: int = 8
+    SCREEN_PARSE_TIMEOUT_S: float = 60.0  # Cognition gives up on a Perception screen parse after this long
+
+    # Synthesizer (offline trace -> workflow)
+    SYNTH_VERIFY_LANES: int = 4  # Keyframe verification lanes; in-flight parses are still capped by OMNIPARSER_CONCURRENCY
+    SYNTH_LIVE_ENABLED: bool = False  # Run the LiveSynthesizer in the Brain (synthesize while recording)
+    SYNTH_LIVE_DIR: str = "data/live_traces"
+    SYNTH_LIVE_WARM_INTERVAL_S: float = 2.0  # Idle re-parse of the latest frame so click-time parses are incremental (0 = off)
+
+    # Speculative Grounding (ground the announced "Next Target" while the current action runs)
+    SPECULATION_ENABLED: bool = True
+    SPECULATION_TARGET_MARGIN: int = 48  # px around a prefetched point that must stay unchanged
+    SPECULATION_TTL_S: float = 10.0
+
     ARRAKIS_URL: str = "http://localhost:7000"
     WINDOWS_BRIDGE_URL: str = "http://host.docker.internal:5000"
 
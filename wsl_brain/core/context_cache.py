@@ -0,0 +1,192 @@
+import asyncio
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from wsl_brain.core.config import settings
+from wsl_brain.core.conversation import IMAGE_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# The "Working Memory". Gemini context caching for the orchestrator's static prompt prefix.
+# System prompt + task + plan + older turns are uploaded once as cached content; every step then only sends
+# the turns added since (new screenshot, screen info, latest ledger), billed and processed as a short delta.
+
+# Cached content only accepts explicitly versioned models ("gemini-1.5-flash-002", not "gemini-1.5-flash")
+_VERSIONED_MODEL = re.compile(r"-\d{3}$")
+
+
+def to_gemini_contents(messages: List[Dict]) -> List[Dict]:
+    """OmniTool-style messages ({'role', 'content': [text / image_url blocks]}) -> Gemini 'contents'."""
+    contents = []
+    for msg in messages:
+        parts = []
+        for block in msg["content"]:
+            if block["type"] == "text":
+                parts.append({"text": block["text"]})
+            elif block["type"] == "image_url":
+                url = block["image_url"]["url"] if isinstance(block["image_url"], dict) else block["image_url"]
+                mime_type = "image/png"
+                if url.startswith("data:"):
+                    header, url = url.split(",", 1)
+                    mime_type = header[5:].split(";")[0]
+                parts.append({"inline_data": {"mime_type": mime_type, "data": base64.b64decode(url)}})
+        if parts:
+            contents.append({"role": "model" if msg["role"] == "assistant" else "user", "parts": parts})
+    return contents
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Cheap local estimate (~4 characters per token) used to decide when (re)caching pays off."""
+    total = 0
+    for msg in messages:
+        for block in msg["content"]:
+            total += len(block.get("text", "")) // 4 if block["type"] == "text" else IMAGE_TOKENS
+    return total
+
+
+class GeminiContextCache:
+    """
+    Keeps one cached-content entry holding the stable prefix of the orchestrator's conversation.
+
+    Usage (VLMOrchestratedAgent):
+        text = await context_cache.generate(system_prompt, messages, stable_upto=k, json_mode=True)
+        if text is None:
+            text = await llm.generate(messages=messages, system_instruction=system_prompt, json_mode=True)
+
+    messages[:stable_upto] must only ever grow by appending (no image eviction inside it). The entry is
+    rebuilt when that prefix stops matching, when it has grown by more than refresh_tokens since the last
+    build, or when the entry's TTL runs out. Prefixes below min_tokens (the API minimum) are not cached.
+    A failed build is not retried until the prefix has grown by refresh_tokens.
+    """
+
+    def __init__(self, model_name: str = None, min_tokens: int = None, refresh_tokens: int = None,
+                 ttl_s: int = None):
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model_name = model_name or settings.GEMINI_MODEL_NAME
+        if not self.supports(self.model_name):
+            raise ValueError(f"Context caching needs a versioned model name (e.g. 'gemini-1.5-flash-002'), "
+                             f"got '{self.model_name}'")
+        self.min_tokens = min_tokens if min_tokens is not None else settings.GEMINI_CACHE_MIN_TOKENS
+        self.refresh_tokens = refresh_tokens if refresh_tokens is not None else settings.GEMINI_CACHE_REFRESH_TOKENS
+        self.ttl_s = ttl_s if ttl_s is not None else settings.GEMINI_CACHE_TTL_S
+
+        self._cache: Optional[caching.CachedContent] = None
+        self._system_instruction: Optional[str] = None
+        self._cached_len = 0
+        self._cached_digest = b""
+        self._expires_at = 0.0
+        # (system instruction, prefix length, prefix digest) of the last failed build
+        self._failed: Optional[tuple] = None
+
+        self.last_usage: Dict[str, int] = {}
+        self.stats = {"calls": 0, "cached_calls": 0, "cache_builds": 0, "build_failures": 0,
+                      "cached_tokens": 0, "uncached_tokens": 0}
+
+    @staticmethod
+    def supports(model_name: str) -> bool:
+        return bool(_VERSIONED_MODEL.search(model_name))
+
+    async def generate(self, system_instruction: str, messages: List[Dict], stable_upto: int,
+                       json_mode: bool = False) -> Optional[str]:
+        """
+        One model call on top of the cached prefix.
+        Returns None (nothing sent) when no cache entry applies; the caller then uses its regular client.
+        """
+        self.stats["calls"] += 1
+        cache = await self._cache_for(system_instruction, messages, stable_upto)
+        if cache is None:
+            return None
+
+        model = genai.GenerativeModel.from_cached_content(cached_content=cache)
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        response = await model.generate_content_async(to_gemini_contents(messages[self._cached_len:]),
+                                                      generation_config=generation_config)
+        self._record(response.usage_metadata)
+        return response.text
+
+    async def close(self):
+        await self._drop()
+
+    # --- Internals ---
+
+    @staticmethod
+    def _digest(messages: List[Dict]) -> bytes:
+        return hashlib.blake2b(json.dumps(messages, sort_keys=True, default=str).encode(), digest_size=16).digest()
+
+    async def _cache_for(self, system_instruction: str, messages: List[Dict],
+                         stable_upto: int) -> Optional[caching.CachedContent]:
+        prefix = messages[:stable_upto]
+        if (self._cache is not None
+                and system_instruction == self._system_instruction
+                and time.monotonic() < self._expires_at
+                and self._cached_len <= len(prefix)
+                and self._digest(prefix[:self._cached_len]) == self._cached_digest
+                and estimate_tokens(prefix[self._cached_len:]) < self.refresh_tokens):
+            return self._cache
+
+        await self._drop()
+        if estimate_tokens(prefix) < self.min_tokens or self._failed_recently(system_instruction, prefix):
+            return None
+
+        try:
+            self._cache = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model=self.model_name,
+                display_name="bravebird-orchestrator",
+                system_instruction=system_instruction,
+                contents=to_gemini_contents(prefix),
+                ttl=datetime.timedelta(seconds=self.ttl_s),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Context cache creation failed, sending uncached: {e}")
+            self._failed = (system_instruction, len(prefix), self._digest(prefix))
+            self.stats["build_failures"] += 1
+            return None
+
+        self._system_instruction = system_instruction
+        self._cached_len = len(prefix)
+        self._cached_digest = self._digest(prefix)
+        # Refresh a little before the server drops the entry
+        self._expires_at = time.monotonic() + self.ttl_s * 0.9
+        self.stats["cache_builds"] += 1
+        logger.info(f"💾 Context cache built: {len(prefix)} turns (~{estimate_tokens(prefix)} tokens)")
+        return self._cache
+
+    def _failed_recently(self, system_instruction: str, prefix: List[Dict]) -> bool:
+        """True while the prefix is (an extension of) one whose build failed and has not grown enough to retry."""
+        if self._failed is None:
+            return False
+        failed_instruction, failed_len, failed_digest = self._failed
+        return (system_instruction == failed_instruction
+                and len(prefix) >= failed_len
+                and self._digest(prefix[:failed_len]) == failed_digest
+                and estimate_tokens(prefix[failed_len:]) < self.refresh_tokens)
+
+    async def _drop(self):
+        if self._cache is None:
+            return
+        cache, self._cache = self._cache, None
+        self._cached_len, self._cached_digest = 0, b""
+        try:
+            await asyncio.to_thread(cache.delete)
+        except Exception as e:
+            logger.debug(f"Context cache delete failed (it expires on its own): {e}")
+
+    def _record(self, usage):
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+        self.last_usage = {"cached": cached_tokens, "uncached": prompt_tokens - cached_tokens,
+                           "output": getattr(usage, "candidates_token_count", 0) or 0}
+        self.stats["cached_calls"] += 1
+        self.stats["cached_tokens"] += cached_tokens
+        self.stats["uncached_tokens"] += prompt_tokens - cached_tokens
+        logger.info(f"💾 Prompt tokens: {cached_tokens} cached + {prompt_tokens - cached_tokens} sent")
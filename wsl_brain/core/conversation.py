@@ -0,0 +1,185 @@
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import tiktoken
+
+from wsl_brain.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The "Short-Term Memory". The agent's message history, kept small as it grows.
+# Appends are O(1); old screenshots are evicted through an index instead of re-scanning the history, and once
+# the token budget is exceeded the oldest turns are folded into one summary turn. Assembling the prompt for a
+# step therefore costs the same at step 5 and at step 500.
+
+IMAGE_TOKENS = 258  # Gemini bills an image as a fixed 258 tokens
+TURN_OVERHEAD_TOKENS = 4  # Role / separators
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """tiktoken count (cl100k_base). Gemini tokenizes differently, but this is close enough for budgeting."""
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _text_of(message: Dict) -> str:
+    return "\n".join(block["text"] for block in message["content"] if block["type"] == "text")
+
+
+def extractive_summary(messages: List[Dict], max_chars: int = 200) -> str:
+    """Default summarizer: one truncated line per turn."""
+    lines = []
+    for msg in messages:
+        text = " ".join(_text_of(msg).split())
+        if text:
+            lines.append(f"- {msg['role']}: {text[:max_chars]}{'…' if len(text) > max_chars else ''}")
+    return "\n".join(lines)
+
+
+class _Turn:
+    __slots__ = ("message", "tokens", "images", "dropped", "pinned", "timestamp")
+
+    def __init__(self, message: Dict, pinned: bool = False):
+        self.message = message
+        self.timestamp = time.time()  # Metadata lives next to the message: the message goes to the LLM as-is
+        self.images = sum(1 for block in message["content"] if block["type"] == "image_url")
+        self.tokens = self._count(message)
+        self.dropped = False
+        self.pinned = pinned
+
+    @staticmethod
+    def _count(message: Dict) -> int:
+        tokens = TURN_OVERHEAD_TOKENS
+        for block in message["content"]:
+            tokens += count_tokens(block["text"]) if block["type"] == "text" else IMAGE_TOKENS
+        return tokens
+
+
+class ConversationBuffer:
+    """
+    OmniTool-style messages ({'role', 'content': [text / image_url blocks]}) with a bounded prompt size.
+
+    - Pinned turns (task, plan) are always sent verbatim and never compacted.
+    - Only the newest 'max_images' unpinned screenshots are kept; older image blocks are stripped from their turns.
+    - When the total exceeds 'token_budget', the oldest unpinned turns are folded into a single summary turn
+      (placed right after the pinned ones) until the total is back under 75% of the budget.
+
+    Usage:
+        history = ConversationBuffer()
+        history.append(task_message, pin=True)
+        history.append(observation)
+        llm.generate(history.messages())
+    """
+
+    def __init__(self, max_images: int = None, token_budget: int = None, summary_tokens: int = None,
+                 min_recent_turns: int = 4, summarizer: Optional[Callable[[List[Dict]], str]] = None):
+        self.max_images = max_images if max_images is not None else settings.CONTEXT_MAX_IMAGES
+        self.token_budget = token_budget if token_budget is not None else settings.CONTEXT_TOKEN_BUDGET
+        self.summary_tokens = summary_tokens if summary_tokens is not None else settings.CONTEXT_SUMMARY_TOKENS
+        self.min_recent_turns = min_recent_turns
+        self.summarizer = summarizer or extractive_summary
+        self.clear()
+
+    def clear(self):
+        self._pinned: List[_Turn] = []
+        self._summary: Optional[_Turn] = None
+        self._summary_text = ""
+        self._recent: Deque[_Turn] = deque()
+        # Unpinned turns holding images, oldest first (eviction index)
+        self._image_turns: Deque[_Turn] = deque()
+        self._images = 0  # Images in unpinned turns
+        self.total_tokens = 0
+        self.compacted_turns = 0
+
+    def __len__(self) -> int:
+        return len(self._pinned) + (self._summary is not None) + len(self._recent)
+
+    # --- Writing ---
+
+    def append(self, message: Dict, pin: bool = False):
+        """Adds a turn; 'message' is sent verbatim, so it must only hold 'role' and 'content'."""
+        turn = _Turn(message, pinned=pin)
+        (self._pinned if pin else self._recent).append(turn)
+        self.total_tokens += turn.tokens
+        if turn.images and not pin:
+            self._image_turns.append(turn)
+            self._images += turn.images
+            self._evict_images()
+        if self.total_tokens > self.token_budget:
+            self._compact()
+
+    def pin_all(self):
+        """Pins every turn added so far (e.g. the task, before the first step)."""
+        for turn in self._recent:
+            turn.pinned = True
+            self._images -= turn.images
+        self._pinned.extend(self._recent)
+        self._recent.clear()
+
+    # --- Reading ---
+
+    def messages(self, images: bool = True) -> List[Dict]:
+        """The prompt history. images=False drops image blocks (text-only calls such as the ledger)."""
+        turns = self._pinned + ([self._summary] if self._summary else []) + list(self._recent)
+        if images:
+            return [turn.message for turn in turns]
+        return [self._without_images(turn.message) for turn in turns if turn.images < len(turn.message["content"])]
+
+    def first_text(self) -> str:
+        """Text of the first turn (the task)."""
+        first = (self._pinned or list(self._recent))[0].message
+        return next(block["text"] for block in first["content"] if block["type"] == "text")
+
+    # --- Budgeting ---
+
+    @staticmethod
+    def _without_images(message: Dict) -> Dict:
+        return {**message, "content": [block for block in message["content"] if block["type"] != "image_url"]}
+
+    def _evict_images(self):
+        while self._images > self.max_images and self._image_turns:
+            turn = self._image_turns.popleft()
+            if turn.dropped or turn.pinned:
+                continue
+            # Strip in place: the turn keeps its position and its text
+            self._images -= turn.images
+            self.total_tokens -= turn.images * IMAGE_TOKENS
+            turn.tokens -= turn.images * IMAGE_TOKENS
+            turn.message = self._without_images(turn.message)
+            turn.images = 0
+
+    def _compact(self):
+        low_water = int(self.token_budget * 0.75)
+        folded = []
+        while self.total_tokens > low_water and len(self._recent) > self.min_recent_turns:
+            turn = self._recent.popleft()
+            turn.dropped = True
+            self._images -= turn.images
+            self.total_tokens -= turn.tokens
+            folded.append(turn.message)
+        if not folded:
+            return
+
+        summary = "\n".join(filter(None, [self._summary_text, self.summarizer(folded)]))
+        self._summary_text = self._truncate_head(summary, self.summary_tokens)
+        if self._summary:
+            self.total_tokens -= self._summary.tokens
+        self._summary = _Turn({"role": "user", "content": [
+            {"type": "text", "text": f"Summary of earlier steps:\n{self._summary_text}"}]})
+        self.total_tokens += self._summary.tokens
+        self.compacted_turns += len(folded)
+        logger.debug(f"🗜️ Compacted {len(folded)} turns ({self.compacted_turns} total), "
+                     f"history now ~{self.total_tokens} tokens")
+
+    @staticmethod
+    def _truncate_head(text: str, max_tokens: int) -> str:
+        """Keeps the most recent part of a summary that outgrew its budget."""
+        if count_tokens(text) <= max_tokens:
+            return text
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[-max_tokens:])
@@ -1,76 +1,97 @@
 import logging
 import asyncio
 import redis.asyncio as redis
-from typing import Callable, Dict, Any, Type, TypeVar
+from typing import Callable, Dict, Any, Type, TypeVar, Optional
 from google.protobuf.message import Message
 
+from shared.python.bus_protocol import ChannelMode, resolve_channel_mode
 from wsl_brain.core.config import settings
+from wsl_brain.core.transports import Transport, StreamTransport, PubSubTransport, InProcessTransport
 
 # Type variable for Protobuf messages
 T = TypeVar('T', bound=Message)
 
 logger = logging.getLogger(__name__)
 
-# A robust wrapper around Redis Pub/Sub that handles Protobuf serialization transparently. 
+# A robust wrapper around the Redis bus that handles Protobuf serialization transparently.
 # It implements the Observer Pattern.
+# Each channel is routed to a transport (stream / pubsub / in-process, see shared/python/bus_protocol.py).
+# The wire format is the same everywhere, so moving a channel between transports is a config change only.
 
 class EventBus:
     """
-    Asynchronous Event Bus using Redis Pub/Sub.
+    Asynchronous Event Bus over pluggable transports.
     Handles automatic serialization/deserialization of Protobuf messages.
     """
 
-    def __init__(self):
+    def __init__(self, force_mode: Optional[str] = None):
+        """
+        Args:
+            force_mode: Route every channel through one transport (e.g. "inprocess" to run without Redis).
+                        Defaults to BB_BUS_FORCE_MODE.
+        """
         self._redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
         self._redis: redis.Redis = None
-        self._pubsub = None
-        self._handlers: Dict[str, list[Callable[[Any], None]]] = {}
-        self._running = False
+        self._force_mode = force_mode or settings.BUS_FORCE_MODE
+        self._transports: Dict[ChannelMode, Transport] = {}
 
     async def connect(self):
-        """Initializes the Redis connection."""
+        """Initializes the transports (and the Redis connection unless everything runs in-process)."""
+        self._transports[ChannelMode.INPROC] = InProcessTransport()
+        if self._force_mode == ChannelMode.INPROC.value:
+            logger.info("🔌 Event Bus running in-process (no Redis)")
+            return
+
         try:
             self._redis = redis.from_url(self._redis_url)
-            self._pubsub = self._redis.pubsub()
+            await self._redis.ping()
+            self._transports[ChannelMode.STREAM] = StreamTransport(self._redis)
+            self._transports[ChannelMode.PUBSUB] = PubSubTransport(self._redis)
             logger.info(f"🔌 Connected to Event Bus at {self._redis_url}")
-            self._running = True
-            # Start the listener loop in the background
-            asyncio.create_task(self._listener_loop())
         except Exception as e:
             logger.critical(f"❌ Failed to connect to Redis: {e}")
             raise
 
     async def disconnect(self):
-        """Closes Redis connection."""
-        self._running = False
-        if self._pubsub:
-            await self._pubsub.close()
+        """Stops all transports and closes the Redis connection."""
+        for transport in self._transports.values():
+            await transport.close()
+        self._transports.clear()
         if self._redis:
             await self._redis.close()
         logger.info("🔌 Disconnected from Event Bus")
 
+    def mode_for(self, channel: str) -> ChannelMode:
+        return resolve_channel_mode(channel, settings.BUS_CHANNEL_MODES, settings.BUS_DEFAULT_MODE, self._force_mode)
+
+    def _transport_for(self, channel: str) -> Transport:
+        if not self._transports:
+            raise RuntimeError("EventBus not connected. Call connect() first.")
+        return self._transports[self.mode_for(channel)]
+
     async def publish(self, channel: str, message: Message):
         """
         Publishes a Protobuf message to a channel.
-        
+
         Args:
             channel: The topic name.
             message: A valid Protobuf object.
         """
-        if not self._redis:
-            raise RuntimeError("EventBus not connected. Call connect() first.")
-        
+        transport = self._transport_for(channel)
+
         try:
             # Serialize Protobuf to bytes
             payload = message.SerializeToString()
-            await self._redis.publish(channel, payload)
+            await transport.publish(channel, payload)
             # Debug log for high-level events (filtering out high-frequency streams like video)
             if "video" not in channel:
                 logger.debug(f"📤 Published to [{channel}]: {type(message).__name__}")
         except Exception as e:
             logger.error(f"❌ Failed to publish to {channel}: {e}")
 
-    async def subscribe(self, channel: str, message_type: Type[T], callback: Callable[[T], Any]):
+    async def subscribe(self, channel: str, message_type: Type[T], callback: Callable[[T], Any],
+                        group: Optional[str] = None, max_concurrency: Optional[int] = None,
+                        conflate: bool = False):
         """
         Subscribes to a channel with a typed callback.
 
@@ -78,62 +99,33 @@ class EventBus:
             channel: The topic name.
             message_type: The Protobuf class to deserialize into (e.g. VisualFrame).
             callback: Async function that accepts the deserialized message.
+            group: Consumer group name (stream channels only). Defaults to one group per callback, so every
+                   subscriber sees every message (fan-out). Share a group name to load-balance instead.
+            max_concurrency: Max handler calls in flight for this subscription. Use 1 for strict ordering.
+            conflate: Latest-value delivery. If the callback falls behind, older messages are dropped and only
+                      the newest is delivered (one call at a time). Only for channels where stale values are useless.
         """
-        if channel not in self._handlers:
-            self._handlers[channel] = []
-            await self._pubsub.subscribe(channel)
-            logger.info(f"👂 Subscribed to channel: [{channel}]")
-
-        # Store the wrapper to handle deserialization logic
-        self._handlers[channel].append({
-            "type": message_type,
-            "func": callback
-        })
-
-    async def _listener_loop(self):
-        logger.info("🔄 Stream Polling Loop started")
-        
-        while self._running:
-            try:
-                # --- CHANGED HERE ---
-                # Poll all registered streams using XREADGROUP
-                streams = {k: ">" for k in self._handlers.keys()} # ">" means new messages
-                if not streams:
-                    await asyncio.sleep(0.1)
-                    continue
-
-                # Block for 100ms waiting for data
-                events = await self.redis.xreadgroup("brain_workers", "worker_1", streams, count=10, block=100)
-                
-                for stream_name, messages in events:
-                    stream_str = stream_name.decode("utf-8")
-                    handler = self._handlers.get(stream_str)
-                    
-                    for msg_id, msg_data in messages:
-                        # Process
-                        await self._process_message(handler, msg_data[b'data'], stream_str)
-                        # ACK the message (Mark processed)
-                        await self.redis.xack(stream_str, "brain_workers", msg_id)
-                # --------------------
-                
-            except Exception as e:
-                logger.error(f"❌ Stream Loop Error: {e}")
-                await asyncio.sleep(1)
-
-    async def _process_message(self, handler_config, raw_data: bytes, channel: str):
+        transport = self._transport_for(channel)
+        group = group or f"{settings.BUS_CONSUMER_GROUP}:{getattr(callback, '__qualname__', repr(callback))}"
+
+        async def handler(raw_data: bytes):
+            await self._process_message(channel, message_type, callback, raw_data)
+
+        await transport.subscribe(channel, group, handler, max_concurrency or settings.BUS_HANDLER_CONCURRENCY,
+                                  conflate=conflate)
+        logger.info(f"👂 Subscribed to channel: [{channel}] via {transport.mode.value}{' (conflated)' if conflate else ''}")
+
+    async def _process_message(self, channel: str, message_type: Type[Message], callback: Callable, raw_data: bytes):
         """Deserializes data and invokes the callback safely."""
         try:
-            msg_type = handler_config["type"]
-            callback = handler_config["func"]
-            
             # Deserialize
-            proto_instance = msg_type()
+            proto_instance = message_type()
             proto_instance.ParseFromString(raw_data)
-            
+
             # Invoke callback
             if asyncio.iscoroutinefunction(callback):
                 await callback(proto_instance)
             else:
                 callback(proto_instance)
         except Exception as e:
-            logger.error(f"❌ Error processing message on [{channel}]: {e}")
\ No newline at end of file
+            logger.error(f"❌ Error processing message on [{channel}]: {e}")
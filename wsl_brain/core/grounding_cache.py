@@ -0,0 +1,199 @@
+import logging
+import hashlib
+import cv2
+import re
+import shelve
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from wsl_brain.core.config import settings
+from shared.python.frame_delta import TileHasher, tile_span
+
+logger = logging.getLogger(__name__)
+
+# The "Muscle Memory". Content-addressed cache of UI-Ins grounding results.
+# Key = (normalized instruction, model version); an entry is only reused while the pixels AROUND its answer are
+# bit-identical (exact per-tile hashes from frame_delta.TileHasher), so replaying a recorded workflow answers
+# "click Save" from memory, while a toggled checkbox or an edited field next to the target forces a new grounding.
+# The rest of the frame is only compared coarsely (a 32x18 luminance thumbnail of the whole screen): an opened dialog,
+# panel or moved window misses, but a single small element appearing elsewhere (a second "Save" button in a
+# toolbar) may not change the layout signature, and then the old answer is still returned.
+# Values are normalized points, the check region is stored in pixels of the frame it was grounded on.
+
+LAYOUT_GRID = (32, 18)  # Thumbnail cells (columns, rows) over the whole frame
+LAYOUT_CELL_DELTA = 16  # A cell whose mean luminance moved by more than this counts as changed
+_DISK_INDEX_KEY = "__lru__"  # Disk keys, least recently used first
+
+
+def normalize_instruction(instruction: str) -> str:
+    """'  Click the SAVE button. ' -> 'click the save button'"""
+    text = re.sub(r"\s+", " ", instruction.strip().lower())
+    return text.rstrip(".!?")
+
+
+class FrameTiles:
+    """Exact tile hashes of one frame (computed once per grounding request, shared by all its instructions)."""
+
+    __slots__ = ("grid", "width", "height", "tile_size", "layout")
+
+    def __init__(self, grid: np.ndarray, width: int, height: int, tile_size: int, layout: bytes):
+        self.grid = grid
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.layout = layout  # Coarse whole-frame signature (see layout_signature)
+
+    def region(self, span: Tuple[int, int, int, int]) -> bytes:
+        r0, r1, c0, c1 = span
+        return self.grid[r0:r1, c0:c1].tobytes()
+
+
+def layout_signature(bgra: np.ndarray) -> bytes:
+    """Grayscale thumbnail (LAYOUT_GRID) of the frame: small edits barely move it, a new window or panel does."""
+    small = cv2.resize(bgra, LAYOUT_GRID, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY).tobytes()
+
+
+def _changed_cells(a: bytes, b: bytes) -> int:
+    if len(a) != len(b):
+        return len(b)
+    diff = np.abs(np.frombuffer(a, np.uint8).astype(np.int16) - np.frombuffer(b, np.uint8))
+    return int(np.count_nonzero(diff > LAYOUT_CELL_DELTA))
+
+
+class GroundingCache:
+    """
+    Two-tier LRU: an in-memory OrderedDict in front of an optional shelve file on disk.
+    Disk hits are promoted back into memory. The disk tier keeps at most 'disk_entries' instructions (LRU).
+
+    Each instruction keeps up to 'variants' answers (the same instruction on different screens). An answer with
+    a point is checked against the tiles within 'margin' px of it; a "not found" answer can only be checked
+    against the whole frame and is kept in memory only (never persisted).
+    """
+
+    def __init__(self, max_entries: int = None, disk_path: Optional[str] = None, model_version: str = None,
+                 tile_size: int = None, margin: int = None, variants: int = 8, disk_entries: int = None,
+                 layout_tolerance: int = None):
+        self.max_entries = max_entries or settings.GROUNDING_CACHE_SIZE
+        self.disk_entries = disk_entries or settings.GROUNDING_CACHE_DISK_SIZE
+        self.layout_tolerance = (layout_tolerance if layout_tolerance is not None
+                                 else settings.GROUNDING_CACHE_LAYOUT_TOLERANCE)
+        self.model_version = model_version or settings.UI_INS_MODEL_VERSION
+        self.margin = margin if margin is not None else settings.GROUNDING_CACHE_MARGIN
+        self.variants = variants
+        self.hasher = TileHasher(tile_size or settings.GROUNDING_CACHE_TILE_SIZE)
+        # Same weights in every run (up to 8K), so persisted tile hashes stay comparable
+        self.hasher.reserve(8192, 8192)
+        self._memory: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._disk = None
+        self._disk_order: "OrderedDict[str, None]" = OrderedDict()
+        disk_path = disk_path if disk_path is not None else settings.GROUNDING_CACHE_PATH
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._disk = shelve.open(disk_path)
+            # Keys the saved index does not know about (e.g. after a crash) count as the oldest
+            indexed = self._disk.get(_DISK_INDEX_KEY, [])
+            stored = set(self._disk.keys()) - {_DISK_INDEX_KEY}
+            for key in [k for k in stored if k not in set(indexed)] + [k for k in indexed if k in stored]:
+                self._disk_order[key] = None
+            self._evict_disk()
+            logger.info(f"💾 Grounding cache disk tier at {disk_path} ({len(self._disk_order)} entries)")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def frame_key(self, bgra: np.ndarray) -> FrameTiles:
+        """Exact per-tile hashes of the frame (any changed pixel changes its tile). Straight from the mmap view."""
+        height, width = bgra.shape[:2]
+        return FrameTiles(self.hasher.hash_tiles(bgra), width, height, self.hasher.tile_size, layout_signature(bgra))
+
+    def _key(self, instruction: str) -> str:
+        raw = f"{self.model_version}|{self.hasher.tile_size}|{normalize_instruction(instruction)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _span(self, frame: FrameTiles, result: Dict) -> Tuple[int, int, int, int]:
+        """Tile range that must be unchanged for 'result' to stay valid."""
+        if result.get("point") is None:
+            return 0, frame.grid.shape[0], 0, frame.grid.shape[1]
+        x = int(result["point"][0] * frame.width)
+        y = int(result["point"][1] * frame.height)
+        m = self.margin
+        return tile_span((x - m, y - m, 2 * m, 2 * m), frame.tile_size, frame.width, frame.height)
+
+    def _matches(self, entry: Dict, frame: FrameTiles) -> bool:
+        return (entry["size"] == (frame.width, frame.height)
+                and frame.region(entry["span"]) == entry["tiles"]
+                # Entries persisted before the layout signature existed never match
+                and entry.get("layout") is not None
+                and _changed_cells(entry["layout"], frame.layout) <= self.layout_tolerance)
+
+    def get(self, frame: FrameTiles, instruction: str) -> Optional[Dict]:
+        key = self._key(instruction)
+        with self._lock:
+            for entry in self._memory.get(key, ()):
+                if self._matches(entry, frame):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry["result"]
+
+            if self._disk is not None:
+                for entry in self._disk.get(key, ()):
+                    if self._matches(entry, frame):
+                        self._add(key, entry)
+                        self._disk_order.move_to_end(key)
+                        self.disk_hits += 1
+                        return entry["result"]
+
+            self.misses += 1
+            return None
+
+    def put(self, frame: FrameTiles, instruction: str, result: Dict):
+        """Stores a UI-Ins result ({'point': [x_norm, y_norm] | None, ...})."""
+        key = self._key(instruction)
+        span = self._span(frame, result)
+        entry = {"result": result, "size": (frame.width, frame.height), "span": span, "tiles": frame.region(span),
+                 "layout": frame.layout}
+        with self._lock:
+            self._add(key, entry)
+            # "Not found" depends on the whole screen: too fragile to keep across runs
+            if self._disk is not None and result.get("point") is not None:
+                persisted = [e for e in self._disk.get(key, []) if e["span"] != span or e["tiles"] != entry["tiles"]]
+                self._disk[key] = ([entry] + persisted)[:self.variants]
+                self._disk_order[key] = None
+                self._disk_order.move_to_end(key)
+                self._evict_disk()
+
+    def _add(self, key: str, entry: Dict):
+        variants = [e for e in self._memory.get(key, []) if e["span"] != entry["span"] or e["tiles"] != entry["tiles"]]
+        self._memory[key] = ([entry] + variants)[:self.variants]
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        while len(self._disk_order) > self.disk_entries:
+            key, _ = self._disk_order.popitem(last=False)
+            del self._disk[key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk[_DISK_INDEX_KEY] = list(self._disk_order)
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,217 @@
+import logging
+import asyncio
+import bisect
+import time
+import aiohttp
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from wsl_brain.core.config import settings
+from wsl_brain.core.resources import PRIORITY_HEADER, current_priority
+
+logger = logging.getLogger(__name__)
+
+# The "Optic Nerve". One pooled, non-blocking HTTP client for every call to the model microservices (UI-Ins, OmniParser).
+# Keep-alive connections are reused across calls, each endpoint has its own concurrency cap,
+# slow calls are hedged with a duplicate request and failures are retried with backoff.
+
+
+class InferenceError(Exception):
+    """Raised when an inference call failed after all retries."""
+
+    def __init__(self, endpoint: str, message: str, status: Optional[int] = None):
+        super().__init__(f"[{endpoint}] {message}")
+        self.endpoint = endpoint
+        self.status = status
+
+
+@dataclass
+class EndpointPolicy:
+    base_url: str
+    concurrency: int      # Max requests in flight to this service
+    timeout_s: float      # Per attempt
+    retries: int          # Extra attempts after the first failure
+    hedge_after_s: float  # Send a duplicate if the first attempt is still running after this long (0 = never)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)."""
+
+    BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.total:
+            return 0.0
+        target, seen = q * self.total, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.total,
+            "avg_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max_ms,
+            "buckets": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class InferenceClient:
+    """
+    Shared aiohttp client for the inference services.
+
+    Design Pattern: Singleton (see 'inference_client' below). The session is created lazily on the running loop,
+    so offline tools that call asyncio.run() repeatedly (Synthesizer, DataMiner, EvaAgent) get a fresh one per loop.
+    They await close() before their loop ends, so its connector and keep-alive sockets are closed on that loop.
+    """
+
+    def __init__(self):
+        self.policies: Dict[str, EndpointPolicy] = {
+            "ui_ins": EndpointPolicy(settings.UI_INS_URL, settings.UI_INS_CONCURRENCY, settings.UI_INS_TIMEOUT_S,
+                                     settings.INFERENCE_RETRIES, settings.UI_INS_HEDGE_AFTER_S),
+            "omniparser": EndpointPolicy(settings.OMNIPARSER_URL, settings.OMNIPARSER_CONCURRENCY,
+                                         settings.OMNIPARSER_TIMEOUT_S, settings.INFERENCE_RETRIES,
+                                         settings.OMNIPARSER_HEDGE_AFTER_S),
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self.latency: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in self.policies}
+        self.counters: Dict[str, Dict[str, int]] = {name: {"calls": 0, "retries": 0, "hedges": 0, "failures": 0}
+                                                     for name in self.policies}
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._discard_session()
+            connector = aiohttp.TCPConnector(
+                limit=settings.INFERENCE_POOL_SIZE,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+            self._limits = {name: asyncio.Semaphore(policy.concurrency) for name, policy in self.policies.items()}
+        return self._session
+
+    async def post(self, endpoint: str, path: str, *, json: Any = None, data: Any = None,
+                   params: Any = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        """
+        POSTs to a service and returns the decoded JSON body.
+        All inference endpoints are idempotent, so hedging and retrying are safe.
+        The caller's priority (gpu_scheduler.slot / priority_scope) is sent along so the server can order its queue.
+
+        Raises:
+            InferenceError: on a 4xx response (not retried) or when every attempt failed.
+        """
+        policy = self.policies[endpoint]
+        session = self._ensure_session()
+        url = f"{policy.base_url}{path}"
+        headers = {**(headers or {}), PRIORITY_HEADER: str(int(current_priority.get()))}
+        counters = self.counters[endpoint]
+        counters["calls"] += 1
+        start = time.perf_counter()
+
+        async def attempt() -> Any:
+            async with self._limits[endpoint]:
+                async with session.post(url, json=json, data=data, params=params, headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=policy.timeout_s)) as response:
+                    if 400 <= response.status < 500:
+                        raise InferenceError(endpoint, f"{response.status}: {await response.text()}", response.status)
+                    response.raise_for_status()
+                    return await response.json()
+
+        last_error: Optional[BaseException] = None
+        for attempt_no in range(policy.retries + 1):
+            if attempt_no:
+                counters["retries"] += 1
+                await asyncio.sleep(min(0.1 * 2 ** (attempt_no - 1), 1.0))
+            try:
+                result = await self._hedged(endpoint, attempt, policy.hedge_after_s)
+                self.latency[endpoint].record(time.perf_counter() - start)
+                return result
+            except InferenceError as e:
+                if e.status is not None:
+                    counters["failures"] += 1
+                    raise
+                last_error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                logger.warning(f"⚠️ [{endpoint}] {path} attempt {attempt_no + 1} failed: {e!r}")
+
+        counters["failures"] += 1
+        raise InferenceError(endpoint, f"{path} failed after {policy.retries + 1} attempts: {last_error!r}")
+
+    async def _hedged(self, endpoint: str, attempt, hedge_after_s: float) -> Any:
+        """Runs 'attempt'; if it is slower than hedge_after_s, races a duplicate. First success wins."""
+        first = asyncio.ensure_future(attempt())
+        if hedge_after_s <= 0:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=hedge_after_s)
+        if done:
+            return first.result()
+
+        self.counters[endpoint]["hedges"] += 1
+        tasks = {first, asyncio.ensure_future(attempt())}
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _discard_session(self):
+        """Lets go of a session created on another event loop (it cannot be awaited from this one)."""
+        session, loop = self._session, self._loop
+        self._session = self._loop = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            # The old loop still runs in another thread: close the session there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # The loop ended without close() (a caller bug): its transports can no longer be closed from here,
+            # so the session is detached (marked closed) and dropped instead of lingering
+            logger.warning("⚠️ Inference session outlived its event loop (missing inference_client.close())")
+            session.detach()
+        logger.debug("🔌 Dropped the inference session of a previous event loop")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {**self.counters[name], "latency": self.latency[name].snapshot()} for name in self.policies}
+
+    async def close(self):
+        if self._loop is not None and self._loop is not asyncio.get_running_loop():
+            self._discard_session()
+            return
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = self._loop = None
+
+
+# Singleton instance
+inference_client = InferenceClient()
@@ -1,109 +1,222 @@
+import asyncio
+import hashlib
 import json
 import logging
 import re
-from typing import List, Dict, Tuple
-from wsl_brain.core.prompts import PLANNING_PROMPT_TEMPLATE, LEDGER_PROMPT_TEMPLATE, SYSTEM_PROMPT_WINDOWS
+from typing import Dict, Tuple, Optional
+from wsl_brain.core.prompts import (
+    PLANNING_PROMPT_TEMPLATE, LEDGER_PROMPT_TEMPLATE, SYSTEM_PROMPT_WINDOWS, SCREEN_INFO_IN_TURN, SCREEN_INFO_PROMPT
+)
 from wsl_brain.core.config import settings
+from wsl_brain.core.conversation import ConversationBuffer
+from shared.python.parsed_screen import ParsedScreen
 
 logger = logging.getLogger("Orchestrator")
 
+# Returned instead of the model's action when the ledger reports the request as satisfied
+LEDGER_DONE_ACTION = {"Reasoning": "Progress ledger: the request is satisfied.", "Next Action": "None", "Box ID": None}
+
+
+def ledger_verdict(ledger: Optional[Dict]) -> Tuple[bool, bool]:
+    """(is_request_satisfied, is_in_loop) from a ledger JSON (missing fields count as False)."""
+    ledger = ledger or {}
+    satisfied = bool((ledger.get("is_request_satisfied") or {}).get("answer", False))
+    in_loop = bool((ledger.get("is_in_loop") or {}).get("answer", False))
+    return satisfied, in_loop
+
+
+class LedgerSchedule:
+    """
+    Decides which steps run the ledger reflection: every K steps, or as soon as progress stalls
+    (the screen did not change after an action, or the same action was chosen again) for 'stall_steps' steps.
+    """
+
+    def __init__(self, every_k: int = None, stall_steps: int = None):
+        self.every_k = max(1, every_k if every_k is not None else settings.LEDGER_EVERY_K_STEPS)
+        self.stall_steps = max(1, stall_steps if stall_steps is not None else settings.LEDGER_STALL_STEPS)
+        self.stalled = 0
+        self._last_screen: Optional[bytes] = None
+        self._last_action: Optional[str] = None
+
+    @staticmethod
+    def _action_key(action: Optional[Dict]) -> Optional[str]:
+        if not action:
+            return None
+        return json.dumps({k: v for k, v in action.items() if k != "Reasoning"}, sort_keys=True, default=str)
+
+    def observe(self, screen_info: str, last_action: Optional[Dict]):
+        """Call once per step with the current screen and the action that led to it."""
+        screen = hashlib.blake2b(screen_info.encode(), digest_size=16).digest()
+        action = self._action_key(last_action)
+        unchanged = screen == self._last_screen
+        repeated = action is not None and action == self._last_action
+        self.stalled = self.stalled + 1 if (unchanged or repeated) else 0
+        self._last_screen, self._last_action = screen, action
+
+    def due(self, step: int) -> bool:
+        return step % self.every_k == 0 or self.stalled >= self.stall_steps
+
+    def reset(self):
+        self.stalled = 0
+        self._last_screen = self._last_action = None
+
+
 class VLMOrchestratedAgent:
     """
     Implements the OmniTool Orchestration Logic:
     1. Initial Planning
-    2. Step-wise Ledger Updates (Progress Tracking)
-    3. Token Management (Image Filtering)
+    2. Step-wise Ledger Updates (Progress Tracking; every K steps, concurrent with the action call)
+    3. Token Management (ConversationBuffer: image eviction + compaction; Context Caching)
     """
 
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, context_cache=None):
         self.llm = llm_client
+        # Optional GeminiContextCache: the action call then only sends the turns after the cached prefix
+        self.context_cache = context_cache
         self.task = ""
         self.plan = None
         self.ledger = None
         self.step_count = 0
-        self.max_images = 2  # As per OmniTool default
+        self.last_action: Optional[Dict] = None
+        self.ledger_schedule = LedgerSchedule()
 
-    async def step(self, messages: List[Dict], parsed_screen: Dict) -> Tuple[Dict, str]:
+    async def step(self, messages: ConversationBuffer, parsed_screen: Dict) -> Tuple[Dict, str]:
         """
         Main decision step.
         Returns: (Action_JSON, System_Prompt_Used)
         """
+        screen_info = parsed_screen.get("screen_info", "")
+
         # 1. Initialize Task & Plan (First Step)
+        run_ledger = False
         if self.step_count == 0:
             # The first message from user is the task
-            self.task = messages[0]["content"][0]["text"]
+            self.task = messages.first_text()
+            messages.pin_all()
             await self._generate_initial_plan(messages)
+            self.ledger_schedule.reset()
+            self.ledger_schedule.observe(screen_info, None)
 
-        # 2. Update Ledger (Subsequent Steps)
+        # 2. Update Ledger (Subsequent Steps, only when due)
         else:
-            await self._update_ledger(messages)
+            self.ledger_schedule.observe(screen_info, self.last_action)
+            if self.ledger_schedule.due(self.step_count):
+                if settings.ORCHESTRATOR_PARALLEL_LEDGER:
+                    run_ledger = True
+                else:
+                    await self._update_ledger(messages)
 
-        # 3. Context Management (Token Optimization)
-        # Remove old SOM images to save tokens
-        optimized_messages = self._filter_message_history(messages)
+        # 3-5. Context Management + System Prompt + LLM call
+        if run_ledger:
+            # Reflection and decision are independent round trips: run them together, reconcile afterwards
+            ledger_response, (response, system_prompt) = await asyncio.gather(
+                self._reflect(messages), self._decide(messages, screen_info)
+            )
+            self._apply_ledger(messages, ledger_response)
+            satisfied, in_loop = ledger_verdict(self.ledger)
+            if satisfied:
+                logger.info("📊 Ledger reports the request satisfied: dropping the concurrent action.")
+                response = json.dumps(LEDGER_DONE_ACTION)
+            elif in_loop:
+                # The action was chosen without knowing we are looping: decide again with the ledger in context
+                logger.info("📊 Ledger reports a loop: re-deciding with the ledger in context.")
+                response, system_prompt = await self._decide(messages, screen_info)
+        else:
+            response, system_prompt = await self._decide(messages, screen_info)
+
+        self.step_count += 1
+        self.last_action = json.loads(response)
+        return self.last_action, system_prompt
+
+    async def _decide(self, messages: ConversationBuffer, screen_info: str) -> Tuple[str, str]:
+        """The action call. Returns (raw JSON response, system prompt used)."""
+        # Context Management (Token Optimization)
+        # Old SOM images and old turns were already dropped/summarized by the buffer on append
+        optimized_messages = messages.messages()
 
-        # 4. Construct System Prompt with Screen Info
         # OmniParser V2 output injection
-        screen_info = parsed_screen.get("screen_info", "")
-        system_prompt = SYSTEM_PROMPT_WINDOWS.format(screen_info=screen_info)
+        if self.context_cache is None:
+            system_prompt = SYSTEM_PROMPT_WINDOWS.format(screen_info=screen_info)
+        else:
+            # Static system prompt (cacheable); the changing screen info travels in the newest turn
+            system_prompt = SYSTEM_PROMPT_WINDOWS.format(screen_info=SCREEN_INFO_IN_TURN)
+            screen_turn = {"role": "user", "content": [
+                {"type": "text", "text": SCREEN_INFO_PROMPT.format(screen_info=screen_info)}]}
+            stable_upto = self._stable_prefix_len(optimized_messages)
+            optimized_messages = optimized_messages + [screen_turn]
+            response = await self.context_cache.generate(
+                system_prompt,
+                optimized_messages,
+                stable_upto=stable_upto,
+                json_mode=True
+            )
+            if response is not None:
+                return response, system_prompt
 
-        # 5. Call LLM
+        # Uncached (no cache, prefix too short, or the cache build failed): the regular client
         response = await self.llm.generate(
             messages=optimized_messages,
             system_instruction=system_prompt,
             json_mode=True
         )
+        return response, system_prompt
 
-        self.step_count += 1
-        return json.loads(response), system_prompt
+    @staticmethod
+    def resolve_box_id(action_json: Dict, parsed_screen: Dict) -> Optional[Tuple[int, int]]:
+        """
+        Maps the 'Box ID' of a gui_click back to screen pixels (center of that element's bbox).
+        Returns None when the action carries no usable Box ID (e.g. the agent named an element instead).
+        """
+        box_id = action_json.get("Box ID")
+        if box_id is None:
+            return None
+        screen = parsed_screen.get("parsed_screen")
+        if screen is None:
+            screen = ParsedScreen.from_elements(parsed_screen.get("parsed_content_list", []))
+        try:
+            return screen.center(int(box_id))
+        except (TypeError, ValueError):
+            return None
 
     async def _generate_initial_plan(self, messages):
         prompt = PLANNING_PROMPT_TEMPLATE.format(task=self.task)
         # Temporary message for planning
-        plan_msgs = messages + [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+        plan_msgs = messages.messages() + [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
         
         response = await self.llm.generate(plan_msgs, json_mode=True)
         self.plan = json.loads(response)
         logger.info(f"📋 Generated Plan: {self.plan}")
         
         # Inject plan into history
-        messages.append({"role": "assistant", "content": [{"type": "text", "text": f"Plan: {response}"}]})
+        messages.append({"role": "assistant", "content": [{"type": "text", "text": f"Plan: {response}"}]}, pin=True)
 
     async def _update_ledger(self, messages):
+        self._apply_ledger(messages, await self._reflect(messages))
+
+    async def _reflect(self, messages) -> str:
+        """The ledger call (does not touch the history, so it can run next to _decide)."""
         prompt = LEDGER_PROMPT_TEMPLATE.format(task=self.task)
-        ledger_msgs = messages + [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
-        
-        response = await self.llm.generate(ledger_msgs, json_mode=True)
+        ledger_msgs = messages.messages() + [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+        return await self.llm.generate(ledger_msgs, json_mode=True)
+
+    def _apply_ledger(self, messages, response: str):
         self.ledger = json.loads(response)
-        
+
         # Log progress
-        satisfied = self.ledger.get("is_request_satisfied", {}).get("answer", False)
-        logger.info(f"📊 Ledger Update: Satisfied={satisfied}")
-        
+        satisfied, in_loop = ledger_verdict(self.ledger)
+        logger.info(f"📊 Ledger Update (step {self.step_count}): Satisfied={satisfied}, Loop={in_loop}")
+
         # Inject ledger into history
         messages.append({"role": "assistant", "content": [{"type": "text", "text": f"Ledger: {response}"}]})
 
-    def _filter_message_history(self, messages):
+    @staticmethod
+    def _stable_prefix_len(filtered_messages) -> int:
         """
-        Removes old screenshots to prevent context window overflow.
-        Keeps only the last N images.
+        Number of leading turns that will not change on the next append: everything before the oldest image
+        still kept (older images are already stripped). Compaction rewrites the summary turn; the context cache
+        notices the changed prefix and rebuilds.
         """
-        # Count images
-        total_images = sum(1 for m in messages for c in m["content"] if c["type"] == "image_url")
-        to_remove = total_images - self.max_images
-
-        if to_remove <= 0:
-            return messages
-
-        filtered_messages = []
-        for msg in messages:
-            new_content = []
-            for block in msg["content"]:
-                if block["type"] == "image_url":
-                    if to_remove > 0:
-                        to_remove -= 1
-                        continue # Skip this image (delete it)
-                new_content.append(block)
-            filtered_messages.append({"role": msg["role"], "content": new_content})
-            
-        return filtered_messages
+        for i, msg in enumerate(filtered_messages):
+            if any(block["type"] == "image_url" for block in msg["content"]):
+                return i
+        return len(filtered_messages)
@@ -2,15 +2,16 @@ import logging
 import json
 import asyncio
 from typing import List, Dict, Tuple, Optional
-from datetime import datetime
 
 from wsl_brain.core.config import settings
+from wsl_brain.core.conversation import ConversationBuffer
 from wsl_brain.core.prompts import (
     PLANNING_PROMPT,
     LEDGER_PROMPT,
     SYSTEM_PROMPT_WINDOWS,
     CODE_GENERATION_PROMPT
 )
+from wsl_brain.core.orchestration_logic import LEDGER_DONE_ACTION, LedgerSchedule, ledger_verdict
 # We assume a generic LLM wrapper (Gemini) is available
 from wsl_brain.actors.cognition import GeminiClient
 
@@ -21,7 +22,7 @@ class BrainOrchestrator:
     The High-Level Controller.
     Implements the 'Orchestrated Agent' pattern:
     1. Plan (Initial)
-    2. Ledger (Per Step Progress)
+    2. Ledger (Progress; every K steps or on stalls, concurrent with the action call)
     3. Action (GUI or Code)
     """
 
@@ -31,10 +32,12 @@ class BrainOrchestrator:
         self.plan = None
         self.ledger = None
         self.step_count = 0
+        self.last_action: Optional[Dict] = None
+        self.ledger_schedule = LedgerSchedule()
         
         # Context Management
-        self.history: List[Dict] = []
-        self.max_images_in_context = 2
+        # O(1) appends; keeps the newest CONTEXT_MAX_IMAGES screenshots and summarizes turns over the token budget
+        self.history = ConversationBuffer()
 
     async def initialize_task(self, instruction: str):
         """
@@ -42,7 +45,9 @@ class BrainOrchestrator:
         """
         self.task_instruction = instruction
         self.step_count = 0
-        self.history = []
+        self.history.clear()
+        self.last_action = None
+        self.ledger_schedule.reset()
         
         logger.info(f"🧠 Generating Plan for: {instruction}")
         
@@ -54,7 +59,7 @@ class BrainOrchestrator:
         self.plan = json.loads(response)
         
         # 3. Add Plan to History
-        self._add_to_history("assistant", f"Plan generated: {json.dumps(self.plan)}")
+        self._add_to_history("assistant", f"Plan generated: {json.dumps(self.plan)}", pin=True)
         logger.info(f"📋 Plan: {self.plan}")
 
     async def decide_next_step(self, screen_state: Dict) -> Dict:
@@ -64,33 +69,53 @@ class BrainOrchestrator:
         """
         self.step_count += 1
         
-        # 1. Update Progress Ledger
-        await self._update_ledger()
+        # 1. Update Progress Ledger (skipped on the first step; only every K steps or when stalled)
+        self.ledger_schedule.observe(screen_state.get("screen_info", ""), self.last_action)
+        run_ledger = self.step_count > 1 and self.ledger_schedule.due(self.step_count)
+        if run_ledger and not settings.ORCHESTRATOR_PARALLEL_LEDGER:
+            await self._update_ledger()
+            run_ledger = False
 
-        # 2. Construct the Vision-Language Prompt
+        # 2-4. Prompt, Context and Gemini call
+        if run_ledger:
+            # Two independent round trips: reflect and decide concurrently, reconcile afterwards
+            ledger_response, response = await asyncio.gather(self._reflect(), self._think(screen_state))
+            self._apply_ledger(ledger_response)
+            satisfied, in_loop = ledger_verdict(self.ledger)
+            if satisfied:
+                logger.info("📊 Ledger reports the request satisfied: dropping the concurrent action.")
+                response = json.dumps(LEDGER_DONE_ACTION)
+            elif in_loop:
+                logger.info("📊 Ledger reports a loop: re-deciding with the ledger in context.")
+                response = await self._think(screen_state)
+        else:
+            response = await self._think(screen_state)
+        
+        action_json = json.loads(response)
+        self.last_action = action_json
+        
+        # 5. Save Decision to History
+        self._add_to_history("assistant", json.dumps(action_json))
+        
+        return action_json
+
+    async def _think(self, screen_state: Dict) -> str:
+        """The action call. Returns the raw JSON response."""
         screen_info_text = screen_state.get("screen_info", "") # From OmniParser
         
         system_prompt = SYSTEM_PROMPT_WINDOWS.format(
             screen_info=screen_info_text
         )
         
-        # 3. Prepare Context (With Image Filtering)
+        # Prepare Context (With Image Filtering)
         context_messages = self._build_context_for_inference(screen_state)
 
-        # 4. Call Gemini
         logger.info(f"🤔 Thinking (Step {self.step_count})...")
-        response = await self.llm.generate_chat(
+        return await self.llm.generate_chat(
             system_instruction=system_prompt,
             messages=context_messages,
             json_mode=True
         )
-        
-        action_json = json.loads(response)
-        
-        # 5. Save Decision to History
-        self._add_to_history("assistant", json.dumps(action_json))
-        
-        return action_json
 
     async def _update_ledger(self):
         """
@@ -98,18 +123,23 @@ class BrainOrchestrator:
         """
         if self.step_count == 1: return # Skip on first step
 
+        self._apply_ledger(await self._reflect())
+
+    async def _reflect(self) -> str:
+        """The ledger call. Reads the history without modifying it (safe to run next to _think)."""
         prompt = LEDGER_PROMPT.format(task=self.task_instruction)
         
         # We send a text-only history for the ledger update to save tokens/time
         # (The ledger logic mainly needs the action history, not the screenshots)
-        text_history = [m for m in self.history if m.get("type") == "text"]
-        text_history.append({"role": "user", "content": prompt})
+        text_history = self.history.messages(images=False)
+        text_history.append({"role": "user", "content": [{"type": "text", "text": prompt}]})
         
-        response = await self.llm.generate_chat(messages=text_history, json_mode=True)
+        return await self.llm.generate_chat(messages=text_history, json_mode=True)
+
+    def _apply_ledger(self, response: str):
         self.ledger = json.loads(response)
         
-        satisfied = self.ledger.get("is_request_satisfied", {}).get("answer", False)
-        is_loop = self.ledger.get("is_in_loop", {}).get("answer", False)
+        satisfied, is_loop = ledger_verdict(self.ledger)
         
         logger.info(f"📊 Ledger: Satisfied={satisfied}, Loop={is_loop}")
         
@@ -119,36 +149,27 @@ class BrainOrchestrator:
     def _build_context_for_inference(self, screen_state: Dict) -> List[Dict]:
         """
         Constructs the message payload.
-        CRITICAL OPTIMIZATION: Removes old images to prevent context overflow.
+        CRITICAL OPTIMIZATION: Bounded history (old images and turns are dropped on append, not per step).
         """
-        # 1. Filter existing history (Keep text, drop old images)
-        optimized_history = []
-        image_count = 0
-        
-        # Iterate backwards to keep the newest images
-        for msg in reversed(self.history):
-            if msg.get("type") == "image":
-                if image_count < self.max_images_in_context:
-                    optimized_history.insert(0, msg)
-                    image_count += 1
-                # Else: Skip (Drop old image)
-            else:
-                optimized_history.insert(0, msg)
+        # 1. History: old images and old turns were already evicted/summarized by the buffer on append
+        history = self.history.messages()
         
         # 2. Add CURRENT Observation
         # (This is the fresh data from Perception Actor)
         current_obs = [
-            {"role": "user", "type": "image", "content": screen_state['base64_image']},
-            {"role": "user", "type": "text", "content": f"Observation: Screen parsed. UI Tree available. Ledger status: {json.dumps(self.ledger)}"}
+            {"role": "user", "content": [
+                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screen_state['base64_image']}"}},
+                {"type": "text", "text": f"Observation: Screen parsed. UI Tree available. Ledger status: {json.dumps(self.ledger)}"},
+            ]}
         ]
         
-        return optimized_history + current_obs
+        return history + current_obs
 
-    def _add_to_history(self, role: str, content: str, msg_type: str = "text"):
-        self.history.append({
-            "role": role,
-            "type": msg_type,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+    def _add_to_history(self, role: str, content: str, msg_type: str = "text", pin: bool = False):
+        if msg_type == "image":
+            block = {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{content}"}}
+        else:
+            block = {"type": "text", "text": content}
+        # The buffer timestamps the turn itself; the message dict is exactly what the LLM receives
+        self.history.append({"role": role, "content": [block]}, pin=pin)
 
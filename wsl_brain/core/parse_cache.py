@@ -0,0 +1,180 @@
+import logging
+import asyncio
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, List
+
+from wsl_brain.core.config import settings
+from wsl_brain.core.inference_client import inference_client
+from shared.python.frame_delta import TileHasher, Rect, changed_tiles, tiles_to_rects
+from shared.python.parsed_screen import ParsedScreen, iou_matrix
+
+logger = logging.getLogger(__name__)
+
+# The "Short-Term Visual Memory". Incremental OmniParser client.
+# Keeps the last parse per screen and, on a new frame, only re-parses the regions whose pixels changed:
+# crop -> /parse/image -> shift boxes back into full-frame coordinates -> merge with the untouched elements.
+# A cursor blink costs one tiny crop instead of a full-screen YOLO + OCR + Florence pass.
+
+# Element = OmniParser item with the bbox converted to full-frame pixels:
+# {"type": "text" | "icon", "bbox": [x1, y1, x2, y2], "interactivity": bool, "content": str}
+
+
+@dataclass
+class _ScreenState:
+    width: int
+    height: int
+    tile_hashes: np.ndarray
+    elements: List[Dict] = field(default_factory=list)
+
+
+@dataclass
+class ParsedFrame:
+    elements: List[Dict]
+    screen_info: str
+    mode: str            # "full" | "incremental" | "cached"
+    parsed_area: float   # Fraction of the frame that was sent to OmniParser
+
+    @cached_property
+    def screen(self) -> ParsedScreen:
+        """Spatial index over the elements (hit tests, Box ID -> point, A11y matching)."""
+        return ParsedScreen(self.elements)
+
+
+def format_screen_info(elements: List[Dict]) -> str:
+    """OmniTool screen_info format. The line index is the 'Box ID' the agent refers to."""
+    lines = []
+    for idx, element in enumerate(elements):
+        kind = "Text" if element.get("type") == "text" else "Icon"
+        lines.append(f"ID: {idx}, {kind}: {element.get('content', '')}")
+    return "\n".join(lines)
+
+
+class OmniParserCache:
+    """
+    Client-side, dirty-region aware OmniParser cache.
+    One state per 'screen_id' (e.g. one per monitor or per trace being verified).
+    """
+
+    def __init__(self, tile_size: int = None, max_dirty_ratio: float = None,
+                 margin: int = None, max_regions: int = None):
+        self.hasher = TileHasher(tile_size or settings.PARSE_CACHE_TILE_SIZE)
+        self.max_dirty_ratio = max_dirty_ratio if max_dirty_ratio is not None else settings.PARSE_CACHE_MAX_DIRTY_RATIO
+        self.margin = margin if margin is not None else settings.PARSE_CACHE_MARGIN
+        self.max_regions = max_regions or settings.PARSE_CACHE_MAX_REGIONS
+        self._screens: Dict[str, _ScreenState] = {}
+
+        self.stats = {"full": 0, "incremental": 0, "cached": 0, "pixels_parsed": 0, "pixels_seen": 0}
+
+    async def parse(self, image: np.ndarray, screen_id: str = "default") -> ParsedFrame:
+        """
+        Args:
+            image: BGR (H, W, 3) or BGRA (H, W, 4) uint8 frame.
+        Raises:
+            InferenceError if OmniParser is unreachable (the cached state is left untouched).
+        """
+        height, width = image.shape[:2]
+        bgra = image if image.shape[2] == 4 else cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        hashes = self.hasher.hash_tiles(bgra)
+        self.stats["pixels_seen"] += width * height
+
+        state = self._screens.get(screen_id)
+        if state is None or (state.width, state.height) != (width, height):
+            return await self._full_parse(image, screen_id, hashes)
+
+        mask = changed_tiles(state.tile_hashes, hashes)
+        if not mask.any():
+            self.stats["cached"] += 1
+            return ParsedFrame(state.elements, format_screen_info(state.elements), "cached", 0.0)
+
+        dirty = tiles_to_rects(mask, self.hasher.tile_size, width, height, self.max_regions)
+        regions = [self._expand(rect, width, height) for rect in dirty]
+        parsed_pixels = sum(w * h for _, _, w, h in regions)
+        if parsed_pixels > self.max_dirty_ratio * width * height:
+            return await self._full_parse(image, screen_id, hashes)
+
+        # Re-parse the dirty regions (with some context around them so edge elements are detected whole)
+        # Regions go out concurrently; the client caps how many hit OmniParser at once
+        crops = await asyncio.gather(*[self._parse_region(image, region) for region in regions])
+        found = [element for crop in crops for element in crop]
+        in_dirty = ParsedScreen(found).intersecting(dirty)
+        fresh = [element for element, hit in zip(found, in_dirty) if hit]
+
+        # Merge: everything touching a dirty region is replaced by what the crops found there
+        touched = ParsedScreen(state.elements).intersecting(dirty)
+        kept = [el for el, hit in zip(state.elements, touched) if not hit]
+        elements = self._sort(kept + self._dedupe(fresh))
+
+        self._screens[screen_id] = _ScreenState(width, height, hashes, elements)
+        self.stats["incremental"] += 1
+        self.stats["pixels_parsed"] += parsed_pixels
+        logger.debug(f"🧩 Incremental parse: {len(dirty)} region(s), {parsed_pixels / (width * height):.1%} of frame")
+        return ParsedFrame(elements, format_screen_info(elements), "incremental", parsed_pixels / (width * height))
+
+    def invalidate(self, screen_id: str = "default"):
+        self._screens.pop(screen_id, None)
+
+    async def _full_parse(self, image: np.ndarray, screen_id: str, hashes: np.ndarray) -> ParsedFrame:
+        height, width = image.shape[:2]
+        elements = self._sort(await self._parse_region(image, (0, 0, width, height)))
+        self._screens[screen_id] = _ScreenState(width, height, hashes, elements)
+        self.stats["full"] += 1
+        self.stats["pixels_parsed"] += width * height
+        return ParsedFrame(elements, format_screen_info(elements), "full", 1.0)
+
+    async def _parse_region(self, image: np.ndarray, region: Rect) -> List[Dict]:
+        """Sends one crop to OmniParser and returns its elements in full-frame pixel coordinates."""
+        x, y, w, h = region
+        crop = image[y:y + h, x:x + w]
+        if crop.shape[2] == 4:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGRA2BGR)
+        _, buffer = cv2.imencode('.jpg', crop)
+
+        data = await inference_client.post(
+            "omniparser", "/parse/image",
+            params={"include_som": "false"},
+            data=buffer.tobytes(),
+            headers={"Content-Type": "image/jpeg"},
+        )
+
+        elements = []
+        for item in data["parsed_content_list"]:
+            # OmniParser bboxes are ratios of the crop
+            bx1, by1, bx2, by2 = item["bbox"]
+            element = dict(item)
+            element["bbox"] = [x + bx1 * w, y + by1 * h, x + bx2 * w, y + by2 * h]
+            elements.append(element)
+        return elements
+
+    def _expand(self, rect: Rect, width: int, height: int) -> Rect:
+        x, y, w, h = rect
+        x0, y0 = max(0, x - self.margin), max(0, y - self.margin)
+        x1, y1 = min(width, x + w + self.margin), min(height, y + h + self.margin)
+        return x0, y0, x1 - x0, y1 - y0
+
+    @staticmethod
+    def _dedupe(elements: List[Dict], iou_threshold: float = 0.7) -> List[Dict]:
+        """Overlapping crops can detect the same element twice."""
+        if len(elements) < 2:
+            return elements
+        overlaps = iou_matrix([el["bbox"] for el in elements], [el["bbox"] for el in elements]) >= iou_threshold
+        unique: List[int] = []
+        for i in range(len(elements)):
+            if not overlaps[i, unique].any():
+                unique.append(i)
+        return [elements[i] for i in unique]
+
+    @staticmethod
+    def _sort(elements: List[Dict]) -> List[Dict]:
+        # Reading order keeps Box IDs stable when only a small area changes
+        return sorted(elements, key=lambda el: (round(el["bbox"][1]), round(el["bbox"][0])))
+
+    def stats_summary(self) -> Dict[str, float]:
+        parses = self.stats["full"] + self.stats["incremental"] + self.stats["cached"]
+        return {
+            **self.stats,
+            "parsed_fraction": self.stats["pixels_parsed"] / self.stats["pixels_seen"] if self.stats["pixels_seen"] else 0.0,
+            "reuse_rate": (self.stats["incremental"] + self.stats["cached"]) / parses if parses else 0.0,
+        }
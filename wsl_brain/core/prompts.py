@@ -15,6 +15,14 @@ Review the history.
 Output JSON: {{ "is_request_satisfied": {{ "answer": bool, "reason": str }}, ... }}
 """
 
+# With context caching the system prompt must not change between steps: screen info goes into the latest turn
+SCREEN_INFO_IN_TURN = "(Listed in the latest user message.)"
+
+SCREEN_INFO_PROMPT = """
+DETECTED ELEMENTS (OmniParser):
+{screen_info}
+"""
+
 SYSTEM_PROMPT_WINDOWS = """
 You are controlling a Windows 11 machine.
 You have access to GUI tools (Click, Type) and a Coding environment (Python).
@@ -23,7 +31,8 @@ DETECTED ELEMENTS (OmniParser):
 {screen_info}
 
 AVAILABLE ACTIONS:
-1. `gui_click`: Click on a Box ID or a UI element name.
+1. `gui_click`: Click on a Box ID, or name the UI element in "Target" when it has no Box ID.
+   - If you already know which element the step after this one will click, name it in "Next Target".
 2. `gui_type`: Type text.
 3. `gui_scroll`: Scroll up/down.
 4. `code_exec`: Write and execute a Python script (for calculation/extraction).
@@ -35,6 +44,8 @@ OUTPUT FORMAT (JSON):
     "Reasoning": "I see the Excel file is open. I need to calculate the sum.",
     "Next Action": "code_exec",
     "Code": "import pandas as pd; df = pd.read_excel('data.xlsx'); print(df['A'].sum())",
-    "Box ID": null
+    "Box ID": null,
+    "Target": null,
+    "Next Target": null
 }}
 """
\ No newline at end of file
@@ -1,9 +1,206 @@
 import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional
+
+from wsl_brain.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The "Traffic Controller". Priority-aware admission to the model services.
+# The models live in separate containers (UI-Ins, OmniParser) or in-process (Whisper), so each one gets its own
+# slot pool instead of one global lock. Waiters are served by priority, and background work can never take
+# the slots reserved for interactive requests.
+# Admission is per process: the DataMiner and the offline Synthesizer run their own scheduler. The priority is
+# therefore also sent with every inference call (X-Priority header) and the model servers order their own
+# queues by it, which is where work from different processes actually meets.
+
+
+class Priority(IntEnum):
+    """Lower value = served first."""
+    INTERACTIVE = 0   # The agent is waiting on this to click
+    VOICE = 1         # User commands
+    SPECULATIVE = 2   # Prefetches that may never be used
+    BACKGROUND = 3    # Flywheel mining, live synthesis, cache warming
+
+
+PRIORITY_HEADER = "X-Priority"
+
+# Priority of the inference calls made in the current task (read by the inference client)
+current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("current_priority",
+                                                                           default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: Priority):
+    """Tags the inference calls made inside the block, without taking a scheduler slot."""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class StaleRequest(Exception):
+    """The request was dropped from the queue because its result would no longer be used."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future", "is_stale", "enqueued_at")
+
+    def __init__(self, priority: Priority, seq: int, future: asyncio.Future, is_stale: Optional[Callable[[], bool]]):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.is_stale = is_stale
+        self.enqueued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Resource:
+    def __init__(self, name: str, slots: int, reserved: int):
+        self.name = name
+        self.slots = slots
+        # Slots only INTERACTIVE requests of this process may take (other processes are ordered server-side)
+        self.reserved = min(reserved, slots - 1) if slots > 1 else 0
+        self.in_use = 0
+        self.waiters: List[_Waiter] = []
+        self.metrics: Dict[str, Dict[str, float]] = {
+            p.name: {"acquired": 0, "stale": 0, "queue_ms_total": 0.0, "queue_ms_max": 0.0} for p in Priority
+        }
+
+    def can_admit(self, priority: Priority) -> bool:
+        free = self.slots - self.in_use
+        return free > (0 if priority == Priority.INTERACTIVE else self.reserved)
+
+
+class GpuScheduler:
+    """
+    Named resources with N concurrent slots each, served in priority order (FIFO within a priority).
+
+    Usage:
+        async with gpu_scheduler.slot("ui_ins", Priority.INTERACTIVE):
+            await inference_client.post("ui_ins", ...)
+
+    Keep a resource's slots <= the inference client's concurrency for that endpoint, otherwise requests
+    would queue again (FIFO) inside the client.
+    """
+
+    def __init__(self, resources: Dict[str, int], reserved_interactive: int = 1):
+        self._resources = {name: _Resource(name, slots, reserved_interactive) for name, slots in resources.items()}
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, resource: str, priority: Priority = Priority.INTERACTIVE,
+                   is_stale: Optional[Callable[[], bool]] = None, max_wait_s: Optional[float] = None):
+        """
+        Holds one slot of 'resource' for the duration of the block.
+
+        Args:
+            is_stale: checked when the request reaches the head of the queue; True drops it with StaleRequest.
+            max_wait_s: give up (StaleRequest) if no slot was granted within this time.
+        """
+        await self.acquire(resource, priority, is_stale, max_wait_s)
+        try:
+            with priority_scope(priority):
+                yield
+        finally:
+            self.release(resource)
+
+    async def acquire(self, resource: str, priority: Priority = Priority.INTERACTIVE,
+                      is_stale: Optional[Callable[[], bool]] = None, max_wait_s: Optional[float] = None):
+        res = self._resources[resource]
+
+        # Fast path: a slot is free and nobody of equal or higher priority is ahead of us
+        if res.can_admit(priority) and (not res.waiters or priority < res.waiters[0].priority):
+            res.in_use += 1
+            self._record(res, priority, 0.0)
+            return
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future(), is_stale)
+        heapq.heappush(res.waiters, waiter)
+        self._dispatch(res)
+        try:
+            if max_wait_s is not None:
+                await asyncio.wait_for(asyncio.shield(waiter.future), max_wait_s)
+            else:
+                await waiter.future
+        except asyncio.TimeoutError:
+            self._abandon(res, waiter)
+            res.metrics[priority.name]["stale"] += 1
+            raise StaleRequest(f"{resource}: no slot within {max_wait_s}s ({priority.name})")
+        except asyncio.CancelledError:
+            self._abandon(res, waiter)
+            raise
+
+    def release(self, resource: str):
+        res = self._resources[resource]
+        res.in_use -= 1
+        self._dispatch(res)
+
+    def _abandon(self, res: _Resource, waiter: _Waiter):
+        """A waiter gave up. If it had just been granted a slot, hand that slot on."""
+        if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+            res.in_use -= 1
+            self._dispatch(res)
+            return
+        if waiter in res.waiters:
+            res.waiters.remove(waiter)
+            heapq.heapify(res.waiters)
+
+    def _dispatch(self, res: _Resource):
+        while res.waiters:
+            head = res.waiters[0]
+            if head.future.done():
+                heapq.heappop(res.waiters)
+                continue
+            if head.is_stale is not None and head.is_stale():
+                heapq.heappop(res.waiters)
+                res.metrics[head.priority.name]["stale"] += 1
+                head.future.set_exception(StaleRequest(f"{res.name}: request became stale ({head.priority.name})"))
+                continue
+            if not res.can_admit(head.priority):
+                # Strict priority: lower classes never jump the queue ahead of the head
+                return
+            heapq.heappop(res.waiters)
+            res.in_use += 1
+            self._record(res, head.priority, (time.perf_counter() - head.enqueued_at) * 1000)
+            head.future.set_result(None)
+
+    @staticmethod
+    def _record(res: _Resource, priority: Priority, queue_ms: float):
+        stats = res.metrics[priority.name]
+        stats["acquired"] += 1
+        stats["queue_ms_total"] += queue_ms
+        stats["queue_ms_max"] = max(stats["queue_ms_max"], queue_ms)
+
+    def metrics(self) -> Dict[str, Dict]:
+        out = {}
+        for name, res in self._resources.items():
+            per_priority = {}
+            for priority, stats in res.metrics.items():
+                if stats["acquired"] or stats["stale"]:
+                    per_priority[priority] = {
+                        **stats,
+                        "queue_ms_avg": stats["queue_ms_total"] / stats["acquired"] if stats["acquired"] else 0.0,
+                    }
+            out[name] = {"slots": res.slots, "in_use": res.in_use, "queued": len(res.waiters), **per_priority}
+        return out
 
-class ResourceManager:
-    def __init__(self):
-        # Global lock to ensure only one heavy model runs on the GPU at a time
-        self.gpu_lock = asyncio.Lock()
 
 # Singleton instance
-gpu_manager = ResourceManager()
\ No newline at end of file
+gpu_scheduler = GpuScheduler(
+    {
+        "ui_ins": settings.UI_INS_CONCURRENCY,
+        "omniparser": settings.OMNIPARSER_CONCURRENCY,
+        "whisper": 1,  # In-process model: one transcription at a time
+    },
+    reserved_interactive=settings.GPU_RESERVED_INTERACTIVE_SLOTS,
+)
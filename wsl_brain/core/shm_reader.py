@@ -3,14 +3,75 @@ import os
 import logging
 import numpy as np
 import cv2
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple
 
 from wsl_brain.core.config import settings
+from shared.python.shm_protocol import (
+    ShmLayout, ShmProtocolError, read_layout, read_latest, read_slot, read_write_seq, pin_latest, set_pin,
+    claim_reader, renew_reader, release_reader
+)
 
 logger = logging.getLogger(__name__)
 
 # This implements the Zero-Copy mechanism. 
 # It uses memory-mapped files to read video frames written by the Windows Host, avoiding network serialization overhead.
+# The file is a seqlock-protected ring buffer (shared/python/shm_protocol.py): reads are lock-free and never return a torn frame.
+
+@dataclass
+class FrameSnapshot:
+    """A complete frame copied out of the ring, tagged with its sequence number."""
+    frame_seq: int
+    timestamp: float
+    width: int
+    height: int
+    image: np.ndarray  # (H, W, 4) BGRA
+    dirty_rects: List[Tuple[int, int, int, int]]  # Changed regions vs. the previous frame (x, y, w, h)
+
+class FrameView:
+    """
+    A zero-copy view of a ring slot. 'bgra' is backed directly by the mmap.
+    The slot stays pinned (the writer skips it) until release() or the end of the 'with' block.
+
+    copy_out() / to_bgr() write into buffers owned by the reader and reused across calls,
+    so their results are only valid until the next call on the same reader.
+    """
+
+    def __init__(self, reader: "SharedMemoryReader", slot: int, frame_seq: int, timestamp: float,
+                 width: int, height: int, bgra: np.ndarray, dirty_rects: List[Tuple[int, int, int, int]]):
+        self._reader = reader
+        self.slot = slot
+        self.frame_seq = frame_seq
+        self.timestamp = timestamp
+        self.width = width
+        self.height = height
+        self.bgra = bgra
+        self.dirty_rects = dirty_rects
+        self._released = False
+
+    def copy_out(self) -> np.ndarray:
+        """Copies the BGRA pixels into the reader's preallocated buffer."""
+        out = self._reader._buffer("bgra", (self.height, self.width, 4))
+        np.copyto(out, self.bgra)
+        return out
+
+    def to_bgr(self) -> np.ndarray:
+        """Converts BGRA -> contiguous BGR into the reader's preallocated buffer (ready for cv2.imencode)."""
+        out = self._reader._buffer("bgr", (self.height, self.width, 3))
+        cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2BGR, dst=out)
+        return out
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.bgra = None
+            self._reader._unpin(self.slot)
+
+    def __enter__(self) -> "FrameView":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
 
 class SharedMemoryReader:
     """
@@ -24,7 +85,15 @@ class SharedMemoryReader:
         self.file_path = settings.SHM_FILE_PATH
         self.file_handle = None
         self.mmap_obj = None
+        self.layout: Optional[ShmLayout] = None
         self._connected = False
+        # Reusable output buffers for FrameView.copy_out() / to_bgr()
+        self._buffers: Dict[str, np.ndarray] = {}
+        # Local pin refcounts. The pins themselves live in this reader's own lane of the ring,
+        # so other readers (Perception, LiveSynthesizer, ...) never release them.
+        self._pins: Dict[int, int] = {}
+        self._lane: Optional[int] = None
+        self._token = 0
 
     def connect(self):
         """Opens the memory mapped file."""
@@ -37,63 +106,160 @@ class SharedMemoryReader:
             self.mmap_obj = mmap.mmap(
                 self.file_handle.fileno(), 
                 length=0, 
-                access=mmap.ACCESS_READ
+                access=mmap.ACCESS_WRITE  # Write access is only used for slot pins
             )
+            self.layout = read_layout(self.mmap_obj)
             self._connected = True
-            logger.info(f"🔗 Connected to Shared Memory at {self.file_path}")
+            logger.info(f"🔗 Connected to Shared Memory at {self.file_path} ({self.layout.num_slots} slots)")
             return True
+        except ShmProtocolError as e:
+            logger.warning(f"⚠️ SHM ring not ready: {e}")
+            self.close()
+            return False
         except Exception as e:
             logger.error(f"❌ Failed to connect to SHM: {e}")
             return False
 
-    def read_frame(self, width: int, height: int, offset: int = 0) -> Optional[np.ndarray]:
-        """
-        Reads a frame from the shared buffer.
+    @property
+    def latest_frame_seq(self) -> int:
+        """Sequence number of the newest complete frame (0 if none)."""
+        if not self._connected and not self.connect():
+            return 0
+        return read_write_seq(self.mmap_obj)
 
-        Args:
-            width: Image width
-            height: Image height
-            offset: Byte offset in the SHM where the frame data begins.
-        
-        Returns:
-            numpy.ndarray (BGR format) or None if read failed.
+    def read_latest(self) -> Optional[FrameSnapshot]:
+        """
+        Returns the newest complete frame in the ring (BGRA), or None.
+        Never blocks on the writer: if a slot is being rewritten, we retry on the next newest one.
         """
         if not self._connected:
             if not self.connect():
                 return None
 
-        # Calculate expected size (assuming BGRA or RGB from Windows)
-        # Usually Windows DXGI returns BGRA (4 bytes per pixel)
-        expected_bytes = width * height * 4 
-
         try:
-            self.mmap_obj.seek(offset)
-            raw_data = self.mmap_obj.read(expected_bytes)
-            
-            if len(raw_data) != expected_bytes:
-                logger.warning("⚠️ Incomplete frame data read from SHM")
+            result = read_latest(self.mmap_obj, self.layout)
+            if result is None:
+                logger.warning("⚠️ No complete frame available in SHM")
                 return None
 
-            # Convert bytes to numpy array (Zero-Copy view if possible)
-            # Note: We copy here to avoid blocking the mmap, but np.frombuffer is fast
+            header, raw_data = result
             arr = np.frombuffer(raw_data, dtype=np.uint8)
-            
-            # Reshape to Image (H, W, Channels)
-            image = arr.reshape((height, width, 4))
-            
-            # Drop Alpha channel if not needed (convert BGRA -> BGR)
-            image = image[..., :3] 
-            
-            return image
+            image = arr.reshape((header.height, header.width, 4))
+            return FrameSnapshot(header.frame_seq, header.timestamp, header.width, header.height, image,
+                                 header.dirty_rects)
 
         except ValueError as e:
             logger.error(f"❌ Error reading frame from SHM: {e}")
             return None
 
+    def read_seq(self, frame_seq: int) -> Optional[FrameSnapshot]:
+        """
+        Copies out one specific frame (e.g. the one stamped on an input event), or None if the ring
+        has already overwritten it.
+        """
+        if not self._connected:
+            if not self.connect():
+                return None
+
+        for slot in range(self.layout.num_slots):
+            result = read_slot(self.mmap_obj, self.layout, slot, frame_seq)
+            if result is not None:
+                header, raw_data = result
+                image = np.frombuffer(raw_data, dtype=np.uint8).reshape((header.height, header.width, 4))
+                return FrameSnapshot(header.frame_seq, header.timestamp, header.width, header.height, image,
+                                     header.dirty_rects)
+        return None
+
+    def read_view(self) -> Optional[FrameView]:
+        """
+        Zero-copy read: returns a pinned view of the newest complete frame, or None.
+
+        Usage:
+            with reader.read_view() as view:
+                _, jpg = cv2.imencode('.jpg', view.to_bgr())
+        """
+        if not self._connected:
+            if not self.connect():
+                return None
+
+        lane = self._ensure_lane()
+        if lane is None:
+            return None
+
+        pinned = pin_latest(self.mmap_obj, self.layout, lane, settings.SHM_PIN_TIMEOUT_S)
+        if pinned is None:
+            logger.warning("⚠️ No complete frame available in SHM")
+            return None
+
+        slot, header = pinned
+        self._pins[slot] = self._pins.get(slot, 0) + 1
+        bgra = np.frombuffer(
+            self.mmap_obj, dtype=np.uint8, count=header.data_size, offset=self.layout.data_offset(slot)
+        ).reshape((header.height, header.width, 4))
+        bgra.flags.writeable = False
+        return FrameView(self, slot, header.frame_seq, header.timestamp, header.width, header.height, bgra,
+                         header.dirty_rects)
+
+    def _ensure_lane(self) -> Optional[int]:
+        """Claims (or renews) this reader's pin lane."""
+        if self._lane is not None and renew_reader(self.mmap_obj, self._lane, self._token):
+            return self._lane
+        if self._lane is not None:
+            logger.warning(f"⚠️ SHM pin lane {self._lane} was reclaimed; claiming a new one")
+            self._pins.clear()
+        try:
+            self._lane, self._token = claim_reader(self.mmap_obj)
+        except ShmProtocolError as e:
+            logger.error(f"❌ Cannot pin SHM frames: {e}")
+            self._lane = None
+        return self._lane
+
+    def _unpin(self, slot: int):
+        count = self._pins.get(slot, 0) - 1
+        if count > 0:
+            self._pins[slot] = count
+            return
+        self._pins.pop(slot, None)
+        if self.mmap_obj and self._lane is not None:
+            set_pin(self.mmap_obj, self.layout, slot, self._lane, 0.0)
+
+    def _buffer(self, name: str, shape) -> np.ndarray:
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        """
+        Reads the newest complete frame from the shared buffer.
+        Returns a caller-owned copy; prefer read_view() on hot paths.
+
+        Returns:
+            numpy.ndarray (BGR format) or None if read failed.
+        """
+        view = self.read_view()
+        if view is None:
+            return None
+
+        # Single pass: BGRA (mmap) -> fresh contiguous BGR
+        with view:
+            return cv2.cvtColor(view.bgra, cv2.COLOR_BGRA2BGR)
+
     def close(self):
         if self.mmap_obj:
-            self.mmap_obj.close()
+            if self._lane is not None:
+                release_reader(self.mmap_obj, self.layout, self._lane, self._token)
+            self._pins.clear()
+            try:
+                self.mmap_obj.close()
+            except BufferError:
+                logger.warning("⚠️ SHM still referenced by an unreleased FrameView; leaving mapping open")
         if self.file_handle:
             self.file_handle.close()
+        self.mmap_obj = None
+        self.file_handle = None
+        self.layout = None
+        self._lane = None
         self._connected = False
         logger.info("🔒 Closed Shared Memory connection")
\ No newline at end of file
@@ -0,0 +1,171 @@
+import logging
+import re
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from wsl_brain.core.config import settings
+from shared.python.frame_delta import Rect, rects_intersect, unflatten_rects
+from shared.python.events_pb2 import GroundingRequestEvent, GroundingResultEvent, VisualFrame
+
+logger = logging.getLogger(__name__)
+
+# The "Anticipation". Speculative grounding of the NEXT click target while the current action executes.
+# A prefetched target is tagged with the frame it was grounded on; every later frame's dirty regions are checked
+# against it, and the answer is thrown away as soon as the pixels around the target change.
+
+SPECULATIVE_PREFIX = "spec-"
+
+_ARTICLE = re.compile(r"^(the|a|an)\s+")
+
+
+def normalize_target(text: str) -> str:
+    """Key for a target name: 'the  "Save As" button.' and 'save as button' are the same element."""
+    text = " ".join(re.sub(r"[\"'`.,:;!?]", " ", text or "").lower().split())
+    return _ARTICLE.sub("", text)
+
+
+@dataclass
+class _Speculation:
+    instruction: str
+    request_id: str
+    issued_at: float
+    result: Optional[GroundingResultEvent] = None
+    valid: bool = True
+
+
+class SpeculativeGrounder:
+    """
+    Prefetches UI-Ins answers for upcoming plan steps.
+
+    Usage (CognitionActor):
+        await speculator.prefetch_next(action_json, parsed_screen)  # while this action runs
+        ...
+        result = speculator.take(next_action_json["Target"])        # None -> ground normally
+
+    Prefetches and lookups are keyed by normalize_target(), so the 'Next Target' announced by one step
+    matches the 'Target' of the following one.
+    """
+
+    def __init__(self, bus, target_margin: int = None, ttl_s: float = None, history: int = 64):
+        self.bus = bus
+        self.target_margin = target_margin if target_margin is not None else settings.SPECULATION_TARGET_MARGIN
+        self.ttl_s = ttl_s if ttl_s is not None else settings.SPECULATION_TTL_S
+        self._by_instruction: Dict[str, _Speculation] = {}
+        self._by_request: Dict[str, _Speculation] = {}
+        # Recent frames' dirty regions, to validate answers that arrive after the screen already moved on
+        self._frames: Deque[Tuple[int, List[Rect]]] = deque(maxlen=history)
+
+        self.stats = {"issued": 0, "hits": 0, "invalidated": 0, "expired": 0, "misses": 0, "on_screen": 0}
+
+    async def start(self):
+        await self.bus.subscribe("perception.grounding_result", GroundingResultEvent, self.on_grounding_result)
+        # Every frame matters here (each one carries its own dirty regions): no conflation
+        await self.bus.subscribe("video.frame_ready", VisualFrame, self.on_frame_ready, max_concurrency=1)
+
+    @staticmethod
+    def owns(request_id: str) -> bool:
+        """True for results of speculative requests (regular consumers should ignore them)."""
+        return request_id.startswith(SPECULATIVE_PREFIX)
+
+    async def prefetch_next(self, action_json: Dict, parsed_screen: Optional[Dict]):
+        """Prefetches the element the agent announced for its next click ('Next Target'), if it needs grounding."""
+        target = action_json.get("Next Target")
+        if not target:
+            return
+        if self._on_screen(target, parsed_screen):
+            # OmniParser already lists it: the next click will use its Box ID, no grounding call
+            self.stats["on_screen"] += 1
+            return
+        await self.prefetch(target)
+
+    async def prefetch(self, instruction: str):
+        """Grounds 'instruction' on the latest frame in the background (no-op if already in flight)."""
+        key = normalize_target(instruction)
+        if not key or key in self._by_instruction:
+            return
+        spec = _Speculation(instruction, f"{SPECULATIVE_PREFIX}{uuid.uuid4().hex[:12]}", time.time())
+        self._by_instruction[key] = spec
+        self._by_request[spec.request_id] = spec
+
+        request = GroundingRequestEvent()
+        request.request_id = spec.request_id
+        request.instruction = instruction
+        await self.bus.publish("perception.grounding_request", request)
+        self.stats["issued"] += 1
+        logger.debug(f"🔮 Prefetching grounding for '{instruction}'")
+
+    def take(self, instruction: str) -> Optional[GroundingResultEvent]:
+        """Returns a still-valid prefetched result (consuming it), or None."""
+        spec = self._by_instruction.pop(normalize_target(instruction), None)
+        if spec is None:
+            self.stats["misses"] += 1
+            return None
+        self._by_request.pop(spec.request_id, None)
+
+        if spec.result is None or not spec.valid:
+            self.stats["misses"] += 1
+            return None
+        if time.time() - spec.issued_at > self.ttl_s:
+            self.stats["expired"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        logger.info(f"🔮 Speculative hit for '{instruction}' (frame {spec.result.frame_seq})")
+        return spec.result
+
+    def clear(self):
+        """Plan changed: forget everything in flight."""
+        self._by_instruction.clear()
+        self._by_request.clear()
+
+    async def on_grounding_result(self, event: GroundingResultEvent):
+        spec = self._by_request.get(event.request_id)
+        if spec is None:
+            return
+        spec.result = event
+        # Frames that arrived between the grounding frame and this answer may already have moved the target
+        latest = event.frame_seq
+        for frame_seq, rects in self._frames:
+            if frame_seq > event.frame_seq:
+                if frame_seq != latest + 1 or self._touches(spec, rects):
+                    self._invalidate(spec, frame_seq)
+                    return
+                latest = frame_seq
+
+    async def on_frame_ready(self, event: VisualFrame):
+        rects = unflatten_rects(list(event.dirty_rects))
+        previous = self._frames[-1][0] if self._frames else None
+        self._frames.append((event.frame_seq, rects))
+
+        for spec in list(self._by_request.values()):
+            if spec.result is None or not spec.valid or event.frame_seq <= spec.result.frame_seq:
+                continue
+            # A gap in the sequence means a frame we never saw: its dirty regions are unknown
+            if previous is not None and event.frame_seq != previous + 1:
+                self._invalidate(spec, event.frame_seq)
+            elif self._touches(spec, rects):
+                self._invalidate(spec, event.frame_seq)
+
+    @staticmethod
+    def _on_screen(target: str, parsed_screen: Optional[Dict]) -> bool:
+        key = normalize_target(target)
+        elements = (parsed_screen or {}).get("parsed_content_list", [])
+        return any(normalize_target(str(element.get("content") or "")) == key for element in elements)
+
+    def _touches(self, spec: _Speculation, rects: List[Rect]) -> bool:
+        if not rects:
+            return True  # Unknown change: assume the worst
+        result, m = spec.result, self.target_margin
+        if not result.targets or not result.targets[0].found:
+            # "Not found" answers are only valid until anything changes
+            return True
+        target = (result.x - m, result.y - m, 2 * m, 2 * m)
+        return any(rects_intersect(target, rect) for rect in rects)
+
+    def _invalidate(self, spec: _Speculation, frame_seq: int):
+        spec.valid = False
+        self.stats["invalidated"] += 1
+        logger.debug(f"🔮 Dropped speculative target '{spec.instruction}': frame {frame_seq} changed it")
@@ -0,0 +1,340 @@
+import logging
+import asyncio
+import time
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from shared.python.bus_protocol import ChannelMode, encode_stream_entry, decode_stream_entry
+from wsl_brain.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The Transport Layer under the EventBus. One implementation per ChannelMode; the EventBus routes each channel to one of them.
+# Transports only move raw Protobuf bytes. Deserialization and callbacks stay in the EventBus, so switching a channel
+# between stream, pubsub and in-process never changes what a subscriber sees.
+# Conflating subscriptions keep only the newest message: a handler that falls behind skips to the latest value
+# instead of working through a backlog (frame pointers, cursor positions).
+
+# Receives one raw payload. Must not raise (the EventBus wraps every callback).
+PayloadHandler = Callable[[bytes], Awaitable[None]]
+
+
+class Transport:
+    """Base class. Subclasses deliver raw payloads for the channels routed to them."""
+
+    mode: ChannelMode
+
+    async def publish(self, channel: str, payload: bytes):
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, group: str, handler: PayloadHandler, max_concurrency: int,
+                        conflate: bool = False):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# ------------------------------------------------------------------
+# Queue-backed delivery (shared by PubSub and In-Process)
+# ------------------------------------------------------------------
+
+class _QueueSubscription:
+    """
+    A local queue drained by 'max_concurrency' worker tasks.
+    With maxsize=1 and one worker it is a latest-value slot: every offer replaces the undelivered payload.
+    """
+
+    def __init__(self, channel: str, handler: PayloadHandler, max_concurrency: int, maxsize: int = 0):
+        self.channel = channel
+        self.handler = handler
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(max_concurrency)]
+
+    def offer(self, payload: bytes):
+        """Non-blocking enqueue. A full queue sheds its oldest payload (fire-and-forget semantics)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+        self.queue.put_nowait(payload)
+
+    async def _worker(self):
+        while True:
+            payload = await self.queue.get()
+            try:
+                await self.handler(payload)
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+
+class InProcessTransport(Transport):
+    """
+    Delivers within this process through asyncio queues. No Redis involved.
+    Used for brain-internal channels and for running the actors in tests without a Redis server.
+    """
+
+    mode = ChannelMode.INPROC
+
+    def __init__(self):
+        self._subscriptions: Dict[str, List[_QueueSubscription]] = {}
+
+    async def publish(self, channel: str, payload: bytes):
+        for sub in self._subscriptions.get(channel, ()):
+            sub.offer(payload)
+
+    async def subscribe(self, channel: str, group: str, handler: PayloadHandler, max_concurrency: int,
+                        conflate: bool = False):
+        # Unbounded unless conflating: in-process delivery is reliable like a stream
+        sub = _QueueSubscription(channel, handler, 1, maxsize=1) if conflate \
+            else _QueueSubscription(channel, handler, max_concurrency)
+        self._subscriptions.setdefault(channel, []).append(sub)
+
+    async def close(self):
+        for subs in self._subscriptions.values():
+            for sub in subs:
+                await sub.close()
+        self._subscriptions.clear()
+
+
+class PubSubTransport(Transport):
+    """
+    Redis Pub/Sub. Fire-and-forget: nothing is stored, late or slow subscribers simply miss messages.
+    One connection listens for every pubsub channel; each subscription sheds its oldest message when it falls behind.
+    """
+
+    mode = ChannelMode.PUBSUB
+
+    def __init__(self, client: redis.Redis):
+        self._redis = client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subscriptions: Dict[bytes, List[_QueueSubscription]] = {}
+
+    async def publish(self, channel: str, payload: bytes):
+        await self._redis.publish(channel, payload)
+
+    async def subscribe(self, channel: str, group: str, handler: PayloadHandler, max_concurrency: int,
+                        conflate: bool = False):
+        if self._pubsub is None:
+            self._pubsub = self._redis.pubsub()
+        key = channel.encode()
+        if key not in self._subscriptions:
+            await self._pubsub.subscribe(channel)
+        sub = _QueueSubscription(channel, handler, 1, maxsize=1) if conflate \
+            else _QueueSubscription(channel, handler, max_concurrency, maxsize=settings.BUS_PUBSUB_QUEUE_SIZE)
+        self._subscriptions.setdefault(key, []).append(sub)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen_loop())
+
+    async def _listen_loop(self):
+        logger.info("🔄 Pub/Sub listener started")
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                for sub in self._subscriptions.get(message["channel"], ()):
+                    sub.offer(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Pub/Sub Loop Error: {e}")
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        for subs in self._subscriptions.values():
+            for sub in subs:
+                if sub.dropped:
+                    logger.info(f"📉 [{sub.channel}] skipped {sub.dropped} stale pub/sub messages")
+                await sub.close()
+        if self._pubsub:
+            await self._pubsub.close()
+
+
+# ------------------------------------------------------------------
+# Redis Streams + Consumer Groups
+# ------------------------------------------------------------------
+
+@dataclass
+class _StreamSubscription:
+    channel: str
+    group: str
+    handler: PayloadHandler
+    semaphore: asyncio.Semaphore
+    task: Optional[asyncio.Task] = None
+    inflight: Set[asyncio.Task] = field(default_factory=set)
+    pending_acks: List[bytes] = field(default_factory=list)
+    last_ack_flush: float = field(default_factory=time.monotonic)
+    conflate: bool = False
+    delivered: int = 0
+    skipped: int = 0
+
+
+class StreamTransport(Transport):
+    """
+    Redis Streams + Consumer Groups. Durable and replayable.
+    Every subscription owns a consumer group and a reader task, so a slow handler (e.g. a Gemini call)
+    only backs up its own channel. Handlers run concurrently up to a per-subscription limit and ACKs are batched.
+    Conflating subscriptions bypass the group: they wait with XREAD and fetch only the tail with XREVRANGE COUNT 1.
+    """
+
+    mode = ChannelMode.STREAM
+
+    def __init__(self, client: redis.Redis):
+        self._redis = client
+        self._consumer = settings.BUS_CONSUMER_NAME
+        self._subscriptions: List[_StreamSubscription] = []
+        self._running = True
+
+    async def publish(self, channel: str, payload: bytes):
+        await self._redis.xadd(channel, encode_stream_entry(payload),
+                               maxlen=settings.BUS_STREAM_MAXLEN, approximate=True)
+
+    async def subscribe(self, channel: str, group: str, handler: PayloadHandler, max_concurrency: int,
+                        conflate: bool = False):
+        sub = _StreamSubscription(channel=channel, group=group, handler=handler,
+                                  semaphore=asyncio.Semaphore(max_concurrency), conflate=conflate)
+        if conflate:
+            sub.task = asyncio.create_task(self._latest_loop(sub))
+        else:
+            await self._ensure_group(channel, group)
+            sub.task = asyncio.create_task(self._reader_loop(sub))
+        self._subscriptions.append(sub)
+
+    async def close(self):
+        """Stops all readers and flushes outstanding ACKs."""
+        self._running = False
+        for sub in self._subscriptions:
+            if sub.task:
+                sub.task.cancel()
+        for sub in self._subscriptions:
+            if sub.inflight:
+                await asyncio.gather(*sub.inflight, return_exceptions=True)
+            await self._flush_acks(sub, force=True)
+            if sub.skipped:
+                logger.info(f"📉 [{sub.channel}] delivered {sub.delivered}, skipped {sub.skipped} stale entries")
+
+    async def _ensure_group(self, channel: str, group: str):
+        """XGROUP CREATE ... MKSTREAM, tolerating groups that already exist."""
+        try:
+            await self._redis.xgroup_create(channel, group, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _reader_loop(self, sub: _StreamSubscription):
+        logger.info(f"🔄 Stream reader started for [{sub.channel}]")
+
+        # Start by re-delivering our own pending entries from a previous run, then switch to new messages
+        cursor = "0"
+
+        while self._running:
+            try:
+                events = await self._redis.xreadgroup(
+                    sub.group, self._consumer, {sub.channel: cursor},
+                    count=settings.BUS_READ_COUNT,
+                    block=settings.BUS_BLOCK_MS if cursor == ">" else None,
+                )
+                messages = events[0][1] if events else []
+
+                if cursor != ">":
+                    if not messages:
+                        cursor = ">"
+                        continue
+                    cursor = messages[-1][0]
+
+                for msg_id, msg_data in messages:
+                    # Backpressure: wait for a free handler slot on THIS channel only
+                    await sub.semaphore.acquire()
+                    task = asyncio.create_task(self._dispatch(sub, msg_id, msg_data))
+                    sub.inflight.add(task)
+                    task.add_done_callback(sub.inflight.discard)
+
+                await self._flush_acks(sub)
+
+            except asyncio.CancelledError:
+                raise
+            except ResponseError as e:
+                if "NOGROUP" in str(e):
+                    # Stream or group was deleted underneath us
+                    logger.warning(f"⚠️ Consumer group missing on [{sub.channel}]. Recreating.")
+                    await self._ensure_group(sub.channel, sub.group)
+                    cursor = ">"
+                else:
+                    logger.error(f"❌ Stream Loop Error on [{sub.channel}]: {e}")
+                    await asyncio.sleep(1)
+            except Exception as e:
+                logger.error(f"❌ Stream Loop Error on [{sub.channel}]: {e}")
+                await asyncio.sleep(1)
+
+    async def _latest_loop(self, sub: _StreamSubscription):
+        """Conflating reader: one handler call at a time, always on the newest entry. Nothing is ACKed or left pending."""
+        logger.info(f"🔄 Latest-value reader started for [{sub.channel}]")
+        last_id = "$"
+
+        while self._running:
+            try:
+                # 1. Wait until something newer than what we delivered exists (COUNT 1: we only need the wake-up)
+                events = await self._redis.xread({sub.channel: last_id}, count=1, block=settings.BUS_BLOCK_MS)
+                if not events:
+                    continue
+                first_id = events[0][1][0][0]
+
+                # 2. Jump to the tail, skipping everything queued in between
+                tail = await self._redis.xrevrange(sub.channel, count=1)
+                if not tail:
+                    continue
+                msg_id, msg_data = tail[0]
+                if msg_id != first_id:
+                    sub.skipped += 1  # At least one; the exact count would need another round trip
+                last_id = msg_id
+
+                raw_data = decode_stream_entry(msg_data)
+                if raw_data is not None:
+                    sub.delivered += 1
+                    await sub.handler(raw_data)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Stream Loop Error on [{sub.channel}]: {e}")
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, sub: _StreamSubscription, msg_id: bytes, msg_data: Optional[Dict[bytes, bytes]]):
+        try:
+            # Entries trimmed by MAXLEN come back from the pending list with no fields
+            raw_data = decode_stream_entry(msg_data)
+            if raw_data is not None:
+                await sub.handler(raw_data)
+        finally:
+            # ACK even on handler failure: a poison message must not be redelivered forever
+            sub.pending_acks.append(msg_id)
+            sub.semaphore.release()
+
+    async def _flush_acks(self, sub: _StreamSubscription, force: bool = False):
+        """Sends pending ACKs in one XACK once the batch is large or old enough."""
+        if not sub.pending_acks:
+            return
+        now = time.monotonic()
+        if not force and len(sub.pending_acks) < settings.BUS_ACK_BATCH_SIZE \
+                and (now - sub.last_ack_flush) * 1000 < settings.BUS_ACK_INTERVAL_MS:
+            return
+
+        ids, sub.pending_acks = sub.pending_acks, []
+        sub.last_ack_flush = now
+        try:
+            await self._redis.xack(sub.channel, sub.group, *ids)
+        except Exception as e:
+            logger.error(f"❌ Failed to ACK {len(ids)} messages on [{sub.channel}]: {e}")
@@ -4,6 +4,8 @@ import base64
 from typing import Dict, Tuple
 
 from wsl_brain.core.config import settings
+from wsl_brain.core.inference_client import inference_client, InferenceError
+from wsl_brain.core.parse_cache import format_screen_info
 # Assuming we reuse the LMMAgent wrapper we defined in core logic
 from wsl_brain.core.actors.cognition import LMMAgent 
 
@@ -59,6 +61,11 @@ class EvaAgent:
         if a11y_tree:
             # Truncate tree if too large to save tokens
             user_message += f"Final Accessibility Tree Snippet:\n{a11y_tree[:4000]}\n"
+        else:
+            # No A11y data (e.g. Linux sandbox or custom-drawn UI): fall back to OmniParser's element list
+            screen_info = await self._omniparser_structure(screenshot_bytes)
+            if screen_info:
+                user_message += f"Detected UI Elements (OmniParser):\n{screen_info[:4000]}\n"
         
         # Add message with image
         self.agent.add_message(
@@ -87,4 +94,21 @@ class EvaAgent:
         except Exception as e:
             logger.error(f"❌ [EvaAgent] Evaluation failed: {e}")
             return {"success": False, "reasoning": f"System Error: {str(e)}", "confidence": 0.0}
+
+    async def close(self):
+        """Closes the pooled inference session. Await it before the event loop that ran evaluate() ends."""
+        await inference_client.close()
+
+    async def _omniparser_structure(self, screenshot_bytes: bytes) -> str:
+        try:
+            data = await inference_client.post(
+                "omniparser", "/parse/image",
+                params={"include_som": "false"},
+                data=screenshot_bytes,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+        except InferenceError as e:
+            logger.warning(f"⚠️ [EvaAgent] OmniParser unavailable, judging from pixels only: {e}")
+            return ""
+        return format_screen_info(data["parsed_content_list"])
         
\ No newline at end of file
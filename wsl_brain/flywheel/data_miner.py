@@ -1,6 +1,8 @@
 import logging
 import json
+import time
 import asyncio
+import cv2
 from pathlib import Path
 from typing import List, Dict
 import numpy as np
@@ -9,6 +11,8 @@ import numpy as np
 from wsl_brain.actors.perception import PerceptionActor 
 # We need to calculate Intersection over Union (IoU) or Distance
 from wsl_brain.core.config import settings
+from wsl_brain.core.inference_client import inference_client, InferenceError
+from wsl_brain.core.resources import gpu_scheduler, Priority
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +28,6 @@ class DataMiner:
     def __init__(self):
         # We use a direct HTTP client here instead of the Actor system 
         # to avoid polluting the live message bus.
-        self.ui_ins_url = f"{settings.UI_INS_URL}/ground"
         self.failure_dir = Path("data/datasets/flywheel_failures")
         self.failure_dir.mkdir(parents=True, exist_ok=True)
 
@@ -33,6 +36,13 @@ class DataMiner:
         return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
     async def mine_trace(self, trace_path: str):
+        try:
+            await self._mine_trace(trace_path)
+        finally:
+            # Each run is its own asyncio.run(): close the pooled session before that loop ends
+            await inference_client.close()
+
+    async def _mine_trace(self, trace_path: str):
         """
         Iterate through a user trace.
         For every click:
@@ -90,9 +100,30 @@ class DataMiner:
                 logger.debug(f"✅ [DataMiner] Model match.")
 
     async def _query_model(self, img_path: Path, text: str):
-        # Implementation of HTTP request to UI-Ins service
-        # Returns (x, y) tuple
-        pass
+        """Asks UI-Ins for the target. Returns an (x, y) pixel tuple, or None."""
+        image = cv2.imread(str(img_path))
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+
+        try:
+            # Offline mining: only runs on slots the agent is not using
+            async with gpu_scheduler.slot("ui_ins", Priority.BACKGROUND):
+                # The JPEG goes up as-is (binary endpoint, no base64)
+                result = await inference_client.post(
+                    "ui_ins", "/ground/image",
+                    params={"instruction": text},
+                    data=img_path.read_bytes(),
+                    headers={"Content-Type": "image/jpeg"},
+                )
+        except InferenceError as e:
+            logger.error(f"❌ [DataMiner] UI-Ins query failed: {e}")
+            return None
+
+        if result.get("point") is None:
+            return None
+        # UI-Ins returns normalized coordinates
+        return int(result["point"][0] * width), int(result["point"][1] * height)
 
     def _save_failure_case(self, img_path, instruction, gt, pred):
         """Saves the data triplet for the Dataset Builder."""
@@ -6,6 +6,8 @@ from typing import List
 
 from wsl_brain.core.config import settings
 from wsl_brain.core.event_bus import EventBus
+from wsl_brain.core.inference_client import inference_client
+from wsl_brain.core.resources import gpu_scheduler
 from wsl_brain.actors.base_actor import BaseActor
 
 # Import Actors
@@ -13,6 +15,7 @@ from wsl_brain.actors.perception import PerceptionActor
 from wsl_brain.actors.cognition import CognitionActor
 from wsl_brain.actors.action import ActionActor
 from wsl_brain.actors.audio import AudioActor
+from wsl_brain.synthesizer.live import LiveSynthesizer
 
 # Configure Logging
 logging.basicConfig(
@@ -60,6 +63,10 @@ class BrainOrchestrator:
         # Action: Hands (Arrakis/Bridge)
         self.actors.append(ActionActor(self.bus))
 
+        # Live Synthesizer: builds workflows while the user records
+        if settings.SYNTH_LIVE_ENABLED:
+            self.actors.append(LiveSynthesizer(self.bus))
+
         logger.info(f"🧩 Initialized {len(self.actors)} Actors.")
 
     async def start(self):
@@ -90,6 +97,11 @@ class BrainOrchestrator:
         # Close Bus
         if self.bus:
             await self.bus.disconnect()
+
+        # Close pooled inference connections
+        logger.info(f"📈 Inference stats: {inference_client.stats()}")
+        logger.info(f"🚦 GPU queue stats: {gpu_scheduler.metrics()}")
+        await inference_client.close()
             
         logger.info("💀 System Offline.")
 
@@ -2,7 +2,7 @@ import logging
 import asyncio
 import json
 import base64
-import requests
+import aiohttp
 from typing import Dict, Any, List
 
 from wsl_brain.sandboxes.base import SandboxEnv, SandboxCapabilities
@@ -22,8 +22,11 @@ class ArrakisSandbox(SandboxEnv):
     """
     Controls an Arrakis MicroVM (Ubuntu).
     Provides sub-second snapshotting and secure code execution.
+    The py-arrakis SDK is synchronous: every SDK call runs in a worker thread, never on the event loop.
     """
 
+    boots_environment = True
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.base_url = config.get("arrakis_url", "http://localhost:7000")
@@ -46,14 +49,17 @@ class ArrakisSandbox(SandboxEnv):
 
     async def start(self) -> bool:
         logger.info(f"📦 [Arrakis] Connecting to Manager at {self.base_url}...")
+        # Pooled session + health pings against the manager's REST API
+        self._open_session()
+        self._start_health_loop()
         try:
             self.manager = SandboxManager(self.base_url)
-            # Start the VM
-            self.sandbox = self.manager.start_sandbox(self.image_name)
+            # Start the VM (blocking SDK call: boots a MicroVM)
+            self.sandbox = await asyncio.to_thread(self.manager.start_sandbox, self.image_name)
             
             # Extract VNC port from sandbox metadata
             # Assuming sb.info() returns dict with port_forwards
-            info = self.sandbox.info() 
+            info = await asyncio.to_thread(self.sandbox.info)
             # Logic to parse info for VNC port (5901 mapping)
             # self.vnc_port = parse_port(info) 
             
@@ -67,12 +73,22 @@ class ArrakisSandbox(SandboxEnv):
     async def stop(self) -> bool:
         if self.sandbox:
             try:
-                self.sandbox.destroy()
+                await asyncio.to_thread(self.sandbox.destroy)
                 logger.info("🛑 [Arrakis] Sandbox destroyed.")
             except Exception as e:
                 logger.error(f"⚠️ [Arrakis] Destroy failed: {e}")
+            self.sandbox = None
+        self._is_active = False
+        await self._close_session()
         return True
 
+    async def ping(self) -> bool:
+        try:
+            async with self.session.get(f"{self.base_url}/v1/health", timeout=aiohttp.ClientTimeout(total=2)) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
     async def get_screenshot(self) -> bytes:
         # Arrakis doesn't have a native screenshot API in the core SDK (it's VNC).
         # We assume a helper service running in the VM or reading the VNC stream.
@@ -80,7 +96,7 @@ class ArrakisSandbox(SandboxEnv):
         # For brevity, we simulate the HTTP call to a helper agent inside the VM.
         try:
             # Assumes Arrakis port forwarding to an internal agent on port 8000
-            res = self.sandbox.run_cmd("curl -s http://localhost:8000/screenshot_b64")
+            res = await asyncio.to_thread(self.sandbox.run_cmd, "curl -s http://localhost:8000/screenshot_b64")
             if res['exit_code'] == 0:
                 return base64.b64decode(res['output'])
         except Exception as e:
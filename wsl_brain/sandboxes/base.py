@@ -1,4 +1,7 @@
 import logging
+import asyncio
+import time
+import aiohttp
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, Tuple, List
 from pydantic import BaseModel
@@ -20,10 +23,20 @@ class SandboxEnv(ABC):
     Enforces a unified API for the Agent S3 Controller.
     """
 
+    # True when start() creates the environment (e.g. boots a VM): whoever started it must stop() it.
+    # False when start() only connects to something that outlives the Brain (release() is enough).
+    boots_environment = False
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self._is_active = False
 
+        # Long-lived HTTP session (HTTP-backed sandboxes). Opened in start(), closed in stop().
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.healthy = False
+        self.last_ping_ms: Optional[float] = None
+
     @property
     @abstractmethod
     def capabilities(self) -> SandboxCapabilities:
@@ -86,4 +99,79 @@ class SandboxEnv(ABC):
         """
         Reverts the system state to a specific snapshot.
         """
-        pass
\ No newline at end of file
+        pass
+
+    # --- Connection Management (shared by the HTTP-backed sandboxes) ---
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The sandbox's pooled session. Opened lazily if an action arrives before start()."""
+        if self._session is None or self._session.closed:
+            self._open_session()
+        return self._session
+
+    def _open_session(self):
+        """
+        One keep-alive connection pool per sandbox, so an action is a request on a warm socket,
+        not a TCP handshake + connector setup.
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self.config.get("pool_size", 8),
+            keepalive_timeout=self.config.get("keepalive_s", 60),
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config.get("request_timeout_s", 10),
+            connect=self.config.get("connect_timeout_s", 2),
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def release(self):
+        """
+        Drops this process's connection state (pooled session, health loop) without stopping the sandbox
+        itself: a VM or host keeps running for the next Brain.
+        """
+        await self._close_session()
+
+    async def _close_session(self):
+        await self._stop_health_loop()
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def ping(self) -> bool:
+        """Cheap liveness probe. HTTP sandboxes override this with their health endpoint."""
+        return self._is_active
+
+    def _start_health_loop(self):
+        interval = self.config.get("health_interval_s", 10)
+        if interval and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    async def _stop_health_loop(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    async def _health_loop(self, interval: float):
+        """Pings on the shared session; also keeps the pooled connection warm between sparse actions."""
+        name = type(self).__name__
+        while True:
+            start = time.perf_counter()
+            try:
+                ok = await self.ping()
+            except Exception:
+                ok = False
+            self.last_ping_ms = (time.perf_counter() - start) * 1000
+
+            if ok != self.healthy:
+                if ok:
+                    logger.info(f"💚 [{name}] Healthy ({self.last_ping_ms:.1f} ms).")
+                else:
+                    logger.warning(f"💔 [{name}] Health check failed.")
+            self.healthy = ok
+            await asyncio.sleep(interval)
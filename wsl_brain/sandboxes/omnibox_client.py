@@ -36,30 +36,37 @@ class OmniBoxSandbox(SandboxEnv):
         # In a real deployment, this might trigger `docker start`
         # Here we assume it's running and wait for healthcheck
         logger.info(f"📦 [OmniBox] Connecting to {self.api_url}...")
-        async with aiohttp.ClientSession() as session:
-            for i in range(5):
-                try:
-                    async with session.get(f"{self.api_url}/probe", timeout=2) as resp:
-                        if resp.status == 200:
-                            self._is_active = True
-                            logger.info("✅ [OmniBox] Connected.")
-                            return True
-                except:
-                    logger.debug("Waiting for OmniBox...")
-                    await asyncio.sleep(2)
+        self._open_session()
+        for i in range(5):
+            if await self.ping():
+                self._is_active = True
+                self.healthy = True
+                self._start_health_loop()
+                logger.info("✅ [OmniBox] Connected.")
+                return True
+            logger.debug("Waiting for OmniBox...")
+            await asyncio.sleep(2)
         return False
 
     async def stop(self) -> bool:
-        # No-op for persistent container, or docker stop logic
+        # No-op for persistent container, or docker stop logic. Just release the connection pool.
+        await self._close_session()
+        self._is_active = False
         return True
 
+    async def ping(self) -> bool:
+        try:
+            async with self.session.get(f"{self.api_url}/probe", timeout=aiohttp.ClientTimeout(total=2)) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
     async def get_screenshot(self) -> bytes:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.api_url}/screenshot") as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    # OmniBox returns base64
-                    return base64.b64decode(data['base64_image'])
+        async with self.session.get(f"{self.api_url}/screenshot") as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                # OmniBox returns base64
+                return base64.b64decode(data['base64_image'])
         return b""
 
     async def execute_mouse_action(self, action_type: str, x: int, y: int, button: str = "left") -> bool:
@@ -80,13 +87,12 @@ class OmniBoxSandbox(SandboxEnv):
         return await self._send_action(payload)
 
     async def _send_action(self, payload: Dict) -> bool:
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(f"{self.api_url}/step", json=payload) as resp:
-                    return resp.status == 200
-            except Exception as e:
-                logger.error(f"❌ [OmniBox] Action failed: {e}")
-                return False
+        try:
+            async with self.session.post(f"{self.api_url}/step", json=payload) as resp:
+                return resp.status == 200
+        except Exception as e:
+            logger.error(f"❌ [OmniBox] Action failed: {e}")
+            return False
 
     async def run_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
         # OmniBox supports python/bash via its agent endpoint
@@ -94,12 +100,12 @@ class OmniBoxSandbox(SandboxEnv):
             "code": command,
             "language": "python" # or powershell
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(f"{self.api_url}/exec", json=payload, timeout=timeout) as resp:
-                    return await resp.json()
-            except Exception as e:
-                return {'stdout': '', 'stderr': str(e), 'exit_code': -1}
+        try:
+            async with self.session.post(f"{self.api_url}/exec", json=payload,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                return await resp.json()
+        except Exception as e:
+            return {'stdout': '', 'stderr': str(e), 'exit_code': -1}
 
     async def snapshot_state(self, tag: str) -> str:
         logger.warning("⚠️ [OmniBox] Snapshots not supported on Windows Docker backend.")
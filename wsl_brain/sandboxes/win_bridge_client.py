@@ -1,6 +1,7 @@
 import logging
+import asyncio
 import aiohttp
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from wsl_brain.sandboxes.base import SandboxEnv, SandboxCapabilities
 
@@ -30,19 +31,33 @@ class WindowsBridgeSandbox(SandboxEnv):
         )
 
     async def start(self) -> bool:
-        # Host is always running
+        # Host is always running. Warm the pool now so the first action doesn't pay for the handshake.
+        self._open_session()
+        self._is_active = True
+        self.healthy = await self.ping()
+        if not self.healthy:
+            logger.warning(f"⚠️ [WinBridge] {self.api_url} not reachable yet; health loop will keep probing.")
+        self._start_health_loop()
         return True
 
     async def stop(self) -> bool:
+        await self._close_session()
+        self._is_active = False
         return True
 
+    async def ping(self) -> bool:
+        try:
+            async with self.session.get(f"{self.api_url}/status", timeout=aiohttp.ClientTimeout(total=2)) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
     async def get_screenshot(self) -> bytes:
         # For the Bridge, we usually prefer the SHM Reader in the Perception Actor
         # This is a fallback HTTP method
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.api_url}/screenshot") as resp:
-                if resp.status == 200:
-                    return await resp.read()
+        async with self.session.get(f"{self.api_url}/screenshot") as resp:
+            if resp.status == 200:
+                return await resp.read()
         return b""
 
     async def execute_mouse_action(self, action_type: str, x: int, y: int, button: str = "left") -> bool:
@@ -54,13 +69,39 @@ class WindowsBridgeSandbox(SandboxEnv):
         return await self._post_action(payload)
 
     async def _post_action(self, payload: Dict) -> bool:
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(f"{self.api_url}/action", json=payload) as resp:
-                    return resp.status == 200
-            except Exception as e:
-                logger.error(f"❌ [WinBridge] Connection failed: {e}")
-                return False
+        try:
+            async with self.session.post(f"{self.api_url}/action", json=payload) as resp:
+                return resp.status == 200
+        except Exception as e:
+            logger.error(f"❌ [WinBridge] Connection failed: {e}")
+            return False
+
+    async def execute_batch(self, steps: List[Dict[str, Any]], pause_ms: Optional[int] = None,
+                            stop_on_error: bool = True) -> Dict[str, Any]:
+        """
+        Runs an ordered list of actions in one round trip via POST /actions.
+        Steps use the /action schema plus "hotkey" and "wait" types and an optional per-step "delay_ms", e.g.
+            [{"type": "click", "x": 100, "y": 200, "delay_ms": 50}, {"type": "type", "text": "Hello"}]
+        Returns the Bridge's report: {"status": "success"|"partial"|"error", "results": [...], "total_ms": float}
+        """
+        payload: Dict[str, Any] = {"steps": steps, "stop_on_error": stop_on_error}
+        if pause_ms is not None:
+            payload["pause_ms"] = pause_ms
+
+        # The Bridge executes sequentially, so allow for the delays on top of the normal request timeout
+        budget_s = self.config.get("request_timeout_s", 10) + sum(
+            (step.get("delay_ms", 0) + (step.get("ms", 0) if step.get("type") == "wait" else 0)) for step in steps
+        ) / 1000
+        try:
+            async with self.session.post(f"{self.api_url}/actions", json=payload,
+                                         timeout=aiohttp.ClientTimeout(total=budget_s)) as resp:
+                report = await resp.json()
+                if resp.status != 200:
+                    return {"status": "error", "results": [], "error": report.get("error")}
+                return report
+        except Exception as e:
+            logger.error(f"❌ [WinBridge] Batch failed: {e}")
+            return {"status": "error", "results": [], "error": str(e)}
 
     async def run_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
         logger.error("⛔ [WinBridge] Code execution blocked on Host OS for security.")
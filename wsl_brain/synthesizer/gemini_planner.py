@@ -43,12 +43,18 @@ class WorkflowPlanner:
             meta = verified_metadata[i]
             
             # Text description of the event
-            action_desc = f"Step {i}: {frame['event_data']['type']} at {frame['event_data']['x']},{frame['event_data']['y']}"
+            event = frame['event_data']
+            if 'x' in event:
+                action_desc = f"Step {i}: {event.get('action', event['type'])} at {event['x']},{event['y']}"
+            else:
+                # Keyboard bursts: typed text or hotkey
+                action_desc = f"Step {i}: {event.get('action', event['type'])} '{event.get('text', '')}'"
             if meta['verified']:
                 action_desc += f" (Interacted with: {meta['element_name']})"
             
             prompt_content.append(action_desc)
-            prompt_content.append(frame['image_path']) # Gemini SDK handles file paths
+            if frame.get('image_path'):
+                prompt_content.append(frame['image_path']) # Gemini SDK handles file paths
 
         prompt_content.append("\nGenerate the JSON workflow:")
 
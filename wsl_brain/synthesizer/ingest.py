@@ -2,7 +2,9 @@ import json
 import cv2
 import logging
 import os
-from typing import List, Dict, Tuple
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
 # Shared schemas
@@ -10,69 +12,160 @@ from shared.python.gui360_schema import RawTraceEvent
 
 logger = logging.getLogger(__name__)
 
-# Optimized Data Loader. 
-# Instead of processing a massive video file, it uses the Event Log to perform Smart Keyframing
+# Optimized Data Loader.
+# Instead of processing a massive video file, it uses the Event Log to perform Smart Keyframing.
+# The video is decoded ONCE, front to back: no per-event seeks (each one re-decodes a whole GOP of the lossless x264 stream).
+
+# Event log entries that are user actions (see windows_host/capture/inputs.py). Legacy logs used the action as 'type'.
+ACTION_TYPES = {"mouse", "keyboard"}
+LEGACY_ACTION_TYPES = {"click", "keypress", "scroll"}
+
+
+def _to_ms(timestamp: float) -> float:
+    """Event logs carry epoch milliseconds; older traces used epoch seconds."""
+    return timestamp if timestamp > 1e11 else timestamp * 1000
+
 
 class TraceIngester:
     """
     Ingests a raw recording and performs 'Event-Based Keyframing'.
     Optimization: Discards 95% of video frames where no interaction occurred.
+
+    For every action it captures the screen just before it (pre) and once the UI has reacted (post).
+    The recording is variable frame rate (unchanged frames are suppressed), so "the screen at time T"
+    is the last frame whose timestamp is <= T.
     """
 
-    def __init__(self, trace_dir: str):
+    def __init__(self, trace_dir: str, pre_offset_ms: int = 100, post_delay_ms: int = 700, workers: int = 4):
         self.trace_dir = Path(trace_dir)
         self.video_path = self.trace_dir / "video.mp4"
         self.log_path = self.trace_dir / "events.jsonl"
-        
+        self.pre_offset_ms = pre_offset_ms
+        self.post_delay_ms = post_delay_ms
+        self.workers = workers
+
         if not self.video_path.exists() or not self.log_path.exists():
             raise FileNotFoundError(f"Invalid trace directory: {trace_dir}")
 
     def extract_keyframes(self) -> List[Dict]:
         """
         Scans the event log for clicks/types.
-        Extracts ONLY the video frame at that exact timestamp (+/- buffer).
-        Returns a list of {event, image_path} objects.
+        Extracts the video frames right before and right after each action in a single sequential decode.
+        Returns a list of {event, image_path, post_image_path} objects.
         """
         logger.info(f"🎞️ Extracting keyframes from {self.trace_dir}")
-        
+
         events = []
         with open(self.log_path, 'r') as f:
             for line in f:
-                events.append(json.loads(line))
+                if line.strip():
+                    events.append(json.loads(line))
+
+        session_start_ms = self._session_start_ms(events)
 
         # Filter for interaction events
-        action_events = [e for e in events if e['type'] in ['click', 'keypress', 'scroll']]
-        
-        cap = cv2.VideoCapture(str(self.video_path))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        
+        action_events = [e for e in events if e.get('type') in ACTION_TYPES | LEGACY_ACTION_TYPES]
+
+        # One capture target per (action, phase), in video time, sorted so a single forward pass serves them all
+        targets: List[Tuple[float, int, str]] = []
+        for idx, event in enumerate(action_events):
+            start_ms = _to_ms(event['timestamp']) - session_start_ms
+            end_ms = _to_ms(event.get('end_timestamp') or event['timestamp']) - session_start_ms
+            targets.append((max(0.0, start_ms - self.pre_offset_ms), idx, "pre"))
+            targets.append((end_ms + self.post_delay_ms, idx, "post"))
+        targets.sort()
+
+        output_dir = self.trace_dir / "processed"
+        os.makedirs(output_dir, exist_ok=True)
+        paths = self._stream_frames(targets, action_events, output_dir)
+
         keyframes = []
-        
         for idx, event in enumerate(action_events):
-            timestamp = event['timestamp']
-            frame_id = int(timestamp * fps)
-            
-            # Seek to frame
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
-            ret, frame = cap.read()
-            
-            if ret:
-                # Save keyframe to disk (temporarily) for VLM consumption
-                image_filename = f"action_{idx:03d}_{event['type']}.jpg"
-                image_path = self.trace_dir / "processed" / image_filename
-                os.makedirs(image_path.parent, exist_ok=True)
-                
-                cv2.imwrite(str(image_path), frame)
-                
-                keyframes.append({
-                    "step_id": idx,
-                    "event_data": event,
-                    "image_path": str(image_path),
-                    "timestamp": timestamp
-                })
-            else:
-                logger.warning(f"⚠️ Could not read frame at {timestamp}s")
+            pre_path, post_path = paths.get((idx, "pre")), paths.get((idx, "post"))
+            if pre_path is None:
+                logger.warning(f"⚠️ No frame before event {idx} at {event['timestamp']}")
+                continue
+            keyframes.append({
+                "step_id": idx,
+                "event_data": event,
+                "image_path": pre_path,
+                "post_image_path": post_path,
+                "timestamp": event['timestamp'],
+                "video_time_s": (_to_ms(event['timestamp']) - session_start_ms) / 1000,
+            })
 
-        cap.release()
         logger.info(f"✅ Extracted {len(keyframes)} keyframes from trace.")
-        return keyframes
\ No newline at end of file
+        return keyframes
+
+    def _stream_frames(self, targets: List[Tuple[float, int, str]], action_events: List[Dict],
+                       output_dir: Path) -> Dict[Tuple[int, str], str]:
+        """
+        Decodes the video in order. When a frame's timestamp passes a target, the previous frame is the
+        screen at that target. JPEG encoding + disk writes run on a thread pool while decoding continues.
+        """
+        cap = cv2.VideoCapture(str(self.video_path))
+        paths: Dict[Tuple[int, str], str] = {}
+        written: Dict[int, str] = {}   # frame number -> path, so targets landing on the same frame share one file
+        pending = []
+        next_target = 0
+
+        def assign(frame, frame_no: int, until_ms: Optional[float]):
+            """Assigns 'frame' to every remaining target before 'until_ms' (None = all of them)."""
+            nonlocal next_target
+            while next_target < len(targets) and (until_ms is None or targets[next_target][0] < until_ms):
+                _, idx, phase = targets[next_target]
+                next_target += 1
+                if frame is None:
+                    continue
+                if frame_no not in written:
+                    event_type = action_events[idx].get('action') or action_events[idx]['type']
+                    image_path = output_dir / f"action_{idx:03d}_{event_type}_{phase}.jpg"
+                    written[frame_no] = str(image_path)
+                    pending.append(pool.submit(cv2.imwrite, str(image_path), frame))
+                paths[(idx, phase)] = written[frame_no]
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="keyframe-writer") as pool:
+            previous, previous_no, frame_no = None, -1, 0
+            while next_target < len(targets):
+                if not cap.grab():
+                    break
+                frame_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                # Targets before this frame are showing the previous one
+                if previous is not None:
+                    assign(previous, previous_no, frame_ms)
+
+                # grab() already decoded the frame; retrieve() only hands it over
+                ok, frame = cap.retrieve()
+                if ok:
+                    if previous is None:
+                        # Targets before the first frame (recording not started yet) get the first frame
+                        assign(frame, frame_no, frame_ms)
+                    previous, previous_no = frame, frame_no
+                frame_no += 1
+
+            # Targets after the last frame: the screen did not change again
+            assign(previous, previous_no, None)
+
+            for future in pending:
+                if not future.result():
+                    logger.warning("⚠️ A keyframe could not be written.")
+
+        cap.release()
+        logger.debug(f"🎞️ Decoded {frame_no} frames once, wrote {len(written)} keyframes.")
+        return paths
+
+    def _session_start_ms(self, events: List[Dict]) -> float:
+        """
+        Epoch ms of the first video frame. Recorded by the SessionManager; older traces fall back to
+        the trace id ('trace_<epoch>') or the first logged event.
+        """
+        for event in events:
+            if event.get('type') == "session" and event.get('action') == "video_start":
+                return _to_ms(event['timestamp'])
+
+        match = re.search(r"(\d{9,})$", self.trace_dir.name)
+        if match:
+            return int(match.group(1)) * 1000.0
+
+        stamps = [_to_ms(e['timestamp']) for e in events if 'timestamp' in e]
+        return min(stamps) if stamps else 0.0
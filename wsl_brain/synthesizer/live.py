@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from wsl_brain.actors.base_actor import BaseActor
+from wsl_brain.core.config import settings
+from wsl_brain.core.resources import gpu_scheduler, Priority, StaleRequest
+from wsl_brain.core.shm_reader import SharedMemoryReader
+from wsl_brain.synthesizer.omniparser_verifier import ElementVerifier
+from wsl_brain.synthesizer.gemini_planner import WorkflowPlanner
+from wsl_brain.synthesizer.schema_builder import save_workflow
+from shared.python.events_pb2 import UserInteraction, VisualFrame, RecordingControlEvent
+
+logger = logging.getLogger(__name__)
+
+# The Streaming Synthesizer (Pipe & Filter). Builds the workflow WHILE the user is recording:
+# Click -> SHM snapshot -> OmniParser (incremental) -> verified step. On "Stop Recording" only the planner is left to run.
+# The Windows Host announces its recording session on control.recording ("start" on launch, "stop" on shutdown).
+
+
+class LiveSynthesizer(BaseActor):
+    """
+    Live counterpart of SynthesizerEngine.
+
+    - input.interaction: every action becomes a step; clicks snapshot the current SHM frame immediately.
+    - video.frame_ready (conflated): while the user is idle, the latest frame is re-parsed so the
+      parse cache stays warm and a click only costs the regions that changed since.
+    - control.recording: "start" resets the session, "stop" drains verification and finalizes the workflow.
+
+    Steps are verified in arrival order on one parse-cache screen (incremental parsing needs order).
+    """
+
+    def __init__(self, bus, shm_reader: Optional[SharedMemoryReader] = None,
+                 verifier: Optional[ElementVerifier] = None, planner: Optional[WorkflowPlanner] = None):
+        super().__init__(bus, name="LiveSynthesizer")
+        self.shm_reader = shm_reader or SharedMemoryReader()
+        self.verifier = verifier or ElementVerifier()
+        self.planner = planner
+
+        self.recording = False
+        self.session_id = ""
+        self.session_dir: Optional[Path] = None
+        self.steps: List[Dict] = []
+        self.verified_meta: List[Dict] = []
+        self._queue: "asyncio.Queue[Tuple[int, np.ndarray]]" = asyncio.Queue()
+        self._latest_frame_seq = 0
+        self._warmed_frame_seq = 0
+        # Click verification and idle warming share the "live" parse-cache screen: one parse at a time
+        self._parse_lock = asyncio.Lock()
+
+    async def setup(self):
+        if not self.shm_reader.connect():
+            logger.warning(f"[{self.name}] SHM not connected yet; will retry on first click.")
+
+        # One handler at a time: steps must be recorded in the order the user performed them
+        await self.bus.subscribe("control.recording", RecordingControlEvent, self.handle_control, max_concurrency=1)
+        await self.bus.subscribe("input.interaction", UserInteraction, self.handle_interaction, max_concurrency=1)
+        # Only the newest frame matters for warming the cache
+        await self.bus.subscribe("video.frame_ready", VisualFrame, self.on_frame_ready, conflate=True)
+
+        self.run_in_background(self._verify_loop())
+        if settings.SYNTH_LIVE_WARM_INTERVAL_S > 0:
+            self.run_in_background(self._warm_loop())
+
+    async def cleanup(self):
+        self.shm_reader.close()
+
+    # --- Session Control ---
+
+    async def handle_control(self, event: RecordingControlEvent):
+        if event.command == "start":
+            self.begin(event.session_id or f"live_{int(time.time())}")
+        elif event.command == "stop":
+            await self.finish(event.output_name or self.session_id)
+
+    def begin(self, session_id: str):
+        """Starts a new live session (drops any unfinished one)."""
+        self.session_id = session_id
+        self.session_dir = Path(settings.SYNTH_LIVE_DIR) / session_id / "processed"
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        self.steps, self.verified_meta = [], []
+        self.verifier.parse_cache.invalidate("live")
+        self.recording = True
+        logger.info(f"⏺️ [{self.name}] Live synthesis started for {session_id}")
+
+    async def finish(self, output_name: str) -> Optional[Dict]:
+        """
+        Stop Recording: waits for the (usually already finished) verifications, then plans and saves.
+        Returns the raw plan.
+        """
+        if not self.recording:
+            logger.warning(f"[{self.name}] Stop received but no live session is running.")
+            return None
+        self.recording = False
+        stop_time = time.perf_counter()
+
+        pending = self._queue.qsize()
+        await self._queue.join()
+        logger.info(f"⏹️ [{self.name}] {len(self.steps)} steps captured, {pending} verification(s) were pending at stop.")
+
+        planner = self.planner or WorkflowPlanner()
+        raw_plan = await planner.generate_plan(self.steps, self.verified_meta)
+        save_workflow(raw_plan, output_name)
+        logger.info(f"🎉 [{self.name}] Workflow {output_name} ready {time.perf_counter() - stop_time:.1f}s after stop.")
+        return raw_plan
+
+    # --- Stream Handlers ---
+
+    async def on_frame_ready(self, event: VisualFrame):
+        self._latest_frame_seq = event.frame_seq
+
+    async def handle_interaction(self, event: UserInteraction):
+        if not self.recording:
+            return
+
+        kind = event.WhichOneof("event")
+        if kind == "mouse":
+            mouse = event.mouse
+            event_data = {"type": "mouse", "action": mouse.type, "x": mouse.x, "y": mouse.y,
+                          "button": mouse.button, "timestamp": event.timestamp}
+            if mouse.type == "scroll":
+                event_data["scroll_delta"] = mouse.scroll_delta
+        elif kind == "keyboard":
+            keys = event.keyboard
+            event_data = {"type": "keyboard", "action": keys.type, "text": keys.text or keys.key,
+                          "timestamp": event.timestamp, "end_timestamp": keys.end_timestamp or event.timestamp,
+                          "frame_seq": keys.frame_seq}
+        else:
+            return
+
+        step_id = len(self.steps)
+        step = {"step_id": step_id, "event_data": event_data, "image_path": None, "timestamp": event.timestamp}
+        self.steps.append(step)
+        self.verified_meta.append({"verified": False})
+
+        if event_data["action"] != "click":
+            return
+
+        # The frame the user clicked on (stamped on press), not whatever is on screen now that the click
+        # has taken effect; grab it before the ring overwrites it
+        frame = self._snapshot(event.mouse.frame_seq)
+        if frame is None:
+            self.verified_meta[step_id] = {"verified": False, "reason": "Video stream unavailable"}
+            return
+        frame_seq, image = frame
+        event_data["frame_seq"] = frame_seq
+        self._queue.put_nowait((step_id, image))
+
+    # --- Workers ---
+
+    def _snapshot(self, frame_seq: int = 0) -> Optional[Tuple[int, np.ndarray]]:
+        """Private copy of frame 'frame_seq' (0 = newest). Falls back to the newest frame if it is gone."""
+        if frame_seq:
+            snapshot = self.shm_reader.read_seq(frame_seq)
+            if snapshot is not None:
+                return snapshot.frame_seq, snapshot.image
+            logger.debug(f"[{self.name}] Frame {frame_seq} already overwritten, using the newest one")
+
+        view = self.shm_reader.read_view()
+        if view is None:
+            return None
+        with view:
+            # Private copy: the slot is handed back to the writer right away
+            return view.frame_seq, view.bgra.copy()
+
+    async def _verify_loop(self):
+        """Verifies clicks in arrival order (one parse-cache screen, incremental between clicks)."""
+        while self._running:
+            step_id, image = await self._queue.get()
+            try:
+                step = self.steps[step_id]
+                event_data = step["event_data"]
+
+                image_path = self.session_dir / f"action_{step_id:03d}_click.jpg"
+                bgr = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+                write = asyncio.create_task(asyncio.to_thread(cv2.imwrite, str(image_path), bgr))
+
+                async with self._parse_lock, gpu_scheduler.slot("omniparser", Priority.BACKGROUND):
+                    parsed = await self.verifier.parse(image, "live")
+                self.verified_meta[step_id] = (
+                    self.verifier.hit_test(parsed, (event_data["x"], event_data["y"])) if parsed is not None
+                    else {"verified": False, "reason": "Service Unavailable"}
+                )
+                await write
+                step["image_path"] = str(image_path)
+                self._warmed_frame_seq = event_data.get("frame_seq", 0)
+            except Exception as e:
+                logger.error(f"[{self.name}] Live verification of step {step_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _warm_loop(self):
+        """While the user is idle, keeps the parse cache in sync with the screen."""
+        while self._running:
+            await asyncio.sleep(settings.SYNTH_LIVE_WARM_INTERVAL_S)
+            if not self.recording or not self._queue.empty():
+                continue
+            if self._latest_frame_seq == self._warmed_frame_seq:
+                continue
+
+            frame = self._snapshot()
+            if frame is None:
+                continue
+            frame_seq, image = frame
+            try:
+                # A click queued meanwhile will parse a newer frame anyway: don't warm a stale one
+                async with self._parse_lock, gpu_scheduler.slot("omniparser", Priority.BACKGROUND,
+                                                                is_stale=lambda: not self._queue.empty()):
+                    await self.verifier.parse(image, "live")
+            except StaleRequest:
+                continue
+            self._warmed_frame_seq = frame_seq
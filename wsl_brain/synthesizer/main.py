@@ -1,37 +1,110 @@
 import asyncio
+import hashlib
 import logging
+import time
+from typing import Dict, List
 from .ingest import TraceIngester
 from .omniparser_verifier import ElementVerifier
 from .gemini_planner import WorkflowPlanner
 from .schema_builder import save_workflow
+from wsl_brain.core.config import settings
+from wsl_brain.core.inference_client import inference_client
+from wsl_brain.core.resources import Priority, priority_scope
 
 logger = logging.getLogger(__name__)
 
 # The Entry Point for this module.
 
 class SynthesizerEngine:
-    def __init__(self):
+    def __init__(self, verify_lanes: int = None):
         self.verifier = ElementVerifier()
         self.planner = WorkflowPlanner()
+        self.verify_lanes = verify_lanes or settings.SYNTH_VERIFY_LANES
 
     async def process_trace(self, trace_path: str, output_name: str):
+        try:
+            await self._process_trace(trace_path, output_name)
+        finally:
+            # Each run is its own asyncio.run(): close the pooled session before that loop ends
+            await inference_client.close()
+
+    async def _process_trace(self, trace_path: str, output_name: str):
         # 1. Ingest & Keyframe
         ingester = TraceIngester(trace_path)
-        keyframes = ingester.extract_keyframes()
-        
+        keyframes = await asyncio.to_thread(ingester.extract_keyframes)
+
         # 2. Verify Elements (The Specialist Loop)
-        verified_meta = []
-        for frame in keyframes:
-            if 'x' in frame['event_data']:
-                coords = (frame['event_data']['x'], frame['event_data']['y'])
-                meta = self.verifier.verify_click(frame['image_path'], coords)
-                verified_meta.append(meta)
-            else:
-                verified_meta.append({"verified": False})
+        verified_meta = await self.verify_keyframes(keyframes)
 
         # 3. Plan (The Generalist Loop)
         raw_plan = await self.planner.generate_plan(keyframes, verified_meta)
-        
+
         # 4. Save
         save_workflow(raw_plan, output_name)
-        logger.info(f"🎉 Workflow {output_name} synthesis complete!")
\ No newline at end of file
+        logger.info(f"🎉 Workflow {output_name} synthesis complete!")
+
+    async def verify_keyframes(self, keyframes: List[Dict]) -> List[Dict]:
+        """
+        Verifies every click keyframe concurrently. Results come back in keyframe order.
+
+        The trace is split into contiguous lanes that run in parallel. Each lane walks its slice in order
+        on its own parse-cache screen, so consecutive keyframes still get incremental (dirty-region) parses.
+        Identical frames are parsed once, whichever lane gets there first.
+        """
+        verified_meta: List[Dict] = [{"verified": False} for _ in keyframes]
+        clicks = [i for i, frame in enumerate(keyframes) if 'x' in frame['event_data']]
+        if not clicks:
+            return verified_meta
+
+        lanes = max(1, min(self.verify_lanes, len(clicks)))
+        size = -(-len(clicks) // lanes)  # ceil
+        slices = [clicks[i:i + size] for i in range(0, len(clicks), size)]
+
+        parses: Dict[str, asyncio.Future] = {}   # frame digest -> ParsedFrame (or None)
+        progress = {"done": 0, "deduped": 0, "next_log": 0}
+        start = time.perf_counter()
+
+        async def parse_once(image, screen_id: str):
+            digest = hashlib.blake2b(image.data, digest_size=16).hexdigest()
+            if digest in parses:
+                progress["deduped"] += 1
+                return await parses[digest]
+            future = asyncio.get_running_loop().create_future()
+            parses[digest] = future
+            parsed = None
+            try:
+                parsed = await self.verifier.parse(image, screen_id)
+            finally:
+                # Waiters on a failed parse see None ("Service Unavailable")
+                future.set_result(parsed)
+            return parsed
+
+        async def run_lane(lane_id: int, indices: List[int]):
+            screen_id = f"synth-lane-{lane_id}"
+            for i in indices:
+                frame = keyframes[i]
+                coords = (frame['event_data']['x'], frame['event_data']['y'])
+
+                image = await self.verifier.load(frame['image_path'])
+                if image is None:
+                    verified_meta[i] = {"verified": False, "reason": "Image Unreadable"}
+                else:
+                    parsed = await parse_once(image, screen_id)
+                    verified_meta[i] = (self.verifier.hit_test(parsed, coords) if parsed is not None
+                                        else {"verified": False, "reason": "Service Unavailable"})
+
+                progress["done"] += 1
+                if progress["done"] >= progress["next_log"] or progress["done"] == len(clicks):
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"🔍 Verified {progress['done']}/{len(clicks)} clicks "
+                                f"({progress['done'] / elapsed:.1f}/s, {progress['deduped']} deduped)")
+                    progress["next_log"] = progress["done"] + max(1, len(clicks) // 10)
+
+        # Offline batch job: the model servers put these parses behind the live agent's requests
+        with priority_scope(Priority.BACKGROUND):
+            await asyncio.gather(*[run_lane(lane_id, indices) for lane_id, indices in enumerate(slices)])
+
+        verified = sum(1 for meta in verified_meta if meta.get("verified"))
+        logger.info(f"✅ Verification done: {verified}/{len(clicks)} clicks matched an element "
+                    f"in {time.perf_counter() - start:.1f}s ({lanes} lanes, {len(parses)} unique frames).")
+        return verified_meta
@@ -1,9 +1,10 @@
 import logging
-import requests
-import base64
+import asyncio
+import cv2
 from typing import Dict, Optional, Tuple
 
-from wsl_brain.core.config import settings
+from wsl_brain.core.parse_cache import OmniParserCache, ParsedFrame
+from wsl_brain.core.inference_client import InferenceError
 
 logger = logging.getLogger(__name__)
 
@@ -13,49 +14,51 @@ logger = logging.getLogger(__name__)
 class ElementVerifier:
     """
     Uses OmniParser V2 (Microservice) to spatially verify elements.
+    Consecutive keyframes of a trace share one incremental parse cache: only changed regions are re-parsed.
     """
     
-    def __init__(self):
-        self.api_url = f"{settings.OMNIPARSER_URL}/parse/"
+    def __init__(self, parse_cache: Optional[OmniParserCache] = None):
+        self.parse_cache = parse_cache or OmniParserCache()
 
-    def verify_click(self, image_path: str, click_coords: Tuple[int, int]) -> Dict:
+    async def verify_click(self, image_path: str, click_coords: Tuple[int, int], screen_id: str = "default") -> Dict:
         """
-        1. Sends image to OmniParser.
+        1. Sends image to OmniParser (only the regions that changed since the previous keyframe).
         2. Checks which detected bounding box contains the click_coords.
         3. Returns the semantic label (e.g. 'Save Button') and confidence.
         """
         logger.debug(f"🔍 Verifying element at {click_coords}")
-        
-        # 1. Encode Image
-        with open(image_path, "rb") as img_file:
-            b64_image = base64.b64encode(img_file.read()).decode('utf-8')
 
-        # 2. Call Microservice
+        image = await self.load(image_path)
+        if image is None:
+            return {"verified": False, "reason": "Image Unreadable"}
+
+        parsed = await self.parse(image, screen_id)
+        if parsed is None:
+            return {"verified": False, "reason": "Service Unavailable"}
+
+        return self.hit_test(parsed, click_coords)
+
+    async def load(self, image_path: str):
+        """Decodes a keyframe off the event loop. None if unreadable."""
+        image = await asyncio.to_thread(cv2.imread, str(image_path))
+        if image is None:
+            logger.error(f"❌ Could not read keyframe {image_path}")
+        return image
+
+    async def parse(self, image, screen_id: str = "default") -> Optional[ParsedFrame]:
+        """Calls the Microservice (through the cache). None if OmniParser is unavailable."""
         try:
-            response = requests.post(self.api_url, json={"base64_image": b64_image})
-            response.raise_for_status()
-            data = response.json()
-        except Exception as e:
+            return await self.parse_cache.parse(image, screen_id)
+        except InferenceError as e:
             logger.error(f"❌ OmniParser service failed: {e}")
-            return {"verified": False, "reason": "Service Unavailable"}
+            return None
 
-        # 3. Hit Test (Geometry)
-        # Note: OmniParser returns normalized [0,1] coordinates or pixels depending on config.
-        # Assuming pixels here based on our config.
+    def hit_test(self, parsed: ParsedFrame, click_coords: Tuple[int, int]) -> Dict:
+        """Geometry only: the cache returns full-frame pixel bboxes [x1, y1, x2, y2]."""
         cx, cy = click_coords
-        elements = data['parsed_content_list']
-        
-        matched_element = None
-        min_area = float('inf')
-
-        for el in elements:
-            bbox = el['bbox'] # [x1, y1, x2, y2]
-            if bbox[0] <= cx <= bbox[2] and bbox[1] <= cy <= bbox[3]:
-                # If multiple boxes overlap (e.g. text inside button), pick smaller one
-                area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-                if area < min_area:
-                    min_area = area
-                    matched_element = el
+        # If multiple boxes overlap (e.g. text inside button), the smallest one wins
+        box_id = parsed.screen.smallest_at(cx, cy)
+        matched_element = parsed.screen.element(box_id) if box_id is not None else None
 
         if matched_element:
             logger.info(f"✅ Verified Click: User clicked '{matched_element['content']}' ({matched_element['type']})")
@@ -67,4 +70,4 @@ class ElementVerifier:
             }
         
         logger.warning(f"⚠️ No element found at {click_coords} by OmniParser.")
-        return {"verified": False, "reason": "No Element Detected"}
\ No newline at end of file
+        return {"verified": False, "reason": "No Element Detected"}